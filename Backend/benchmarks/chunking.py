@@ -0,0 +1,77 @@
+# chunking.py
+# Throughput of the token-budgeted chunker (helpers/chunker.py) against
+# the character-based recursive_split it replaced, on synthetic text.
+#
+#   python -m benchmarks.chunking                   # embedding model tokenizer
+#   python -m benchmarks.chunking --approx          # ~4 characters per token, no model needed
+#   python -m benchmarks.chunking --sizes 1 4 16    # MB of text per run
+import argparse
+import random
+import statistics
+import time
+from config import CHUNK_TOKENS
+from helpers.chunker import token_spans, word_counter
+from helpers.document_loader import recursive_split
+
+WORDS = ("the model retrieves relevant chunks from stored documents and answers questions about "
+         "them using embeddings similarity search context window tokens paragraph sentence").split()
+
+
+def synthetic_text(size: int, paragraphs: bool = True, seed: int = 0) -> str:
+    """About `size` characters of sentences, in paragraphs or as one long paragraph."""
+    rng = random.Random(seed)
+    parts, total = [], 0
+    while total < size:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 25))).capitalize() + "."
+        if paragraphs:
+            sentence += rng.choice((" ", " ", " ", "\n", "\n\n"))
+        else:
+            sentence += " "
+        parts.append(sentence)
+        total += len(sentence)
+    return "".join(parts)
+
+
+def timed(fn):
+    start = time.perf_counter()
+    result = fn()
+    return result, time.perf_counter() - start
+
+
+def run(sizes_mb, count_word, label: str):
+    print(f"Token budget {CHUNK_TOKENS} ({label}) vs recursive_split(450 chars)")
+    print(f"{'text':<22}{'function':<18}{'MB/s':>8}{'chunks':>8}{'tokens/chunk':>14}{'max tokens':>12}")
+    for size_mb in sizes_mb:
+        for paragraphs in (True, False):
+            text = synthetic_text(int(size_mb * 2**20), paragraphs)
+            name = f"{size_mb:g}MB {'paragraphs' if paragraphs else 'one paragraph'}"
+
+            chunks, seconds = timed(lambda: recursive_split(text, 450))
+            tokens = [sum(count_word(w) for w in chunk.split()) for chunk in chunks if chunk]
+            print(f"{name:<22}{'recursive_split':<18}{size_mb / seconds:>8.1f}{len(tokens):>8}"
+                  f"{statistics.mean(tokens):>14.1f}{max(tokens):>12}")
+
+            # A fresh word cache, so the tokenizer calls are part of the time
+            counter = word_counter(count_word.__wrapped__)
+            spans, seconds = timed(lambda: token_spans(text, CHUNK_TOKENS, counter))
+            tokens = [span.tokens for span in spans]
+            print(f"{'':<22}{'token_spans':<18}{size_mb / seconds:>8.1f}{len(tokens):>8}"
+                  f"{statistics.mean(tokens):>14.1f}{max(tokens):>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=float, nargs="+", default=[1, 4])
+    parser.add_argument("--approx", action="store_true", help="estimate tokens instead of loading the tokenizer")
+    args = parser.parse_args()
+
+    if args.approx:
+        count_word, label = word_counter(lambda word: len(word) // 4 + 1), "approximate tokens"
+    else:
+        from helpers import llm
+        count_word, label = word_counter(llm.count_tokens), "embedding tokenizer"
+    run(args.sizes, count_word, label)
+
+
+if __name__ == "__main__":
+    main()
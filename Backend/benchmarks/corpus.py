@@ -0,0 +1,83 @@
+# corpus.py
+# Deterministic synthetic documents of a given size in every supported
+# upload format, for the benchmark suite.
+#
+#   python -m benchmarks.corpus out_dir --mb 4 --formats pdf csv
+import argparse
+import csv
+import random
+import textwrap
+from pathlib import Path
+from .chunking import WORDS, synthetic_text
+
+FORMATS = ("txt", "csv", "pdf", "docx")
+
+PDF_LINES_PER_PAGE = 60
+PDF_LINE_CHARS = 100
+
+
+def write_txt(path: Path, size: int, seed: int = 0):
+    path.write_text(synthetic_text(size, seed=seed), encoding="utf-8")
+
+
+def write_csv(path: Path, size: int, seed: int = 0):
+    """Rows of an id, two categorical columns, a number and a sentence."""
+    rng = random.Random(seed)
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "category", "amount", "description"])
+        row = 0
+        while f.tell() < size:
+            row += 1
+            description = " ".join(rng.choice(WORDS) for _ in range(rng.randint(5, 20)))
+            writer.writerow([row, f"item-{rng.randrange(10000)}", rng.choice(WORDS), f"{rng.uniform(0, 1000):.2f}", description])
+
+
+def write_pdf(path: Path, size: int, seed: int = 0):
+    """Pages of PDF_LINES_PER_PAGE wrapped lines of text."""
+    import pymupdf as fitz
+    lines = []
+    for paragraph in synthetic_text(size, seed=seed).split("\n"):
+        lines.extend(textwrap.wrap(paragraph, PDF_LINE_CHARS) or [""])
+    with fitz.open() as doc:
+        for start in range(0, len(lines), PDF_LINES_PER_PAGE):
+            page = doc.new_page()
+            page.insert_text((36, 36), "\n".join(lines[start:start + PDF_LINES_PER_PAGE]), fontsize=7)
+        doc.save(path)
+
+
+def write_docx(path: Path, size: int, seed: int = 0):
+    """One docx paragraph per paragraph of synthetic text."""
+    from docx import Document
+    doc = Document()
+    for paragraph in synthetic_text(size, seed=seed).split("\n"):
+        if paragraph.strip():
+            doc.add_paragraph(paragraph)
+    doc.save(path)
+
+
+WRITERS = {"txt": write_txt, "csv": write_csv, "pdf": write_pdf, "docx": write_docx}
+
+
+def make_corpus(out_dir: Path, size: int, formats=FORMATS, seed: int = 0):
+    """Writes one document of about `size` characters of text per format; returns {format: path}."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for fmt in formats:
+        path = out_dir / f"synthetic_{size}_{seed}.{fmt}"
+        if not path.exists():
+            WRITERS[fmt](path, size, seed)
+        paths[fmt] = path
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Write synthetic documents")
+    parser.add_argument("out_dir")
+    parser.add_argument("--mb", type=float, default=1)
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    for fmt, path in make_corpus(Path(args.out_dir), int(args.mb * 2**20), args.formats, args.seed).items():
+        print(f"{fmt}: {path} ({path.stat().st_size / 2**20:.1f} MB)")
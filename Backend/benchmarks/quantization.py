@@ -0,0 +1,88 @@
+# quantization.py
+# Memory saved and recall@k retained by quantized embeddings, compared
+# with exact cosine similarity over the float32 embeddings.
+#
+#   python -m benchmarks.quantization                  # synthetic corpus
+#   python -m benchmarks.quantization --db             # chunks in data/vector_store.db
+#   python -m benchmarks.quantization --rows 200000 --top-k 5
+import argparse
+import time
+import numpy as np
+from helpers.quantization import KINDS
+from helpers.quantized_index import QuantizedIndex
+from helpers.vector_index import VectorIndex
+
+
+def synthetic_corpus(rows: int, dim: int, seed: int = 0):
+    """Clustered random vectors, roughly shaped like sentence embeddings."""
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(max(1, rows // 50), dim)).astype(np.float32)
+    vectors = centers[rng.integers(0, len(centers), rows)] + 0.5 * rng.normal(size=(rows, dim)).astype(np.float32)
+    return vectors.astype(np.float32)
+
+
+def db_corpus(queries: int, seed: int = 0):
+    """Stored chunk embeddings, queried with stored question embeddings where available."""
+    from helpers import sqlite_helper
+    rows = sqlite_helper.get_all_embeddings()
+    if not rows:
+        raise SystemExit("No documents in the database")
+    vectors = np.stack([embedding for _, _, embedding in rows]).astype(np.float32)
+    questions = [r[4] for r in sqlite_helper.get_recent_qa(queries) if r[4] is not None and len(r[4]) == vectors.shape[1]]
+    return vectors, np.stack(questions) if questions else None
+
+
+def timed_search(index, queries, top_k: int):
+    start = time.perf_counter()
+    hits = [{chunk_id for chunk_id, _, _ in index.search(q, top_k)} for q in queries]
+    return hits, (time.perf_counter() - start) / len(queries) * 1000
+
+
+def run(vectors: np.ndarray, queries: np.ndarray, top_k: int, candidates: int):
+    ids = list(range(1, len(vectors) + 1))
+    store = dict(zip(ids, vectors))
+
+    def fetch(chunk_ids):
+        return {i: store[i] for i in chunk_ids}
+
+    exact = VectorIndex()
+    exact.add("bench", ids, vectors)
+    truth, exact_ms = timed_search(exact, queries, top_k)
+    float_bytes = exact.stats()["vector_bytes"]
+    print(f"{len(vectors)} rows x {vectors.shape[1]} dims, {len(queries)} queries, recall@{top_k}")
+    print(f"{'index':<16}{'memory MB':>10}{'saved':>8}{'recall':>8}{'ms/query':>10}")
+    print(f"{'float32':<16}{float_bytes / 2**20:>10.1f}{'-':>8}{1.0:>8.3f}{exact_ms:>10.2f}")
+
+    for kind in KINDS:
+        # candidates == top_k is the first pass alone; more candidates get re-ranked
+        for n_candidates in (top_k, candidates):
+            index = QuantizedIndex(kind, candidates=n_candidates, fetch=fetch)
+            index.add("bench", ids, vectors)
+            found, ms = timed_search(index, queries, top_k)
+            recall = float(np.mean([len(a & b) / top_k for a, b in zip(found, truth)]))
+            code_bytes = index.stats()["vector_bytes"]
+            label = f"{kind}" if n_candidates == top_k else f"{kind}+rerank{n_candidates}"
+            print(f"{label:<16}{code_bytes / 2**20:>10.1f}{1 - code_bytes / float_bytes:>8.0%}{recall:>8.3f}{ms:>10.2f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Quantized embedding memory and recall benchmark")
+    parser.add_argument("--db", action="store_true", help="use the stored chunk embeddings")
+    parser.add_argument("--rows", type=int, default=50000)
+    parser.add_argument("--dim", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--candidates", type=int, default=100)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(1)
+    if args.db:
+        vectors, queries = db_corpus(args.queries)
+    else:
+        vectors, queries = synthetic_corpus(args.rows, args.dim), None
+    if queries is None:
+        # Perturbed copies of stored rows stand in for questions
+        picked = vectors[rng.integers(0, len(vectors), args.queries)]
+        queries = picked + 0.5 * rng.normal(size=picked.shape).astype(np.float32)
+
+    run(vectors, queries, args.top_k, args.candidates)
@@ -0,0 +1,384 @@
+# suite.py
+# Reproducible, offline benchmark of the whole pipeline: extraction per
+# format, chunking, ingestion, retrieval at several index sizes and
+# end-to-end /ask latency. Models are replaced by the deterministic stubs
+# (MODEL_BACKEND=stub) and everything is written to a scratch database and
+# upload directory, so no GGUF files are needed and data/ is never touched. Results are printed
+# and written as JSON; --compare prints the change against an earlier run.
+#
+#   python -m benchmarks.suite --output results.json
+#   python -m benchmarks.suite --corpus-mb 8 --only extraction chunking
+#   python -m benchmarks.suite --retrieval-sizes 10000 100000 --compare results.json
+#
+# The 1M-row retrieval run holds a 1M x --dim float32 matrix (about 3 GB
+# at 768 dimensions); pass smaller --retrieval-sizes on small machines.
+import os
+import tempfile
+
+# Set before config is imported: stub models, a scratch database and
+# upload directory, no Whisper warm-up and Server-Timing headers for the
+# /ask stage breakdown
+WORK_DIR = tempfile.mkdtemp(prefix="docqa-bench-")
+os.environ["DOCQA_MODEL_BACKEND"] = "stub"
+os.environ["DOCQA_DB_PATH"] = os.path.join(WORK_DIR, "bench.db")
+os.environ["DOCQA_UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ["DOCQA_WARMUP_MODELS"] = "embedder,generator"
+os.environ["DOCQA_SERVER_TIMING"] = "1"
+os.environ["DOCQA_WEB_WORKERS"] = "1"
+
+import argparse
+import json
+import platform
+import random
+import shutil
+import socket
+import subprocess
+import threading
+import time
+import urllib.parse
+import urllib.request
+from pathlib import Path
+import numpy as np
+from config import CHUNK_TOKENS, VECTOR_INDEX, RETRIEVAL_MODE, STUB_EMBED_DIM
+from helpers import llm, stub_models
+from helpers.chunker import token_spans, word_counter
+from helpers.document_loader import recursive_split, stream_split, load_document
+from helpers.extraction_helper import iter_text, iter_csv_batches, shutdown as shutdown_extraction
+from .corpus import FORMATS, make_corpus
+from .chunking import synthetic_text
+
+SECTIONS = ("extraction", "chunking", "ingestion", "retrieval", "ask")
+
+
+def percentiles(seconds) -> dict:
+    ms = np.asarray(seconds) * 1000
+    return {
+        "count": int(ms.size),
+        "mean_ms": float(ms.mean()),
+        "p50_ms": float(np.percentile(ms, 50)),
+        "p99_ms": float(np.percentile(ms, 99)),
+    }
+
+
+def best_of(repeat: int, fn):
+    """(result of the last run, fastest wall time) over `repeat` runs."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return result, best
+
+
+# ---------- Extraction ----------
+def _extracted_chars(path: Path) -> int:
+    if path.suffix == ".csv":
+        return sum(len(header) + sum(map(len, rows)) for header, rows in iter_csv_batches(path))
+    return sum(len(piece[0] if isinstance(piece, tuple) else piece) for piece in iter_text(path))
+
+
+def bench_extraction(paths: dict, repeat: int) -> dict:
+    results = {}
+    for fmt, path in paths.items():
+        chars, seconds = best_of(repeat, lambda: _extracted_chars(path))
+        file_mb = path.stat().st_size / 2**20
+        results[fmt] = {
+            "file_mb": file_mb,
+            "text_mb": chars / 2**20,
+            "seconds": seconds,
+            "file_mb_per_s": file_mb / seconds,
+            "text_mb_per_s": chars / 2**20 / seconds,
+        }
+        if fmt == "pdf":
+            import pymupdf as fitz
+            with fitz.open(path) as doc:
+                results[fmt]["pages_per_s"] = doc.page_count / seconds
+        print(f"[extraction] {fmt:<5} {file_mb:>7.1f} MB file  {results[fmt]['text_mb_per_s']:>8.1f} MB text/s")
+    return results
+
+
+# ---------- Chunking ----------
+def bench_chunking(text: str, repeat: int) -> dict:
+    text_mb = len(text) / 2**20
+    results = {}
+
+    chunks, seconds = best_of(repeat, lambda: recursive_split(text, 450))
+    results["recursive_split"] = {"seconds": seconds, "mb_per_s": text_mb / seconds, "chunks": len(chunks)}
+
+    # A fresh word cache per run, so the tokenizer calls are part of the time
+    spans, seconds = best_of(repeat, lambda: token_spans(text, CHUNK_TOKENS, word_counter(stub_models.count_tokens)))
+    results["token_spans"] = {"seconds": seconds, "mb_per_s": text_mb / seconds, "chunks": len(spans)}
+
+    lines = text.split("\n")
+    chunks, seconds = best_of(repeat, lambda: list(stream_split(lines)))
+    results["stream_split"] = {"seconds": seconds, "mb_per_s": text_mb / seconds, "chunks": len(chunks)}
+
+    for name, result in results.items():
+        print(f"[chunking] {name:<16} {result['mb_per_s']:>8.1f} MB/s  {result['chunks']:>8} chunks")
+    return results
+
+
+# ---------- Ingestion ----------
+def bench_ingestion(paths: dict) -> dict:
+    from helpers.sqlite_helper import init_db
+    from helpers.vector_index import index, load_index
+    init_db()
+    load_index()
+
+    results = {}
+    for fmt, path in paths.items():
+        before = index.stats()["rows"]
+        start = time.perf_counter()
+        load_document(path, doc_name=f"bench.{fmt}")
+        seconds = time.perf_counter() - start
+        chunks = index.stats()["rows"] - before
+        file_mb = path.stat().st_size / 2**20
+        results[fmt] = {
+            "chunks": chunks,
+            "seconds": seconds,
+            "chunks_per_s": chunks / seconds,
+            "file_mb_per_s": file_mb / seconds,
+        }
+        print(f"[ingestion] {fmt:<5} {chunks:>8} chunks  {chunks / seconds:>9.1f} chunks/s  {file_mb / seconds:>7.2f} MB/s")
+    return results
+
+
+# ---------- Retrieval ----------
+def _synthetic_groups(rows: int, dim: int, rng, sources: int = 100, batch: int = 50000):
+    """Clustered unit vectors in (source, ids, vectors) batches, so no full float64 copy is made."""
+    centers = rng.normal(size=(max(1, rows // 50), dim)).astype(np.float32)
+    for start in range(0, rows, batch):
+        n = min(batch, rows - start)
+        vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, dim), dtype=np.float32)
+        yield f"doc-{start // batch % sources}", list(range(start + 1, start + n + 1)), vectors
+
+
+def _make_index(kind: str):
+    if kind == "ivf":
+        from helpers.ivf_index import IVFIndex
+        return IVFIndex(path=None)
+    from helpers.vector_index import VectorIndex
+    return VectorIndex()
+
+
+def bench_index(sizes, kinds, dim: int, queries: int, top_k: int, seed: int) -> dict:
+    """Search latency of the resident index alone, at each size."""
+    results = {}
+    for kind in kinds:
+        results[kind] = {}
+        for rows in sizes:
+            rng = np.random.default_rng(seed)
+            index = _make_index(kind)
+            start = time.perf_counter()
+            index.load(_synthetic_groups(rows, dim, rng))
+            build = time.perf_counter() - start
+
+            probes = rng.standard_normal((queries, dim), dtype=np.float32)
+            timings = []
+            for q in probes:
+                start = time.perf_counter()
+                index.search(q, top_k=top_k)
+                timings.append(time.perf_counter() - start)
+            results[kind][str(rows)] = {"build_seconds": build, **percentiles(timings)}
+            print(f"[retrieval] {kind:<5} {rows:>8} rows  p50 {results[kind][str(rows)]['p50_ms']:>8.2f} ms"
+                  f"  p99 {results[kind][str(rows)]['p99_ms']:>8.2f} ms")
+            del index
+    return results
+
+
+def sample_questions(text: str, count: int, seed: int):
+    """Distinct questions made of the words of random sentences in the corpus."""
+    rng = random.Random(seed)
+    sentences = [s.strip() for s in text.replace("\n", " ").split(".") if len(s.split()) >= 6]
+    questions = []
+    while len(questions) < count:
+        words = rng.choice(sentences).split()
+        questions.append(f"What about {' '.join(words[:8]).lower()} {len(questions)}?")
+    return questions
+
+
+def bench_search_documents(questions, top_k: int) -> dict:
+    """search_documents over the ingested corpus: index scan plus the SQLite chunk fetch."""
+    from helpers.vector_helper import search_documents
+    from helpers.vector_index import index
+    results = {"rows": index.stats()["rows"]}
+    for mode in ("vector", "hybrid"):
+        timings = []
+        for question in questions:
+            q_embedding = llm.embed_text(question)
+            start = time.perf_counter()
+            search_documents(q_embedding, top_k=top_k, text=question, mode=mode)
+            timings.append(time.perf_counter() - start)
+        results[mode] = percentiles(timings)
+        print(f"[retrieval] search_documents {mode:<6} {results['rows']:>8} rows  p50 {results[mode]['p50_ms']:>8.2f} ms"
+              f"  p99 {results[mode]['p99_ms']:>8.2f} ms")
+    return results
+
+
+# ---------- End-to-end /ask ----------
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _server_timing(header: str) -> dict:
+    stages = {}
+    for entry in filter(None, (part.strip() for part in (header or "").split(","))):
+        name, _, duration = entry.partition(";dur=")
+        if duration:
+            stages[name] = float(duration)
+    return stages
+
+
+def bench_ask(questions, top_k: int) -> dict:
+    """POSTs every question to /ask on a real uvicorn server in this process."""
+    import uvicorn
+    import main
+
+    port = _free_port()
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    base = f"http://127.0.0.1:{port}"
+    try:
+        deadline = time.time() + 120
+        while True:
+            try:
+                with urllib.request.urlopen(f"{base}/health/ready") as r:
+                    if r.status == 200:
+                        break
+            except OSError:
+                pass
+            if time.time() > deadline or not thread.is_alive():
+                raise SystemExit("The server did not become ready")
+            time.sleep(0.1)
+
+        timings, stages, cache_hits = [], {}, 0
+        for question in questions:
+            query = urllib.parse.urlencode({"top_k": top_k, "mode": RETRIEVAL_MODE})
+            request = urllib.request.Request(f"{base}/ask?{query}", data=json.dumps(question).encode("utf-8"),
+                                             headers={"Content-Type": "application/json"})
+            start = time.perf_counter()
+            with urllib.request.urlopen(request) as r:
+                r.read()
+                timings.append(time.perf_counter() - start)
+                cache_hits += r.headers.get("X-Answer-Cache") == "hit"
+                for name, ms in _server_timing(r.headers.get("Server-Timing")).items():
+                    stages.setdefault(name, []).append(ms)
+    finally:
+        server.should_exit = True
+        thread.join(timeout=30)
+
+    results = percentiles(timings)
+    results["cache_hits"] = cache_hits
+    results["stage_mean_ms"] = {name: float(np.mean(ms)) for name, ms in stages.items()}
+    print(f"[ask] {len(questions)} questions  p50 {results['p50_ms']:.2f} ms  p99 {results['p99_ms']:.2f} ms  "
+          f"({cache_hits} cache hits)")
+    for name, ms in results["stage_mean_ms"].items():
+        print(f"[ask]   {name:<16} {ms:>8.2f} ms mean")
+    return results
+
+
+# ---------- Output ----------
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "numpy": np.__version__,
+        "args": vars(args),
+        "config": {"CHUNK_TOKENS": CHUNK_TOKENS, "VECTOR_INDEX": VECTOR_INDEX, "RETRIEVAL_MODE": RETRIEVAL_MODE,
+                   "STUB_EMBED_DIM": STUB_EMBED_DIM},
+    }
+
+
+def _numbers(tree, prefix: str = ""):
+    """Flattens nested results into {"a.b.c": number}."""
+    if isinstance(tree, dict):
+        for key, value in tree.items():
+            yield from _numbers(value, f"{prefix}.{key}" if prefix else key)
+    elif isinstance(tree, (int, float)) and not isinstance(tree, bool):
+        yield prefix, tree
+
+
+def compare(baseline: dict, results: dict):
+    """Prints every metric present in both runs with its relative change."""
+    old = dict(_numbers(baseline.get("results", {})))
+    new = dict(_numbers(results["results"]))
+    print(f"\nChange against {baseline.get('meta', {}).get('commit') or 'baseline'}:")
+    print(f"{'metric':<52}{'baseline':>12}{'current':>12}{'change':>9}")
+    for name in (name for name in new if name in old):
+        change = f"{new[name] / old[name] - 1:>+9.1%}" if old[name] else f"{'-':>9}"
+        print(f"{name:<52}{old[name]:>12.4g}{new[name]:>12.4g}{change}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline DocQA pipeline benchmark")
+    parser.add_argument("--only", nargs="+", choices=SECTIONS, default=list(SECTIONS))
+    parser.add_argument("--corpus-mb", type=float, default=2, help="text per synthetic document")
+    parser.add_argument("--formats", nargs="+", choices=FORMATS, default=list(FORMATS))
+    parser.add_argument("--retrieval-sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--indexes", nargs="+", choices=("flat", "ivf"), default=["flat", "ivf"])
+    parser.add_argument("--dim", type=int, default=STUB_EMBED_DIM)
+    parser.add_argument("--queries", type=int, default=200, help="searches per retrieval measurement")
+    parser.add_argument("--questions", type=int, default=50, help="/ask requests")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=3, help="runs per throughput measurement (fastest kept)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--compare", help="JSON results of an earlier run")
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    size = int(args.corpus_mb * 2**20)
+    sections = set(args.only)
+    results = {}
+    try:
+        # Chunking only needs the text; the other sections read the documents
+        paths = make_corpus(Path(WORK_DIR) / "corpus", size, args.formats, args.seed) if sections - {"chunking"} else {}
+        text = synthetic_text(size, seed=args.seed)
+        questions = sample_questions(text, args.questions, args.seed)
+
+        if "extraction" in sections:
+            results["extraction"] = bench_extraction(paths, args.repeat)
+        if "chunking" in sections:
+            results["chunking"] = bench_chunking(text, args.repeat)
+        if sections & {"ingestion", "retrieval", "ask"}:
+            # Retrieval over the database and /ask need the corpus ingested
+            ingestion = bench_ingestion(paths)
+            if "ingestion" in sections:
+                results["ingestion"] = ingestion
+        if "retrieval" in sections:
+            results["retrieval"] = {
+                "index": bench_index(args.retrieval_sizes, args.indexes, args.dim, args.queries, args.top_k, args.seed),
+                "search_documents": bench_search_documents(questions, args.top_k),
+            }
+        if "ask" in sections:
+            # Other questions than the retrieval run, so their embeddings are not cached yet
+            results["ask"] = bench_ask(sample_questions(text, args.questions, args.seed + 1), args.top_k)
+    finally:
+        shutdown_extraction()
+        if args.keep:
+            print(f"Scratch directory kept: {WORK_DIR}")
+        else:
+            shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+    output = {"meta": metadata(args), "results": results}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(output, f, indent=2)
+        print(f"Results written to {args.output}")
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(json.load(f), output)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,142 @@
+import os
+
 EMBED_MODEL = "multilingual-e5-base-F16.gguf"
 DEFAULT_MODEL = "gemma-3-4b-it.Q4_K_M.gguf"
 LLAMA_CPP_MODEL_DIR = "Backend\models"  # directory where models are stored
 
-DB_PATH = "data/vector_store.db"
\ No newline at end of file
+DB_PATH = os.environ.get("DOCQA_DB_PATH", "data/vector_store.db")
+UPLOADS_DIR = os.environ.get("DOCQA_UPLOADS_DIR", "data/uploads")  # saved copies of uploaded files
+
+EMBED_BATCH_SIZE = 32  # chunks per embedding call during ingestion
+INGEST_WORKERS = 2  # background threads running upload ingestion jobs
+INGEST_STORE_BATCH = 512  # chunks embedded and written per transaction while streaming a document
+CSV_BATCH_ROWS = 10000  # CSV rows parsed and formatted at a time
+TXT_BLOCK_CHARS = 1024 * 1024  # characters of a .txt file read at a time; longer lines are split
+
+# Chunks are budgeted in tokens of the embedding model's tokenizer
+CHUNK_TOKENS = 128
+CHUNK_OVERLAP_TOKENS = 0  # tokens repeated from the end of the previous chunk
+
+# PDF extraction: page ranges are read in parallel worker processes for large files
+PDF_PARALLEL_MIN_PAGES = 64   # smaller PDFs are read serially
+PDF_WORKERS = max(1, (os.cpu_count() or 2) - 1)
+PDF_PAGES_PER_TASK = 16       # pages each worker extracts per task
+
+# Uploads are streamed to disk, so the limit is not bounded by memory
+MAX_UPLOAD_BYTES = 500 * 1024 * 1024
+UPLOAD_CHUNK_BYTES = 1024 * 1024  # bytes read from the request per write
+
+# Semantic answer cache
+ANSWER_CACHE_THRESHOLD = 0.95  # min cosine similarity between questions for a hit
+ANSWER_CACHE_SIZE = 256        # max cached answers (LRU eviction)
+ANSWER_CACHE_TTL = 24 * 3600   # seconds before a cached answer expires
+
+# Embedding cache
+EMBED_CACHE_SIZE = 10000   # embeddings kept in the in-memory LRU
+EMBED_CACHE_DISK = True    # also persist embeddings in the embedding_cache table
+EMBED_CACHE_DISK_SIZE = 100000  # rows kept in the embedding_cache table (oldest evicted first)
+
+# Model executors: concurrent calls per model type, and how many more may wait before 503
+EXECUTOR_WORKERS = {"whisper": 1, "embedder": 1, "generator": 4}
+EXECUTOR_MAX_QUEUE = {"whisper": 4, "embedder": 32, "generator": 8}
+
+WHISPER_MODEL = "small.en"
+AUDIO_SAMPLE_RATE = 16000  # Whisper's input rate; live PCM must be sent at this rate
+
+# Whisper latency tiers: beam search width and the CTranslate2 compute type
+# (each compute type loads its own copy of the model)
+WHISPER_TIERS = {
+    "fast": {"beam_size": 1, "compute_type": "int8"},
+    "balanced": {"beam_size": 5, "compute_type": "int8"},
+    "accurate": {"beam_size": 5, "compute_type": "float32"},
+}
+WHISPER_TIER = "balanced"  # default for uploaded and final live transcripts
+
+# Energy VAD shared by upload trimming and live segmentation
+VAD_FRAME_MS = 30          # analysis frame length
+VAD_MARGIN_DB = 12         # speech is this far above the noise floor...
+VAD_MIN_DB = -50           # ...and above this level (dBFS)
+AUDIO_TRIM_PAD_MS = 250    # speech kept around voiced frames; longer pauses shrink to twice this
+MAX_AUDIO_UPLOAD_BYTES = 50 * 1024 * 1024
+
+# Live transcription (/ws/ask/live): 16-bit mono PCM is segmented into
+# utterances by the VAD; partial transcripts are sent while speaking
+LIVE_SPEECH_START_MS = 90        # voiced audio needed to start an utterance
+LIVE_END_SILENCE_MS = 700        # silence that ends an utterance
+LIVE_PRE_ROLL_MS = 300           # audio kept from before the detected start
+LIVE_PARTIAL_INTERVAL_S = 1.0    # new speech between partial transcripts
+LIVE_MAX_UTTERANCE_S = 30        # utterances are cut off at this length
+LIVE_PARTIAL_TIER = "fast"       # partials favour speed over accuracy
+
+# Model hosting: "local" loads the models in this process; "remote" sends
+# embed/generate/transcribe calls to model_server.py so several uvicorn
+# workers can share one copy of the weights; "stub" replaces the embedder,
+# generator and tokenizer with deterministic stand-ins (helpers/stub_models.py)
+# that need no model files, for benchmarks.
+MODEL_BACKEND = os.environ.get("DOCQA_MODEL_BACKEND", "local")
+STUB_EMBED_DIM = 768        # dimensions of the stub embeddings (same as the e5 model)
+STUB_ANSWER_TOKENS = 64     # tokens the stub generator produces per answer
+MODEL_SERVER_ADDRESS = os.environ.get(
+    "DOCQA_MODEL_SERVER",
+    r"\\.\pipe\docqa_model_server" if os.name == "nt" else "data/model_server.sock"
+)
+MODEL_SERVER_AUTHKEY = os.environ.get("DOCQA_MODEL_SERVER_KEY", "docqa-model-server").encode()
+WEB_WORKERS = int(os.environ.get("DOCQA_WEB_WORKERS", "1"))  # uvicorn worker processes
+
+# Models loaded at startup, in parallel and in the background, each with one
+# dummy inference ("embedder", "generator", "whisper"); /health/ready waits
+# for them. Models not listed load on first use.
+WARMUP_MODELS = [m for m in os.environ.get("DOCQA_WARMUP_MODELS", "embedder,generator,whisper").split(",") if m]
+
+# Metrics: every request and pipeline stage is timed for /metrics; with
+# SERVER_TIMING, responses also carry a Server-Timing header with the
+# stage breakdown of that request (streamed stages end after the header)
+SERVER_TIMING = os.environ.get("DOCQA_SERVER_TIMING", "0") == "1"
+
+LLAMA_N_CTX = 2048     # context window of every llama.cpp context, in tokens
+GEN_MAX_TOKENS = 512   # default answer length; reserved out of the window
+
+# Prompt context packing: retrieved chunks are packed into the tokens left
+# after the answer and the prompt template, most relevant and least redundant first
+CONTEXT_TOKEN_BUDGET = None      # cap on context tokens (None: whatever the window leaves)
+CONTEXT_MMR_LAMBDA = 0.7         # relevance vs. novelty when ordering chunks (1.0: relevance only)
+CONTEXT_DUPLICATE_SIM = 0.95     # chunks this similar to one already packed are dropped
+
+# Generation scheduler: independent llama.cpp contexts decoding in parallel
+GEN_SLOTS = 2          # generator contexts (KV slots), each decoding one request at a time
+# CPU threads per slot. None gives every slot all cores: the fastest decode
+# for a single user, but concurrent slots then compete for the cores.
+# cpu_count // GEN_SLOTS avoids that oversubscription at the cost of each
+# request decoding at about 1/GEN_SLOTS of the single-user speed.
+GEN_THREADS_PER_SLOT = None
+
+# SQLite connection settings (applied to every pooled connection)
+SQLITE_BUSY_TIMEOUT = 30          # seconds a writer waits for the lock
+SQLITE_SYNCHRONOUS = "NORMAL"     # safe with WAL; commits skip the per-transaction fsync
+SQLITE_MMAP_SIZE = 256 * 1024 * 1024
+SQLITE_CACHE_SIZE_KB = 64 * 1024  # page cache per connection
+SQLITE_STATEMENT_CACHE = 256      # prepared statements kept per connection
+
+# Retrieval: "vector" scores every chunk by cosine similarity; "hybrid"
+# prefilters candidates with FTS5 BM25 and fuses BM25 and vector ranks (RRF)
+RETRIEVAL_MODE = "vector"
+RETRIEVAL_MODES = ("vector", "hybrid")
+HYBRID_CANDIDATES = 100  # BM25 candidates scored by vector similarity
+RRF_K = 60               # reciprocal rank fusion constant
+
+# Vector index backend: "flat" scores every chunk exactly; "ivf" is an
+# approximate inverted-file index that only scores the closest clusters
+VECTOR_INDEX = "flat"
+IVF_INDEX_DIR = os.path.splitext(DB_PATH)[0] + "_ivf"  # memory-mapped index files
+IVF_NLIST = None          # clusters; None = sqrt(rows) at training time
+IVF_NPROBE = 16           # clusters scanned per query (per-request override: nprobe)
+IVF_MIN_TRAIN = 20000     # below this many rows IVF searches exhaustively
+IVF_RETRAIN_GROWTH = 4.0  # retrain the clusters once the index grows by this factor
+
+# Quantized embeddings (flat index only): "none" keeps float32 rows in memory;
+# "int8" (4x smaller) or "binary" (32x smaller) keep codes for a first pass and
+# re-rank the best candidates against the float32 embeddings in the database.
+# This saves RAM only: the database keeps the float32 embeddings for the
+# re-rank and stores the codes next to them, so it grows slightly on disk
+EMBEDDING_QUANTIZATION = "none"
+QUANT_RERANK_CANDIDATES = 100  # first-pass hits re-ranked at full precision
@@ -0,0 +1,164 @@
+# answer_cache.py
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import List, Optional
+import numpy as np
+from config import ANSWER_CACHE_THRESHOLD, ANSWER_CACHE_SIZE, ANSWER_CACHE_TTL
+from . import sqlite_helper
+
+
+def split_sources(sources: str) -> List[str]:
+    """qa_history stores the answer's sources as one ", "-joined string."""
+    return [s for s in (sources or "").split(", ") if s]
+
+
+class AnswerCache:
+    """
+    Semantic cache of recent answers, keyed by question embedding.
+
+    A lookup is a hit when a cached question's cosine similarity to the new
+    one is at least `threshold`. Entries are evicted least-recently-used
+    once `max_size` is reached and expire `ttl` seconds after creation.
+    """
+
+    def __init__(self, threshold: float = ANSWER_CACHE_THRESHOLD, max_size: int = ANSWER_CACHE_SIZE, ttl: float = ANSWER_CACHE_TTL):
+        self.threshold = threshold
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> entry dict
+        self._keys = []
+        self._matrix = None  # stacked, normalized embeddings of _keys
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------- Internal ----------
+    def _drop(self, key):
+        del self._entries[key]
+        self._matrix = None
+
+    def _expire(self, now: float):
+        expired = [k for k, e in self._entries.items() if now - e["created"] > self.ttl]
+        for key in expired:
+            self._drop(key)
+            self.evictions += 1
+
+    # ---------- Public ----------
+    def add(self, key, question: str, answer: str, sources: str, embedding, created: float = None):
+        vec = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vec)
+        if norm == 0:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = {
+                "question": question,
+                "answer": answer,
+                "sources": sources,
+                "source_set": set(split_sources(sources)),
+                "embedding": vec / norm,
+                "created": created if created is not None else time.time(),
+            }
+            self._matrix = None
+            while len(self._entries) > self.max_size:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def lookup(self, embedding, allowed_sources: Optional[List[str]] = None):
+        """
+        Returns the best cached entry above the threshold, or None.
+        With allowed_sources, only entries answered purely from those
+        documents are considered.
+        """
+        q = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(q)
+        with self._lock:
+            self._expire(time.time())
+            if not self._entries or norm == 0:
+                self.misses += 1
+                return None
+
+            if self._matrix is None:
+                self._keys = list(self._entries)
+                self._matrix = np.stack([self._entries[k]["embedding"] for k in self._keys])
+
+            scores = self._matrix @ (q / norm)
+            if allowed_sources is not None:
+                allowed = set(allowed_sources)
+                for i, key in enumerate(self._keys):
+                    if not self._entries[key]["source_set"] <= allowed:
+                        scores[i] = -1.0
+
+            best = int(np.argmax(scores))
+            if scores[best] < self.threshold:
+                self.misses += 1
+                return None
+
+            key = self._keys[best]
+            self._entries.move_to_end(key)
+            self.hits += 1
+            entry = self._entries[key]
+            return {
+                "question": entry["question"],
+                "answer": entry["answer"],
+                "sources": entry["sources"],
+                "score": float(scores[best]),
+            }
+
+    def invalidate_source(self, source: str):
+        """Drop every entry whose answer drew on the given document."""
+        with self._lock:
+            stale = [k for k, e in self._entries.items() if source in e["source_set"]]
+            for key in stale:
+                self._drop(key)
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+# Shared instance used by the API process
+cache = AnswerCache()
+
+
+def warm_cache():
+    """
+    Seed the cache with the most recent, still-fresh Q&A history entries.
+    Entries drawing on a document that has since been deleted or renamed
+    are skipped.
+    """
+    now = time.time()
+    documents = {doc["source"] for doc in sqlite_helper.list_documents()}
+    loaded = 0
+    for qa_id, source, question, answer, embedding, timestamp in reversed(sqlite_helper.get_recent_qa(cache.max_size)):
+        try:
+            created = datetime.fromisoformat(timestamp).timestamp()
+        except (TypeError, ValueError):
+            continue
+        if embedding is None or now - created > cache.ttl:
+            continue
+        if not set(split_sources(source)) <= documents:
+            continue
+        cache.add(qa_id, question, answer, source, embedding, created=created)
+        loaded += 1
+    print(f"[CACHE] Warmed answer cache with {loaded} history entries")
@@ -0,0 +1,46 @@
+# audio.py
+import io
+import numpy as np
+from config import AUDIO_SAMPLE_RATE, VAD_FRAME_MS, VAD_MARGIN_DB, VAD_MIN_DB, AUDIO_TRIM_PAD_MS
+
+
+def decode_audio(data: bytes, sample_rate: int = AUDIO_SAMPLE_RATE) -> np.ndarray:
+    """
+    Decodes an audio file held in memory (any format FFmpeg reads) to mono
+    float32 samples at `sample_rate`, without writing it to disk.
+    """
+    from faster_whisper import decode_audio as _decode
+    return _decode(io.BytesIO(data), sampling_rate=sample_rate)
+
+
+def pcm16_to_float(data: bytes) -> np.ndarray:
+    """Little-endian 16-bit PCM bytes to float32 samples in [-1, 1]."""
+    return np.frombuffer(data, dtype="<i2").astype(np.float32) / 32768.0
+
+
+def frame_levels(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS level in dBFS of every whole `frame`-sample frame."""
+    frames = samples[:len(samples) // frame * frame].reshape(-1, frame)
+    rms = np.sqrt(np.mean(frames * frames, axis=1))
+    return 20 * np.log10(np.maximum(rms, 1e-10))
+
+
+def trim_silence(samples: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE, pad_ms: int = AUDIO_TRIM_PAD_MS) -> np.ndarray:
+    """
+    Drops leading and trailing silence and shortens pauses longer than
+    2 * pad_ms to that length. A frame is speech when it is VAD_MARGIN_DB
+    above the noise floor (the 10th percentile level), but never needs to
+    be more than 25 dB below the loudest frame. Returns an empty array
+    when nothing is louder than VAD_MIN_DB.
+    """
+    frame = sample_rate * VAD_FRAME_MS // 1000
+    levels = frame_levels(samples, frame)
+    if not len(levels):
+        return samples
+    threshold = max(VAD_MIN_DB, min(np.percentile(levels, 10) + VAD_MARGIN_DB, levels.max() - 25))
+    voiced = levels > threshold
+
+    # Keep pad frames on both sides of every voiced frame
+    pad = max(0, pad_ms // VAD_FRAME_MS)
+    keep = np.convolve(voiced, np.ones(2 * pad + 1), mode="same") > 0
+    return samples[:len(levels) * frame].reshape(-1, frame)[keep].ravel()
@@ -0,0 +1,142 @@
+# chunker.py
+from bisect import bisect_left, bisect_right
+from functools import lru_cache
+from typing import Callable, Iterable, List, NamedTuple, Tuple
+import numpy as np
+
+# Character classes by code point: whitespace as str.split() sees it, and
+# marks that end a sentence. Code points past the table map to its last
+# entry, which is neither.
+_SPACE, _STOP = 1, 2
+_CLASSES = np.zeros(0xFF21, dtype=np.uint8)
+_CLASSES[[c for c in range(0x3001) if chr(c).isspace()]] = _SPACE
+_CLASSES[[ord(c) for c in ".!?。！？"]] = _STOP
+
+# Strongest break in the whitespace before a word, strongest first
+PARAGRAPH, LINE, SENTENCE, NONE = range(4)
+
+
+class Span(NamedTuple):
+    """A chunk as character offsets into the text, with its token count."""
+    start: int
+    end: int
+    tokens: int
+
+
+class Words(NamedTuple):
+    """
+    A scanned text: the character offsets and token count of every word,
+    and the break level (PARAGRAPH, LINE, SENTENCE or NONE) before it.
+    """
+    start: np.ndarray
+    end: np.ndarray
+    tokens: np.ndarray
+    level: np.ndarray
+
+    def tail(self, first: int, offset: int = 0) -> "Words":
+        """The words from index `first` on, with `offset` subtracted from their offsets."""
+        return Words(self.start[first:] - offset, self.end[first:] - offset, self.tokens[first:], self.level[first:])
+
+    @staticmethod
+    def concat(parts: Iterable["Words"]) -> "Words":
+        return Words(*(np.concatenate(column) for column in zip(*parts)))
+
+
+def word_counter(count: Callable[[str], int], maxsize: int = 1 << 18) -> Callable[[str], int]:
+    """
+    Memoizes a per-word token count. Words repeat a lot in any document,
+    so most lookups never reach the tokenizer.
+    """
+    return lru_cache(maxsize=maxsize)(count)
+
+
+def scan_words(text: str, count_word: Callable[[str], int], start: int = 0) -> Words:
+    """
+    Scans text[start:] into Words with offsets into `text`; the text before
+    `start` only decides the break before the first word, so a text that
+    grows can be scanned piece by piece. text[start] must be whitespace
+    (or `start` 0). Word boundaries and breaks are found with array
+    operations over the code points; only the distinct words reach Python.
+    """
+    # Context: the whitespace before `start` and the character before it
+    context = start
+    while context and text[context - 1].isspace():
+        context -= 1
+    context = max(context - 1, 0)
+
+    codes = np.frombuffer(text[context:].encode("utf-32-le"), dtype=np.uint32)
+    classes = _CLASSES[np.minimum(codes, _CLASSES.size - 1)]
+    # Word edges alternate between starts and ends, with space assumed around the text
+    space = np.ones(codes.size + 2, dtype=bool)
+    space[1:-1] = classes == _SPACE
+    edges = np.flatnonzero(space[1:] != space[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+
+    # Newlines in the gap before each word, and whether the word before it ends a sentence
+    newlines = np.flatnonzero(codes == 10)
+    gap_newlines = np.searchsorted(newlines, starts) - np.searchsorted(newlines, np.concatenate(([0], ends[:-1])))
+    level = np.full(starts.size, NONE, dtype=np.int8)
+    level[1:][classes[ends[:-1] - 1] == _STOP] = SENTENCE
+    level[gap_newlines >= 1] = LINE
+    level[gap_newlines >= 2] = PARAGRAPH
+
+    keep = starts >= start - context
+    words = text[start:].split()
+    sizes = {word: count_word(word) for word in set(words)}
+    tokens = np.fromiter(map(sizes.__getitem__, words), dtype=np.int64, count=len(words))
+    return Words(starts[keep] + context, ends[keep] + context, tokens, level[keep])
+
+
+def _last_between(indexes: List[int], low: int, high: int):
+    """The largest value in sorted `indexes` with low < value <= high, or None."""
+    i = bisect_right(indexes, high) - 1
+    return indexes[i] if i >= 0 and indexes[i] > low else None
+
+
+def word_ranges(words: Words, max_tokens: int, overlap: int = 0) -> List[Tuple[int, int, Span]]:
+    """
+    Splits scanned words into spans of at most `max_tokens` tokens (a
+    single word longer than that gets a span of its own). A span ends at
+    the strongest paragraph, line or sentence break in its back half, else
+    at the last word that fits. With `overlap`, each span starts up to that
+    many tokens before the end of the previous one. Returns (first word,
+    end word, Span) for each span; each end is found by bisection over
+    running token totals.
+    """
+    n = words.start.size
+    if not n:
+        return []
+    prefix = np.concatenate(([0], np.cumsum(words.tokens))).tolist()
+    # Sorted indexes of the words that start a new paragraph, line or sentence
+    breaks = [np.flatnonzero(words.level <= level).tolist() for level in (PARAGRAPH, LINE, SENTENCE)]
+
+    ranges = []
+    first = 0
+    while first < n:
+        # Most words that fit, but at least one
+        end = max(bisect_right(prefix, prefix[first] + max_tokens) - 1, first + 1)
+        if end < n:
+            half = first + (end - first) // 2
+            for indexes in breaks:
+                found = _last_between(indexes, half, end)
+                if found is not None:
+                    end = found
+                    break
+
+        ranges.append((first, end, Span(int(words.start[first]), int(words.end[end - 1]), prefix[end] - prefix[first])))
+        if end >= n:
+            break
+        # The next span starts at the earliest word that keeps the overlap
+        # within budget, but always after the start of this one
+        first = bisect_left(prefix, prefix[end] - overlap, first + 1, end) if overlap > 0 else end
+    return ranges
+
+
+def token_spans(text: str, max_tokens: int, count_word: Callable[[str], int], overlap: int = 0) -> List[Span]:
+    """
+    Splits `text` into spans of at most `max_tokens` tokens, measured as
+    the sum of the words' token counts (see word_ranges). The text is
+    scanned once and spans are returned as offsets, so overlapping text is
+    never copied.
+    """
+    return [span for _, _, span in word_ranges(scan_words(text, count_word), max_tokens, overlap)]
@@ -0,0 +1,121 @@
+# context_builder.py
+import re
+import time
+from typing import List, Tuple
+import numpy as np
+from config import (DEFAULT_MODEL, LLAMA_N_CTX, GEN_MAX_TOKENS,
+                    CONTEXT_TOKEN_BUDGET, CONTEXT_MMR_LAMBDA, CONTEXT_DUPLICATE_SIM)
+from . import llm, sqlite_helper, metrics
+from .vector_helper import SearchResult
+
+SEPARATOR = "\n\n"
+_WORD = re.compile(r"\S+")
+
+
+def _normalized(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def mmr_order(query, embeddings, lam: float = CONTEXT_MMR_LAMBDA, duplicate_sim: float = CONTEXT_DUPLICATE_SIM):
+    """
+    Maximal marginal relevance: repeatedly pick the candidate with the best
+    lam * similarity(query) - (1 - lam) * max similarity(already picked).
+    Candidates at least `duplicate_sim` similar to a picked one are dropped.
+    `embeddings` may contain None (unknown), which never counts as similar.
+    Returns (picked indexes in order, number of dropped duplicates).
+    """
+    known = [i for i, e in enumerate(embeddings) if e is not None]
+    relevance = np.zeros(len(embeddings), dtype=np.float32)
+    similar = np.zeros((len(embeddings), len(embeddings)), dtype=np.float32)
+    if known:
+        matrix = _normalized([embeddings[i] for i in known])
+        relevance[known] = matrix @ _normalized(query).ravel()
+        similar[np.ix_(known, known)] = matrix @ matrix.T
+
+    remaining = list(range(len(embeddings)))
+    picked, dropped = [], 0
+    redundancy = np.zeros(len(embeddings), dtype=np.float32)  # max similarity to a picked candidate
+    while remaining:
+        best = max(remaining, key=lambda i: lam * relevance[i] - (1 - lam) * redundancy[i])
+        remaining.remove(best)
+        picked.append(best)
+        redundancy = np.maximum(redundancy, similar[best])
+        kept = [i for i in remaining if redundancy[i] < duplicate_sim]
+        dropped += len(remaining) - len(kept)
+        remaining = kept
+    return picked, dropped
+
+
+def context_budget(question: str, max_tokens: int = GEN_MAX_TOKENS) -> int:
+    """Context tokens that fit beside the prompt template, the question and the answer."""
+    template = llm.count_tokens(llm.build_prompt("", question), DEFAULT_MODEL)
+    budget = LLAMA_N_CTX - max_tokens - template
+    if CONTEXT_TOKEN_BUDGET is not None:
+        budget = min(budget, CONTEXT_TOKEN_BUDGET)
+    return max(budget, 0)
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """The longest run of whole leading words of `text` that fits in `budget` tokens."""
+    ends = [m.end() for m in _WORD.finditer(text)]
+    low, high = 0, len(ends)  # words known to fit, words known not to (unless all fit)
+    while low < high:
+        mid = (low + high + 1) // 2
+        if llm.count_tokens(text[:ends[mid - 1]], DEFAULT_MODEL) <= budget:
+            low = mid
+        else:
+            high = mid - 1
+    return text[:ends[low - 1]] if low else ""
+
+
+def _embeddings(results: List[SearchResult]) -> list:
+    """The stored embedding of each result, looked up by its row id."""
+    stored = sqlite_helper.get_embeddings_by_ids([result.chunk_id for result in results])
+    return [stored.get(result.chunk_id) for result in results]
+
+
+def pack_context(question: str, q_embedding, results: List[SearchResult],
+                 max_tokens: int = GEN_MAX_TOKENS) -> Tuple[str, List[SearchResult]]:
+    """
+    Builds the prompt context from retrieved results. Near-duplicate chunks
+    are dropped, the rest are ordered by MMR over their stored embeddings
+    and packed greedily while they fit in the token budget of the
+    generator's window. The first chunk in that order is always packed,
+    cut to the budget if it does not fit whole. Returns (context, packed
+    results).
+    """
+    if not results:
+        return "", []
+
+    start = time.perf_counter()
+    texts = [result.chunk for result in results]
+    order, duplicates = mmr_order(q_embedding, _embeddings(results))
+
+    budget = context_budget(question, max_tokens)
+    separator_tokens = llm.count_tokens(SEPARATOR, DEFAULT_MODEL)
+    sizes = [llm.count_tokens(text, DEFAULT_MODEL) for text in texts]
+    packed, used = [], 0
+    for i in order:
+        cost = sizes[i] + (separator_tokens if packed else 0)
+        if used + cost <= budget:
+            packed.append(i)
+            used += cost
+
+    chosen = [results[i] for i in packed]
+    if not packed:
+        # Nothing fits whole: answer from as much of the best chunk as fits
+        top = results[order[0]]
+        chosen = [top._replace(chunk=truncate_to_tokens(top.chunk, budget))]
+        used = llm.count_tokens(chosen[0].chunk, DEFAULT_MODEL)
+
+    metrics.observe_stage("pack_context", time.perf_counter() - start)
+
+    naive = sum(sizes) + separator_tokens * (len(texts) - 1)
+    print(
+        f"[CONTEXT] Packed {len(chosen)}/{len(results)} chunks into {used}/{budget} tokens "
+        f"({duplicates} near-duplicates dropped, {naive - used} prompt tokens saved)"
+    )
+    return SEPARATOR.join(result.chunk for result in chosen), chosen
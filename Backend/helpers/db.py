@@ -0,0 +1,120 @@
+# db.py
+import os
+import sqlite3
+import threading
+import weakref
+from contextlib import contextmanager
+from config import (
+    DB_PATH, SQLITE_BUSY_TIMEOUT, SQLITE_SYNCHRONOUS, SQLITE_MMAP_SIZE,
+    SQLITE_CACHE_SIZE_KB, SQLITE_STATEMENT_CACHE
+)
+
+_local = threading.local()
+_connections = set()
+# Re-entrant: a finalizer can run during garbage collection while it is held
+_connections_lock = threading.RLock()
+_wal_enabled = False
+_epoch = 0  # bumped by close_all() so threads reopen instead of using a closed handle
+
+
+def _connect() -> sqlite3.Connection:
+    global _wal_enabled
+    os.makedirs(os.path.dirname(DB_PATH) or ".", exist_ok=True)
+    # Autocommit mode: single statements commit on their own, multi-statement
+    # work is grouped explicitly with transaction()
+    conn = sqlite3.connect(
+        DB_PATH,
+        timeout=SQLITE_BUSY_TIMEOUT,
+        isolation_level=None,
+        check_same_thread=False,
+        cached_statements=SQLITE_STATEMENT_CACHE
+    )
+    if not _wal_enabled:
+        # Journal mode is stored in the database file, so once is enough
+        conn.execute("PRAGMA journal_mode=WAL")
+        _wal_enabled = True
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA mmap_size={int(SQLITE_MMAP_SIZE)}")
+    conn.execute(f"PRAGMA cache_size={-int(SQLITE_CACHE_SIZE_KB)}")
+    conn.execute("PRAGMA temp_store=MEMORY")
+    return conn
+
+
+class _ThreadConnection:
+    """A thread's connection; its finalizer closes the connection once the thread-local drops it."""
+
+    __slots__ = ("conn", "epoch", "__weakref__")
+
+    def __init__(self, conn: sqlite3.Connection, epoch: int):
+        self.conn = conn
+        self.epoch = epoch
+
+
+def _release(conn: sqlite3.Connection):
+    with _connections_lock:
+        _connections.discard(conn)
+    try:
+        conn.close()
+    except sqlite3.Error:
+        pass
+
+
+def get_connection() -> sqlite3.Connection:
+    """
+    Returns this thread's connection, opening it on first use. Connections
+    stay open for the life of the thread so prepared statements and the
+    page cache are reused across calls, and are closed when it exits.
+    """
+    held = getattr(_local, "held", None)
+    if held is None or held.epoch != _epoch:
+        conn = _connect()
+        held = _ThreadConnection(conn, _epoch)
+        weakref.finalize(held, _release, conn)
+        with _connections_lock:
+            _connections.add(conn)
+        _local.held = held
+    return held.conn
+
+
+@contextmanager
+def transaction(immediate: bool = True):
+    """
+    Runs the enclosed statements in one transaction and yields a cursor.
+    BEGIN IMMEDIATE takes the write lock up front, so writers queue on the
+    busy timeout instead of failing with "database is locked" mid-way.
+    Nested use joins the outer transaction.
+    """
+    conn = get_connection()
+    c = conn.cursor()
+    if conn.in_transaction:
+        yield c
+        return
+    c.execute("BEGIN IMMEDIATE" if immediate else "BEGIN")
+    try:
+        yield c
+    except BaseException:
+        conn.rollback()
+        raise
+    conn.commit()
+
+
+def execute(sql: str, params=()) -> sqlite3.Cursor:
+    """Run one statement on this thread's connection (autocommitted)."""
+    return get_connection().execute(sql, params)
+
+
+def query(sql: str, params=()) -> list:
+    return get_connection().execute(sql, params).fetchall()
+
+
+def query_one(sql: str, params=()):
+    return get_connection().execute(sql, params).fetchone()
+
+
+def close_all():
+    """Close every pooled connection, e.g. at shutdown or before VACUUM."""
+    global _epoch
+    with _connections_lock:
+        _epoch += 1
+        for conn in list(_connections):
+            _release(conn)
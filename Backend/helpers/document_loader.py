@@ -1,8 +1,15 @@
 import os
 from pathlib import Path
-from .vector_helper import store_document_chunks
-from .extraction_helper import run_extractor
+from bisect import bisect_right
+from typing import Iterable, Iterator, List, Tuple
+from config import CHUNK_TOKENS, CHUNK_OVERLAP_TOKENS
+from . import llm, metrics
+from .chunker import Words, scan_words, word_ranges, word_counter
+from .vector_helper import Chunk, store_document_chunks
+from .extraction_helper import iter_text, iter_csv_batches
 
+# Character-budgeted splitter used before chunker.token_spans; kept as the
+# baseline of benchmarks/chunking.py
 def recursive_split(text, chunk_size=450, chunk_overlap=0, separators=None):
     if separators is None:
         separators = ["\n\n", "\n", " ", ""]  # Paragraph → line → space → char
@@ -50,27 +57,126 @@ def recursive_split(text, chunk_size=450, chunk_overlap=0, separators=None):
 
     return chunks
 
-def load_document(file_path):
+_count_word = None
+
+def embedding_word_counter():
+    """Memoized token counts of single words under the embedding model's tokenizer."""
+    global _count_word
+    if _count_word is None:
+        _count_word = word_counter(llm.count_tokens)
+    return _count_word
+
+def stream_split(segments: Iterable, max_tokens: int = CHUNK_TOKENS, overlap: int = CHUNK_OVERLAP_TOKENS,
+                 count_word=None, window: int = None) -> Iterator[Chunk]:
+    """
+    Chunks text that arrives in pieces (joined with "\n") with
+    chunker.word_ranges, holding at most about `window` characters at a
+    time. Once the buffer reaches the window it is chunked; the last chunk
+    is not emitted yet, and the buffer restarts where it begins so it can
+    still be packed together with the text that follows. Each piece of
+    text is scanned into words once: the words of the carried-over chunk
+    are kept rather than scanned again.
+    Pieces are strings or (text, page) pairs. Each Chunk records its
+    character offsets in the joined text and the pages it spans.
+    """
+    count_word = count_word or embedding_word_counter()
+    window = window or max_tokens * 64
+    buffer, size = [], 0
+    base = 0     # offset of the buffer in the whole text
+    marks = []   # (offset in the buffered text, page) where each page starts
+    carried = None  # words of the carried-over chunk, buffer[0]
+
+    def scan(text):
+        if carried is None:
+            return scan_words(text, count_word)
+        return Words.concat([carried, scan_words(text, count_word, len(buffer[0]))])
+
+    def page_at(pos):
+        i = bisect_right(marks, (pos, float("inf"))) - 1
+        return marks[i][1] if i >= 0 else None
+
+    def chunk(text, span):
+        return Chunk(text[span.start:span.end], page_at(span.start), page_at(span.end - 1),
+                     base + span.start, base + span.end)
+
+    for segment in segments:
+        text, page = segment if isinstance(segment, tuple) else (segment, None)
+        if page is not None and (not marks or marks[-1][1] != page):
+            marks.append((size, page))
+        buffer.append(text)
+        size += len(text) + 1
+        if size < window:
+            continue
+
+        text = "\n".join(buffer)
+        words = scan(text)
+        ranges = word_ranges(words, max_tokens, overlap)
+        # The last chunk is carried over, unless it is the only one
+        first, _, last = ranges.pop() if len(ranges) > 1 else (len(words.start), None, None)
+        keep = last.start if last else len(text)
+        for _, _, span in ranges:
+            yield chunk(text, span)
+        carried = words.tail(first, keep)
+        buffer = [text[keep:]]
+        size = len(buffer[0]) + 1
+        base += keep
+        before = [(0, p) for offset, p in marks if offset <= keep][-1:]
+        marks = before + [(offset - keep, p) for offset, p in marks if offset > keep]
+
+    text = "\n".join(buffer)
+    for _, _, span in word_ranges(scan(text), max_tokens, overlap):
+        yield chunk(text, span)
+
+def split_rows(batches: Iterable[Tuple[str, List[str]]], max_tokens: int = CHUNK_TOKENS, count=None) -> Iterator[Chunk]:
+    """
+    Packs table rows into chunks of up to `max_tokens` tokens that each
+    start with the header line, so every chunk is self-describing. Rows are
+    never split; a row too long to share a chunk gets one of its own.
+    `batches` yields (header, rows) as iter_csv_batches does.
+    """
+    count = count or llm.count_tokens
+    current, size, header_size = [], 0, 0
+    for header, rows in batches:
+        if not current:
+            header_size = count(header)
+            current, size = [header], header_size
+        for row in rows:
+            row_size = count(row)
+            if len(current) > 1 and size + row_size > max_tokens:
+                yield Chunk("\n".join(current))
+                current, size = [header], header_size
+            current.append(row)
+            size += row_size
+    if len(current) > 1:
+        yield Chunk("\n".join(current))
+
+def load_document(file_path, doc_name: str = None, progress=None):
     print(f"[LOADER] Loading document: {file_path}")
     """
     Reads a document, chunks it, embeds it, and stores it in the database.
+    Extraction, chunking and embedding are streamed, so memory use depends
+    on the chunk batch size rather than on the file size.
+    If given, progress(stage, done, total) is called as the stages advance.
     """
     path = Path(file_path)
     if not path.exists():
         raise FileNotFoundError(f"File not found: {file_path}")
-    
-    print(f"[LOADER] Extracting text from: {file_path}")
-    text = run_extractor(path)
 
-    if not text.strip():
-        print(f"[ERROR] No text found in {file_path}")
-        return
+    print(f"[LOADER] Extracting, chunking and storing: {file_path}")
+    if progress:
+        progress("extracting", 0, None)
+    if path.suffix.lower() == ".csv":
+        chunks = split_rows(iter_csv_batches(path))
+    else:
+        chunks = stream_split(iter_text(path))
 
-    print(f"[LOADER] Splitting text into chunks...")
-    chunks = recursive_split(text)
+    doc_name = doc_name or os.path.basename(file_path)
+    # Extraction and chunking run as the store pulls chunks; time them apart from it
+    with metrics.stage("ingest_document"):
+        stored = store_document_chunks(doc_name, metrics.timed_iter("ingest_extract_chunk", chunks), progress=progress)
 
-    print(f"[LOADER] Storing document chunks in database...")
-    doc_name = os.path.basename(file_path)
-    store_document_chunks(doc_name, chunks)
+    if not stored:
+        print(f"[ERROR] No text found in {file_path}")
+        raise ValueError(f"No text found in {path.name}")
 
-    print(f"[LOADER] Document '{doc_name}' loaded successfully.")
\ No newline at end of file
+    print(f"[LOADER] Document '{doc_name}' loaded successfully.")
@@ -0,0 +1,101 @@
+# embedding_cache.py
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+import numpy as np
+from config import EMBED_CACHE_SIZE, EMBED_CACHE_DISK, EMBED_CACHE_DISK_SIZE
+from . import sqlite_helper
+
+
+def cache_key(model_name: str, text: str) -> str:
+    """Stable key for an embedding: hash of the model name plus the exact text."""
+    return hashlib.sha256(f"{model_name}\0{text}".encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    Bounded in-memory LRU of embeddings with an optional SQLite tier
+    (the embedding_cache table, at most `disk_size` rows) that survives
+    restarts.
+    """
+
+    def __init__(self, max_size: int = EMBED_CACHE_SIZE, use_disk: bool = EMBED_CACHE_DISK,
+                 disk_size: int = EMBED_CACHE_DISK_SIZE):
+        self.max_size = max_size
+        self.use_disk = use_disk
+        self.disk_size = disk_size
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.dedup_hits = 0
+
+    def _remember(self, key: str, embedding: np.ndarray):
+        self._entries[key] = embedding
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """Return the cached embeddings among keys, checking memory first, then disk."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                emb = self._entries.get(key)
+                if emb is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = emb
+            self.memory_hits += len(found)
+
+        missing = [k for k in keys if k not in found]
+        if missing and self.use_disk:
+            from_disk = sqlite_helper.get_cached_embeddings(missing)
+            with self._lock:
+                for key, emb in from_disk.items():
+                    self._remember(key, emb)
+                self.disk_hits += len(from_disk)
+            found.update(from_disk)
+
+        with self._lock:
+            self.misses += len(set(keys) - found.keys())
+        return found
+
+    def get(self, key: str):
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        items = {k: np.asarray(v, dtype=np.float32) for k, v in items.items()}
+        with self._lock:
+            for key, emb in items.items():
+                self._remember(key, emb)
+        if self.use_disk and items:
+            sqlite_helper.put_cached_embeddings(items, self.disk_size)
+
+    def put(self, key: str, embedding):
+        self.put_many({key: embedding})
+
+    def record_dedup(self, count: int):
+        """Count chunks whose embedding was reused from an identical stored chunk."""
+        with self._lock:
+            self.dedup_hits += count
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "disk_tier": self.use_disk,
+                "disk_size": self.disk_size,
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+                "dedup_hits": self.dedup_hits,
+            }
+
+
+# Shared instance used by llm.embed_text / embed_texts
+cache = EmbeddingCache()
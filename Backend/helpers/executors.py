@@ -0,0 +1,136 @@
+# executors.py
+import time
+import asyncio
+import queue
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from config import EXECUTOR_WORKERS, EXECUTOR_MAX_QUEUE
+from . import metrics
+
+
+class OverloadedError(Exception):
+    """Raised when a model executor's queue is full."""
+
+
+class ModelExecutor:
+    """
+    Bounded thread pool for one kind of model call (whisper, embedder,
+    generator). At most `workers` calls run at once and at most `max_queue`
+    more may wait; anything beyond that is rejected with OverloadedError.
+    """
+
+    def __init__(self, name: str, workers: int, max_queue: int):
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._pending = 0  # queued + running
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _wrap(self, fn, args, kwargs):
+        submitted = time.perf_counter()
+
+        def task():
+            metrics.observe_stage(f"{self.name}_queue", time.perf_counter() - submitted)
+            with self._lock:
+                self._running += 1
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self._pending -= 1
+                    self.completed += 1
+        return task
+
+    def submit(self, fn, *args, **kwargs):
+        with self._lock:
+            if self._pending >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise OverloadedError(f"{self.name} queue is full ({self.max_queue} waiting)")
+            self._pending += 1
+        try:
+            # The caller's context (e.g. its request's stage timings) follows the call
+            return self._pool.submit(contextvars.copy_context().run, self._wrap(fn, args, kwargs))
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def run(self, fn, *args, **kwargs):
+        """Run fn on the pool and block the calling thread until it finishes."""
+        return self.submit(fn, *args, **kwargs).result()
+
+    async def run_async(self, fn, *args, **kwargs):
+        """Run fn on the pool without blocking the event loop."""
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stream(self, gen_fn, *args, **kwargs):
+        """
+        Run a generator function on the pool and yield its items to the
+        caller as they are produced. Closing the returned generator early
+        (e.g. the client disconnected) stops the worker at the next item.
+        """
+        items = queue.Queue()
+        cancelled = threading.Event()
+        done = object()
+
+        def produce():
+            try:
+                for item in gen_fn(*args, **kwargs):
+                    if cancelled.is_set():
+                        break
+                    items.put((item, None))
+            except Exception as e:
+                items.put((None, e))
+            finally:
+                items.put((done, None))
+
+        self.submit(produce)
+
+        def consume():
+            try:
+                while True:
+                    item, error = items.get()
+                    if error is not None:
+                        raise error
+                    if item is done:
+                        return
+                    yield item
+            finally:
+                cancelled.set()
+
+        return consume()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "running": self._running,
+                "queued": self._pending - self._running,
+                "max_queue": self.max_queue,
+                "completed": self.completed,
+                "rejected": self.rejected,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+
+executors = {
+    name: ModelExecutor(name, EXECUTOR_WORKERS[name], EXECUTOR_MAX_QUEUE[name])
+    for name in ("whisper", "embedder", "generator")
+}
+
+
+def queue_stats():
+    return {name: ex.stats() for name, ex in executors.items()}
+
+
+def shutdown():
+    for ex in executors.values():
+        ex.shutdown()
@@ -1,49 +1,184 @@
+import time
 import mimetypes
-import pymupdf as fitz
-from docx import Document as Docx
-import pandas as pd
+import multiprocessing
+import threading
+from collections import deque
+from itertools import islice
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
+from typing import Iterator, List, Tuple
+from config import PDF_PARALLEL_MIN_PAGES, PDF_WORKERS, PDF_PAGES_PER_TASK, CSV_BATCH_ROWS, TXT_BLOCK_CHARS
 
 ALLOWED_EXTS = {".pdf", ".docx", ".txt", ".csv"}
 
+# PyMuPDF, python-docx and pandas are imported by the extractors that use
+# them, so importing this module (and the app) does not pay for all three
+
 def detect_mime(path: str) -> str:
     mt, _ = mimetypes.guess_type(path)
     return mt or "application/octet-stream"
 
-def extract_pdf(path: Path) -> str:
-    doc = fitz.open(path)
-    all_text = []
-    for page in doc:
-        text = page.get_text("text") or ""
+# ---------- Streaming extractors ----------
+# Each yields the text of a document piece by piece (page, paragraph, line
+# or row); joined with "\n" the pieces give the whole document text.
+# PDF pieces are (text, page number) pairs so chunks can record their pages.
+
+_pdf_pool = None
+_pdf_pool_lock = threading.Lock()
+
+def _get_pdf_pool() -> ProcessPoolExecutor:
+    global _pdf_pool
+    with _pdf_pool_lock:
+        if _pdf_pool is None:
+            # Spawned, not forked: forking the threaded web process can copy
+            # locks held by other threads and deadlock the workers
+            _pdf_pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _pdf_pool
+
+def _extract_page_range(path: str, start: int, stop: int) -> List[str]:
+    """Runs in a worker process, which opens the document itself."""
+    import pymupdf as fitz
+    with fitz.open(path) as doc:
+        return [doc[i].get_text("text") or "" for i in range(start, stop)]
+
+def _iter_pdf_parallel(path: Path, page_count: int) -> Iterator[str]:
+    """
+    Page texts in order, read by the worker pool in PDF_PAGES_PER_TASK
+    ranges. Only a few ranges per worker are in flight at a time, so a
+    slow consumer does not make finished pages pile up in memory.
+    """
+    pool = _get_pdf_pool()
+    ranges = iter([(start, min(start + PDF_PAGES_PER_TASK, page_count))
+                   for start in range(0, page_count, PDF_PAGES_PER_TASK)])
+    pending = deque(pool.submit(_extract_page_range, str(path), *r) for r in islice(ranges, PDF_WORKERS * 2))
+    try:
+        while pending:
+            texts = pending.popleft().result()
+            next_range = next(ranges, None)
+            if next_range:
+                pending.append(pool.submit(_extract_page_range, str(path), *next_range))
+            yield from texts
+    finally:
+        for future in pending:
+            future.cancel()
+
+def _iter_pdf_serial(path: Path) -> Iterator[str]:
+    import pymupdf as fitz
+    with fitz.open(path) as doc:
+        for page in doc:
+            yield page.get_text("text") or ""
+
+def iter_pdf(path: Path) -> Iterator[tuple]:
+    import pymupdf as fitz
+    start = time.perf_counter()
+    with fitz.open(path) as doc:
+        page_count = doc.page_count
+    parallel = PDF_WORKERS > 1 and page_count >= PDF_PARALLEL_MIN_PAGES
+
+    pages = _iter_pdf_parallel(path, page_count) if parallel else _iter_pdf_serial(path)
+    for number, text in enumerate(pages, start=1):
         if text.strip():
-            all_text.append(text)
-    return "\n".join(all_text)
+            yield text, number
 
-def extract_docx(path: Path) -> str:
+    elapsed = max(time.perf_counter() - start, 1e-9)
+    mode = f"{PDF_WORKERS} processes" if parallel else "serial"
+    print(f"[EXTRACT] {path.name}: {page_count} pages in {elapsed:.2f}s ({page_count / elapsed:.1f} pages/s, {mode})")
+
+def iter_docx(path: Path) -> Iterator[str]:
+    from docx import Document as Docx
     d = Docx(path)
-    paras = [p.text for p in d.paragraphs if p.text.strip()]
-    return "\n".join(paras)
+    for p in d.paragraphs:
+        if p.text.strip():
+            yield p.text
 
-def extract_txt(path: Path) -> str:
+def _cut_line(line: str, size: int) -> Iterator[str]:
+    """
+    Pieces of at most `size` characters, each cut at the last space or tab
+    that allows it (the "\n" joining the pieces stands in for it), or
+    mid-word if there is none.
+    """
+    while len(line) > size:
+        cut = max(line.rfind(" ", 0, size + 1), line.rfind("\t", 0, size + 1))
+        if cut > 0:
+            yield line[:cut]
+            line = line[cut + 1:]
+        else:
+            yield line[:size]
+            line = line[size:]
+    yield line
+
+def iter_txt(path: Path, block_size: int = TXT_BLOCK_CHARS) -> Iterator[str]:
+    """
+    The lines of the file, read `block_size` characters at a time. Lines
+    longer than a block are cut into pieces (see _cut_line), so a file
+    without newlines is never held whole.
+    """
+    rest = ""
     with open(path, "r", encoding="utf-8", errors="ignore") as f:
-        return f.read()
+        while True:
+            block = f.read(block_size)
+            if not block:
+                break
+            *lines, rest = (rest + block).split("\n")
+            for line in lines:
+                yield from _cut_line(line, block_size)
+            *pieces, rest = _cut_line(rest, block_size)
+            yield from pieces
+    if rest:
+        yield rest
 
-def extract_csv(path: Path) -> str:
-    df = pd.read_csv(path)
-    lines = ["\t".join(map(str, df.columns.tolist()))]
-    for _, row in df.iterrows():
-        lines.append("\t".join(map(lambda x: "" if pd.isna(x) else str(x), row.tolist())))
-    return "\n".join(lines)
+def iter_csv_batches(path: Path, batch_rows: int = CSV_BATCH_ROWS) -> Iterator[Tuple[str, List[str]]]:
+    """
+    (header line, row lines) for every `batch_rows` rows, tab-separated.
+    Fields are read as the strings in the file (no type inference, empty
+    for missing values) and joined column by column rather than per row.
+    """
+    import pandas as pd
+    for df in pd.read_csv(path, chunksize=batch_rows, dtype=str, keep_default_na=False):
+        header = "\t".join(map(str, df.columns))
+        if df.empty:
+            continue
+        columns = [df[c] for c in df.columns]
+        rows = columns[0].str.cat(columns[1:], sep="\t") if len(columns) > 1 else columns[0]
+        yield header, rows.tolist()
 
-def run_extractor(path: Path) -> str:
+def iter_csv(path: Path, batch_rows: int = CSV_BATCH_ROWS) -> Iterator[str]:
+    header = None
+    for batch_header, rows in iter_csv_batches(path, batch_rows):
+        if header is None:
+            header = batch_header
+            yield header
+        yield from rows
+
+EXTRACTORS = {
+    ".pdf": iter_pdf,
+    ".docx": iter_docx,
+    ".txt": iter_txt,
+    ".csv": iter_csv,
+}
+
+def iter_text(path: Path) -> Iterator:
     ext = path.suffix.lower()
-    if ext == ".pdf":
-        return extract_pdf(path)
-    elif ext == ".docx":
-        return extract_docx(path)
-    elif ext == ".txt":
-        return extract_txt(path)
-    elif ext == ".csv":
-        return extract_csv(path)
-    else:
+    if ext not in EXTRACTORS:
         raise ValueError(f"Unsupported file type: {ext}")
+    return EXTRACTORS[ext](path)
+
+# ---------- Whole-document extractors ----------
+def extract_pdf(path: Path) -> str:
+    return "\n".join(text for text, _ in iter_pdf(path))
+
+def extract_docx(path: Path) -> str:
+    return "\n".join(iter_docx(path))
+
+def extract_txt(path: Path) -> str:
+    return "\n".join(iter_txt(path))
+
+def extract_csv(path: Path) -> str:
+    return "\n".join(iter_csv(path))
+
+def run_extractor(path: Path) -> str:
+    return "\n".join(s if isinstance(s, str) else s[0] for s in iter_text(path))
+
+def shutdown():
+    if _pdf_pool is not None:
+        _pdf_pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,157 @@
+# generation_scheduler.py
+import time
+import queue
+import threading
+from collections import deque
+from config import GEN_SLOTS, GEN_MAX_TOKENS, DEFAULT_MODEL
+from .prefix_cache import cache as prefix_cache
+
+_DONE = object()
+
+
+class GenerationRequest:
+    """
+    One queued completion. Iterate it to receive text pieces as the slot
+    decoding it produces them, then an llm.Usage with its token counts;
+    stop iterating to cancel it.
+    """
+
+    def __init__(self, prompt: str, temperature: float, max_tokens: int, stop, prefix: str = None):
+        self.prompt = prompt
+        self.prefix = prefix
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.stop = stop
+        self.submitted_at = time.perf_counter()
+        self.started_at = None
+        self.cancelled = threading.Event()
+        self._pieces = queue.Queue()
+
+    def __iter__(self):
+        try:
+            while True:
+                item = self._pieces.get()
+                if item is _DONE:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            self.cancelled.set()
+
+
+class GenerationScheduler:
+    """
+    A pool of `slots` independent llama.cpp contexts serving prompts in
+    arrival order. Each slot has its own KV cache and decodes one sequence
+    at a time with a blocking call, so up to `slots` requests generate in
+    parallel and the rest wait in the queue; sequences are not batched into
+    shared decode steps. The weights are memory-mapped, so the slots share
+    them.
+    """
+
+    def __init__(self, slots: int = GEN_SLOTS):
+        self.slots = slots
+        self._ready = queue.Queue()
+        self._start_lock = threading.Lock()
+        self._started = False
+        self._stats_lock = threading.Lock()
+        self._busy = 0
+        self.completed = 0
+        self.tokens_generated = 0
+        self._total_wait = 0.0
+        self._token_log = deque()  # (finished_at, tokens, started_at) of recent completions
+
+    def _ensure_started(self):
+        if self._started:
+            return
+        with self._start_lock:
+            if self._started:
+                return
+            for i in range(self.slots):
+                threading.Thread(target=self._slot_loop, args=(i,), name=f"gen-slot-{i}", daemon=True).start()
+            self._started = True
+
+    def submit(self, prompt: str, temperature: float = 0.7, max_tokens: int = GEN_MAX_TOKENS, stop=None, prefix: str = None) -> GenerationRequest:
+        """
+        Queue a completion. If `prompt` starts with a fixed `prefix`, the KV
+        state of that prefix is reused instead of being evaluated again.
+        """
+        self._ensure_started()
+        request = GenerationRequest(prompt, temperature, max_tokens, stop, prefix)
+        self._ready.put(request)
+        return request
+
+    # ---------- Threads ----------
+    def _slot_loop(self, slot: int):
+        from . import llm
+        model = None
+        while True:
+            request = self._ready.get()
+            if request.cancelled.is_set():
+                continue
+
+            with self._stats_lock:
+                self._busy += 1
+            request.started_at = time.perf_counter()
+            n_tokens = 0
+            try:
+                if model is None:
+                    model = llm.get_generator_slot(slot)
+                # Tokenized once, here: for the prefix cache, the completion and the usage
+                prompt_tokens = model.tokenize(request.prompt.encode("utf-8"), special=True)
+                if request.prefix and request.prompt.startswith(request.prefix):
+                    skipped = prefix_cache.prepare(model, f"{DEFAULT_MODEL}#slot{slot}", request.prefix, prompt_tokens)
+                    print(f"[LLM] Slot {slot}: reused KV state for {skipped} prompt tokens")
+                for part in model(
+                    prompt_tokens,
+                    max_tokens=request.max_tokens,
+                    temperature=request.temperature,
+                    stop=request.stop,
+                    stream=True
+                ):
+                    if request.cancelled.is_set():
+                        break
+                    n_tokens += 1
+                    text = part["choices"][0].get("text", "") if part.get("choices") else ""
+                    if text:
+                        request._pieces.put(text)
+                request._pieces.put(llm.Usage(len(prompt_tokens), n_tokens))
+            except Exception as e:
+                request._pieces.put(e)
+            finally:
+                request._pieces.put(_DONE)
+                self._record(request, n_tokens)
+
+    def _record(self, request: GenerationRequest, n_tokens: int):
+        now = time.perf_counter()
+        with self._stats_lock:
+            self._busy -= 1
+            self.completed += 1
+            self.tokens_generated += n_tokens
+            self._total_wait += request.started_at - request.submitted_at
+            self._token_log.append((now, n_tokens, request.started_at))
+            while self._token_log and now - self._token_log[0][0] > 60:
+                self._token_log.popleft()
+
+    def stats(self):
+        with self._stats_lock:
+            recent_tokens = sum(n for _, n, _ in self._token_log)
+            if self._token_log:
+                span = max(time.perf_counter() - min(start for _, _, start in self._token_log), 1e-9)
+            else:
+                span = 0
+            return {
+                "slots": self.slots,
+                "busy_slots": self._busy,
+                "waiting": self._ready.qsize(),
+                "completed": self.completed,
+                "tokens_generated": self.tokens_generated,
+                "avg_queue_wait_s": self._total_wait / self.completed if self.completed else 0.0,
+                "tokens_per_sec_last_minute": recent_tokens / span if span else 0.0,
+                "prefix_cache": prefix_cache.stats(),
+            }
+
+
+# Shared slot pool used by llm.local_generate_stream
+scheduler = GenerationScheduler()
@@ -0,0 +1,301 @@
+# ivf_index.py
+import os
+import json
+import time
+from typing import List, Optional, Tuple
+import numpy as np
+from config import IVF_NLIST, IVF_NPROBE, IVF_MIN_TRAIN, IVF_RETRAIN_GROWTH
+from . import sqlite_helper
+from .vector_index import VectorIndex
+
+# Per-row arrays and their dtypes; each one is a file in the index directory
+ROW_FILES = {"vectors": np.float32, "ids": np.int64, "codes": np.int32, "assign": np.int32}
+
+
+def nearest_centroids(vectors: np.ndarray, centroids: np.ndarray, batch: int = 8192) -> np.ndarray:
+    """Index of the closest (highest inner product) centroid for every row."""
+    labels = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), batch):
+        labels[start:start + batch] = np.argmax(vectors[start:start + batch] @ centroids.T, axis=1)
+    return labels
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means over unit vectors; returns k unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = np.array(vectors[rng.choice(len(vectors), k, replace=False)], dtype=np.float32)
+    for _ in range(iterations):
+        labels = nearest_centroids(vectors, centroids)
+        counts = np.bincount(labels, minlength=k)
+        order = np.argsort(labels, kind="stable")
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        filled = counts > 0
+        sums = np.add.reduceat(vectors[order], starts[filled], axis=0)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums / norms
+    return centroids
+
+
+class IVFIndex(VectorIndex):
+    """
+    Inverted-file (IVF-flat) index. Every row belongs to the nearest of
+    `nlist` k-means centroids and a search only scores the rows of the
+    `nprobe` clusters closest to the query, trading a little recall for far
+    fewer dot products. Below `min_train` rows it searches exhaustively.
+
+    Added rows are assigned to the existing clusters; the clusters are
+    retrained once the index has grown `retrain_growth` times since the last
+    training. With a `path`, the per-row arrays are memory-mapped files in
+    that directory, so a restart reopens them instead of rebuilding.
+    """
+
+    def __init__(self, path: Optional[str] = None, nlist: Optional[int] = IVF_NLIST, nprobe: int = IVF_NPROBE,
+                 min_train: int = IVF_MIN_TRAIN, retrain_growth: float = IVF_RETRAIN_GROWTH):
+        self.path = path
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_train = min_train
+        self.retrain_growth = retrain_growth
+        self._bulk = False
+        super().__init__()
+
+    def _reset(self):
+        super()._reset()
+        self._assign = np.empty(0, dtype=np.int32)
+        self._centroids = None
+        self._trained_size = 0
+        self._lists = None  # (row order, cluster offsets), rebuilt lazily after changes
+
+    # ---------- Storage ----------
+    def _file(self, name: str) -> str:
+        os.makedirs(self.path, exist_ok=True)
+        return os.path.join(self.path, name)
+
+    def _resize(self, name: str, array: np.ndarray, shape) -> np.ndarray:
+        dtype = ROW_FILES[name]
+        if self.path is None:
+            grown = np.empty(shape, dtype=dtype)
+            if self._size:
+                grown[:self._size] = array[:self._size]
+            return grown
+        # Row-major files only grow at the end, so mapping the file with a
+        # larger shape keeps every existing row in place
+        mode = "r+" if self._size else "w+"
+        return np.memmap(self._file(f"{name}.bin"), dtype=dtype, mode=mode, shape=shape)
+
+    def _reserve(self, extra: int, dim: int):
+        same_dim = self._matrix.shape[1] == dim
+        if not same_dim and self._size:
+            raise ValueError(f"Embedding dimension mismatch: index has {self._matrix.shape[1]}, got {dim}")
+        capacity = self._matrix.shape[0] if same_dim else 0
+        needed = self._size + extra
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        self._matrix = self._resize("vectors", self._matrix, (new_capacity, dim))
+        self._ids = self._resize("ids", self._ids, (new_capacity,))
+        self._codes = self._resize("codes", self._codes, (new_capacity,))
+        self._assign = self._resize("assign", self._assign, (new_capacity,))
+
+    def _save_meta(self, dirty: bool = False):
+        """
+        Flush the mapped rows and record what they hold. A dirty index is
+        being rewritten in place and is rebuilt instead of reopened.
+        """
+        if self.path is None:
+            return
+        for array in (self._matrix, self._ids, self._codes, self._assign):
+            if isinstance(array, np.memmap):
+                array.flush()
+        meta = {
+            "dirty": dirty,
+            "generation": sqlite_helper.get_generation(),
+            "size": self._size,
+            "capacity": int(self._matrix.shape[0]),
+            "dim": int(self._matrix.shape[1]),
+            "sources": {str(code): source for code, source in self._code_to_source.items()},
+            "next_code": self._next_code,
+            "trained_size": self._trained_size,
+        }
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def open(self) -> bool:
+        """
+        Map the persisted index files if they match the current database.
+        Returns False (leaving the index empty) if it must be rebuilt.
+        """
+        if self.path is None:
+            return False
+        try:
+            with open(os.path.join(self.path, "meta.json")) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if meta["dirty"] or not meta["capacity"] or meta["generation"] != sqlite_helper.get_generation():
+            return False
+
+        with self._lock:
+            self._reset()
+            try:
+                capacity, dim = meta["capacity"], meta["dim"]
+                mapped = {
+                    name: np.memmap(self._file(f"{name}.bin"), dtype=dtype, mode="r+",
+                                    shape=(capacity, dim) if name == "vectors" else (capacity,))
+                    for name, dtype in ROW_FILES.items()
+                }
+                centroids = np.load(self._file("centroids.npy")) if meta["trained_size"] else None
+            except (OSError, ValueError) as e:
+                print(f"[INDEX] Could not open persisted index: {e}")
+                return False
+
+            size = meta["size"]
+            max_id = int(mapped["ids"][:size].max()) if size else 0
+            if (size, max_id) != sqlite_helper.get_document_stats():
+                return False
+
+            self._matrix, self._ids, self._codes, self._assign = (
+                mapped["vectors"], mapped["ids"], mapped["codes"], mapped["assign"]
+            )
+            self._size = size
+            self._code_to_source = {int(code): source for code, source in meta["sources"].items()}
+            self._source_to_code = {source: code for code, source in self._code_to_source.items()}
+            self._next_code = meta["next_code"]
+            self._centroids = centroids
+            self._trained_size = meta["trained_size"]
+        return True
+
+    # ---------- Clustering ----------
+    def _maybe_train(self):
+        if self._size < self.min_train:
+            return
+        if self._centroids is not None and self._size < self._trained_size * self.retrain_growth:
+            return
+        self._train()
+
+    def _train(self):
+        start = time.perf_counter()
+        nlist = min(self.nlist or max(1, int(np.sqrt(self._size))), self._size)
+        rng = np.random.default_rng(0)
+        sample_size = min(self._size, nlist * 32)
+        sample = self._matrix[np.sort(rng.choice(self._size, sample_size, replace=False))]
+        centroids = kmeans(sample, nlist)
+
+        self._save_meta(dirty=True)  # cluster assignments are rewritten in place
+        self._assign[:self._size] = nearest_centroids(self._matrix[:self._size], centroids)
+        self._centroids = centroids
+        self._trained_size = self._size
+        self._lists = None
+        if self.path is not None:
+            np.save(self._file("centroids.npy"), centroids)
+        print(f"[INDEX] Trained {nlist} IVF clusters on {sample_size} of {self._size} rows in {time.perf_counter() - start:.1f}s")
+
+    def _cluster_lists(self):
+        if self._lists is None:
+            assign = self._assign[:self._size]
+            order = np.argsort(assign, kind="stable")
+            offsets = np.searchsorted(assign[order], np.arange(len(self._centroids) + 1))
+            self._lists = (order, offsets)
+        return self._lists
+
+    # ---------- Mutation ----------
+    def add(self, source: str, ids: List[int], embeddings):
+        with self._lock:
+            start = self._size
+            super().add(source, ids, embeddings)
+            if self._size == start or self._bulk:
+                return
+            if self._centroids is not None:
+                self._assign[start:self._size] = nearest_centroids(self._matrix[start:self._size], self._centroids)
+                self._lists = None
+            self._maybe_train()
+            self._save_meta()
+
+    def load(self, groups):
+        with self._lock:
+            self._save_meta(dirty=True)  # the files are rewritten from the start
+            self._bulk = True
+            try:
+                super().load(groups)
+            finally:
+                self._bulk = False
+            self._maybe_train()
+            self._save_meta()
+
+    def clear(self):
+        with self._lock:
+            super().clear()
+            self._save_meta(dirty=True)
+
+    def rename_source(self, source: str, new_name: str):
+        with self._lock:
+            super().rename_source(source, new_name)
+            self._save_meta()
+
+    def remove_source(self, source: str):
+        with self._lock:
+            if source not in self._source_to_code:
+                return
+            self._save_meta(dirty=True)  # rows are compacted in place
+            super().remove_source(source)
+            self._lists = None
+            self._save_meta()
+
+    def remove_ids(self, chunk_ids: List[int]):
+        with self._lock:
+            self._save_meta(dirty=True)
+            super().remove_ids(chunk_ids)
+            self._lists = None
+            self._save_meta()
+
+    def _compact(self, keep: np.ndarray):
+        kept = int(keep.sum())
+        self._assign[:kept] = self._assign[:self._size][keep]
+        super()._compact(keep)
+
+    # ---------- Search ----------
+    def search(self, query, top_k: int = 5, sources: Optional[List[str]] = None, nprobe: Optional[int] = None) -> List[Tuple[int, str, float]]:
+        """
+        Score only the rows of the `nprobe` clusters (default self.nprobe)
+        closest to the query; more clusters means higher recall and more
+        work. Source-filtered searches, untrained indexes and probes that
+        reach fewer than top_k rows use the exact scan instead.
+        """
+        q = np.asarray(query, dtype=np.float32).ravel()
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0 or top_k <= 0:
+            return []
+        q = q / q_norm
+
+        with self._lock:
+            if sources is not None or self._centroids is None:
+                return super().search(query, top_k, sources)
+            order, offsets = self._cluster_lists()
+            nprobe = max(1, min(nprobe or self.nprobe, len(self._centroids)))
+            closest = np.argpartition(-(self._centroids @ q), nprobe - 1)[:nprobe]
+            # Sorted row positions keep reads from the mapped file sequential
+            rows = np.sort(np.concatenate([order[offsets[c]:offsets[c + 1]] for c in closest]))
+            if rows.size < top_k:
+                return super().search(query, top_k)
+            return self._rank(q, rows, top_k)
+
+    def stats(self):
+        with self._lock:
+            stats = super().stats()
+            stats.update({
+                "type": "ivf",
+                "trained": self._centroids is not None,
+                "clusters": 0 if self._centroids is None else len(self._centroids),
+                "nprobe": self.nprobe,
+                "trained_rows": self._trained_size,
+                "persisted_at": self.path,
+            })
+            if self._centroids is not None and self._size:
+                sizes = np.bincount(self._assign[:self._size], minlength=len(self._centroids))
+                stats["avg_cluster_rows"] = float(sizes.mean())
+                stats["max_cluster_rows"] = int(sizes.max())
+            return stats
@@ -0,0 +1,101 @@
+# job_queue.py
+import os
+import uuid
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from config import INGEST_WORKERS
+from . import sqlite_helper
+from .document_loader import load_document
+from .vector_helper import delete_chunks
+
+# Stages a job moves through; "done" and "failed" are terminal
+STAGES = ("queued", "extracting", "chunking", "embedding", "storing", "done", "failed")
+UNFINISHED_STAGES = ("queued", "extracting", "chunking", "embedding", "storing")
+
+_executor = ThreadPoolExecutor(max_workers=INGEST_WORKERS, thread_name_prefix="ingest")
+
+
+def _run_job(job_id: str):
+    job = sqlite_helper.get_job(job_id)
+    if job is None:
+        return
+
+    def progress(stage, done, total):
+        fields = {"stage": stage, "chunks_done": done or 0}
+        if total is not None:
+            fields["chunks_total"] = total
+        sqlite_helper.update_job(job_id, **fields)
+
+    try:
+        print(f"[JOB] {job_id}: processing {job['path']}")
+        load_document(job["path"], doc_name=job["source"], progress=progress)
+        sqlite_helper.update_job(job_id, stage="done")
+        print(f"[JOB] {job_id}: done")
+    except Exception as e:
+        traceback.print_exc()
+        sqlite_helper.update_job(job_id, stage="failed", error=str(e))
+        print(f"[JOB] {job_id}: failed: {e}")
+
+
+def submit_job(path: str, source: str) -> str:
+    """
+    Registers an ingestion job for an already saved upload and queues it.
+    Returns the job id.
+    """
+    job_id = uuid.uuid4().hex
+    sqlite_helper.create_job(job_id, source, str(path))
+    _executor.submit(_run_job, job_id)
+    return job_id
+
+
+def _pid_alive(pid) -> bool:
+    if not pid:
+        return False
+    if os.name == "nt":
+        import ctypes
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)  # PROCESS_QUERY_LIMITED_INFORMATION
+        if not handle:
+            return False
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return True
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def resume_jobs():
+    """
+    Re-queues jobs that were still running or waiting when the server
+    last stopped. Any chunks they may have stored are dropped first so
+    the document is ingested exactly once. Jobs owned by another live
+    worker process are left alone, and each orphaned job is claimed by
+    exactly one worker.
+    """
+    resumed = 0
+    jobs = sqlite_helper.list_jobs(stages=list(UNFINISHED_STAGES))
+    for job in reversed(jobs):
+        if _pid_alive(job["worker_pid"]) or not sqlite_helper.claim_job(job["id"], job["worker_pid"]):
+            continue
+        resumed += 1
+        print(f"[JOB] Resuming {job['id']} ({job['source']}) from stage '{job['stage']}'")
+        delete_chunks(job["source"])
+        sqlite_helper.update_job(job["id"], stage="queued", chunks_done=0, error=None)
+        _executor.submit(_run_job, job["id"])
+    return resumed
+
+
+def get_job(job_id: str):
+    return sqlite_helper.get_job(job_id)
+
+
+def list_jobs():
+    return sqlite_helper.list_jobs()
+
+
+def shutdown():
+    """Stop accepting work; unfinished jobs are picked up by resume_jobs()."""
+    _executor.shutdown(wait=False, cancel_futures=True)
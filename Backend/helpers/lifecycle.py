@@ -0,0 +1,104 @@
+# lifecycle.py
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable
+from . import llm, whisper_helper
+
+# Model name -> function that loads it and runs one dummy inference
+WARMERS = {
+    "embedder": llm.warm_up_embedder,
+    "generator": llm.warm_up_generator,
+    "whisper": whisper_helper.warm_up,
+}
+
+_lock = threading.Lock()
+_steps: Dict[str, float] = {}  # startup step -> seconds
+_started = False               # every startup step has run
+_models: Dict[str, dict] = {}  # model name -> {"state", "seconds", "error"}
+_expected = set()              # models readiness waits for
+
+
+def check_models(names: Iterable[str]):
+    unknown = [name for name in names if name not in WARMERS]
+    if unknown:
+        raise ValueError(f"Unknown model(s) {', '.join(unknown)}, expected: {', '.join(WARMERS)}")
+
+
+def record_step(name: str, seconds: float):
+    with _lock:
+        _steps[name] = seconds
+
+
+def run_step(name: str, fn, *args):
+    """Runs one startup step and records how long it took."""
+    start = time.perf_counter()
+    result = fn(*args)
+    record_step(name, time.perf_counter() - start)
+    return result
+
+
+def finish_startup():
+    """Marks startup as done and logs the time each step took."""
+    global _started
+    with _lock:
+        _started = True
+        steps = dict(_steps)
+    breakdown = ", ".join(f"{name} {seconds:.2f}s" for name, seconds in steps.items())
+    print(f"[STARTUP] Ready to serve in {sum(steps.values()):.2f}s ({breakdown})")
+
+
+def _warm(name: str):
+    with _lock:
+        if _models.get(name, {}).get("state") in ("loading", "ready"):
+            return
+        _models[name] = {"state": "loading", "seconds": None, "error": None}
+    start = time.perf_counter()
+    try:
+        WARMERS[name]()
+    except Exception as e:
+        status = {"state": "failed", "seconds": time.perf_counter() - start, "error": f"{type(e).__name__}: {e}"}
+        print(f"[STARTUP] Warm-up of {name} failed: {status['error']}")
+    else:
+        status = {"state": "ready", "seconds": time.perf_counter() - start, "error": None}
+        print(f"[STARTUP] Warmed up {name} in {status['seconds']:.2f}s")
+    with _lock:
+        _models[name] = status
+
+
+def warm_up(names: Iterable[str]) -> Dict[str, dict]:
+    """
+    Loads the named models in parallel, one thread each, and waits for
+    them. Models already loading or warm are skipped; failed ones are
+    retried. Returns the status of every named model.
+    """
+    names = list(dict.fromkeys(names))
+    check_models(names)
+    with _lock:
+        _expected.update(names)
+    if names:
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=len(names), thread_name_prefix="warmup") as pool:
+            list(pool.map(_warm, names))
+        print(f"[STARTUP] Warm-up of {', '.join(names)} took {time.perf_counter() - start:.2f}s")
+    with _lock:
+        return {name: dict(_models[name]) for name in names}
+
+
+def warm_up_in_background(names: Iterable[str]) -> threading.Thread:
+    """Same as warm_up, without waiting; readiness reports progress."""
+    names = list(names)
+    check_models(names)
+    with _lock:
+        _expected.update(names)
+    thread = threading.Thread(target=warm_up, args=(names,), name="warmup", daemon=True)
+    thread.start()
+    return thread
+
+
+def readiness():
+    """(ready, details): startup has finished and every expected model is warm."""
+    with _lock:
+        models = {name: dict(_models.get(name, {"state": "pending", "seconds": None, "error": None})) for name in sorted(_expected)}
+        ready = _started and all(status["state"] == "ready" for status in models.values())
+        return ready, {"ready": ready, "startup": {"done": _started, "steps": dict(_steps)}, "models": models}
@@ -0,0 +1,100 @@
+# live_transcription.py
+from typing import List, Optional, Tuple
+import numpy as np
+from config import (AUDIO_SAMPLE_RATE, VAD_FRAME_MS, VAD_MARGIN_DB, VAD_MIN_DB,
+                    LIVE_SPEECH_START_MS, LIVE_END_SILENCE_MS, LIVE_PRE_ROLL_MS,
+                    LIVE_PARTIAL_INTERVAL_S, LIVE_MAX_UTTERANCE_S)
+from .audio import frame_levels
+
+
+class EnergyVAD:
+    """
+    Frame-level voice activity from signal energy. A frame is voiced when
+    it is `margin_db` above the tracked noise floor and above `min_db`.
+    The floor follows quiet frames quickly and loud ones slowly, so it
+    adapts to the room without being dragged up by speech.
+    """
+
+    def __init__(self, margin_db: float = VAD_MARGIN_DB, min_db: float = VAD_MIN_DB):
+        self.margin_db = margin_db
+        self.min_db = min_db
+        self.noise_db = None
+
+    def voiced(self, level_db: float) -> bool:
+        if self.noise_db is None:
+            self.noise_db = level_db
+        rate = 0.2 if level_db < self.noise_db else 0.005
+        self.noise_db += rate * (level_db - self.noise_db)
+        return level_db > self.min_db and level_db > self.noise_db + self.margin_db
+
+
+class LiveSegmenter:
+    """
+    Splits a live stream of 16 kHz samples into utterances. feed() returns
+    events as ("partial", audio so far) roughly every partial interval of
+    speech and ("final", utterance audio) once an utterance ends with
+    enough silence (or reaches the maximum length). flush() ends the
+    current utterance, e.g. when the client stops sending.
+    """
+
+    def __init__(self, sample_rate: int = AUDIO_SAMPLE_RATE):
+        self.frame = sample_rate * VAD_FRAME_MS // 1000
+        self.start_frames = max(1, LIVE_SPEECH_START_MS // VAD_FRAME_MS)
+        self.end_frames = max(1, LIVE_END_SILENCE_MS // VAD_FRAME_MS)
+        self.pre_roll_frames = LIVE_PRE_ROLL_MS // VAD_FRAME_MS
+        self.partial_frames = max(1, int(LIVE_PARTIAL_INTERVAL_S * 1000) // VAD_FRAME_MS)
+        self.max_frames = int(LIVE_MAX_UTTERANCE_S * 1000) // VAD_FRAME_MS
+        self.vad = EnergyVAD()
+        self._pending = np.empty(0, dtype=np.float32)  # samples short of a whole frame
+        self._frames: List[np.ndarray] = []  # pre-roll while idle, the utterance while speaking
+        self._speaking = False
+        self._voiced_run = 0
+        self._silent_run = 0
+        self._since_partial = 0
+
+    def feed(self, samples: np.ndarray) -> List[Tuple[str, np.ndarray]]:
+        samples = np.concatenate((self._pending, samples))
+        whole = len(samples) // self.frame * self.frame
+        self._pending = samples[whole:]
+        events = []
+        for frame, level in zip(samples[:whole].reshape(-1, self.frame), frame_levels(samples[:whole], self.frame)):
+            event = self._frame(frame, self.vad.voiced(level))
+            if event:
+                events.append(event)
+        return events
+
+    def _frame(self, frame: np.ndarray, voiced: bool) -> Optional[Tuple[str, np.ndarray]]:
+        self._frames.append(frame)
+        if not self._speaking:
+            self._voiced_run = self._voiced_run + 1 if voiced else 0
+            if self._voiced_run >= self.start_frames:
+                self._speaking = True
+                self._silent_run = 0
+                self._since_partial = 0
+            else:
+                # Keep only the pre-roll plus the voiced run that may start speech
+                excess = len(self._frames) - (self.pre_roll_frames + self._voiced_run)
+                if excess > 0:
+                    del self._frames[:excess]
+            return None
+
+        self._silent_run = 0 if voiced else self._silent_run + 1
+        self._since_partial += 1
+        if self._silent_run >= self.end_frames or len(self._frames) >= self.max_frames:
+            return self.flush()
+        if self._since_partial >= self.partial_frames:
+            self._since_partial = 0
+            return "partial", np.concatenate(self._frames)
+        return None
+
+    def flush(self) -> Optional[Tuple[str, np.ndarray]]:
+        """End the current utterance; returns its "final" event, or None if there was no speech."""
+        speaking, frames = self._speaking, self._frames
+        self._speaking = False
+        self._frames = []
+        self._voiced_run = 0
+        if not speaking:
+            return None
+        # Leave out most of the trailing silence that ended the utterance
+        trailing = max(0, self._silent_run - self.pre_roll_frames)
+        return "final", np.concatenate(frames[:len(frames) - trailing])
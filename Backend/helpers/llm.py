@@ -1,27 +1,71 @@
 # llm.py
 import os
+import time
+import threading
 import multiprocessing
-from llama_cpp import Llama
-from config import LLAMA_CPP_MODEL_DIR, EMBED_MODEL, DEFAULT_MODEL
+from typing import List, NamedTuple
+import numpy as np
+from config import LLAMA_CPP_MODEL_DIR, EMBED_MODEL, DEFAULT_MODEL, EMBED_BATCH_SIZE, MODEL_BACKEND, GEN_SLOTS, GEN_THREADS_PER_SLOT, LLAMA_N_CTX, GEN_MAX_TOKENS
+from .embedding_cache import cache as embedding_cache, cache_key
+from . import metrics
 
 # Cache for loaded Llama instances
 _loaded_models = {}
 
-def get_llm_cpp(model_name: str, embedding: bool = False):
+
+class Usage(NamedTuple):
+    """Token counts of one generation, sent after its last text piece."""
+    prompt_tokens: int
+    completion_tokens: int
+
+
+# A Llama instance is not safe for concurrent use; each one gets its own lock
+_model_locks = {}
+_locks_lock = threading.Lock()
+# Loads are serialized per cache key only, so different models (and
+# generator slots) can be loaded in parallel by the warm-up
+_load_locks = {}
+
+def get_model_lock(model_name: str) -> threading.Lock:
+    with _locks_lock:
+        return _model_locks.setdefault(model_name, threading.Lock())
+
+def _load_lock(key: str) -> threading.Lock:
+    with _locks_lock:
+        return _load_locks.setdefault(key, threading.Lock())
+
+def get_llm_cpp(model_name: str, embedding: bool = False, slot: int = None):
     """
     Loads a llama.cpp model and caches it for reuse.
+    Generator slots get their own context (KV cache) over the same weights.
     """
-    if model_name not in _loaded_models:
+    key = model_name if slot is None else f"{model_name}#slot{slot}"
+    if key in _loaded_models:
+        return _loaded_models[key]
+
+    with _load_lock(key):
+        if key in _loaded_models:
+            return _loaded_models[key]
+
+        # Imported on first load so the web app starts without llama.cpp
+        from llama_cpp import Llama
+
         model_path = os.path.join(LLAMA_CPP_MODEL_DIR, model_name)
         if not os.path.exists(model_path):
             raise FileNotFoundError(f"Model not found at: {model_path}")
 
-        print(f"[DEBUG] Loading llama-cpp model: {model_path}")
+        print(f"[DEBUG] Loading llama-cpp model: {model_path}" + (f" (slot {slot})" if slot is not None else ""))
+        start = time.perf_counter()
+
+        n_threads = multiprocessing.cpu_count()
+        if slot is not None and GEN_THREADS_PER_SLOT:
+            # Fewer threads per slot trade single-user speed for concurrency
+            n_threads = GEN_THREADS_PER_SLOT
 
         kwargs = dict(
             model_path=model_path,
-            n_ctx=2048,
-            n_threads=multiprocessing.cpu_count(),
+            n_ctx=LLAMA_N_CTX,
+            n_threads=n_threads,
             use_mmap=True,
             use_mlock=False,
             verbose=False
@@ -32,54 +76,227 @@ def get_llm_cpp(model_name: str, embedding: bool = False):
         else:
             kwargs.update(
                 n_batch=256,
-                n_parallel=2,
                 low_vram=False
             )
 
-        _loaded_models[model_name] = Llama(**kwargs)
+        _loaded_models[key] = Llama(**kwargs)
+        print(f"[DEBUG] Loaded {key} in {time.perf_counter() - start:.2f}s")
+
+    return _loaded_models[key]
+
+
+def get_tokenizer(model_name: str = EMBED_MODEL):
+    """
+    A vocabulary-only llama.cpp instance of a model, for counting tokens.
+    It loads no weights, so any process (including web workers in remote
+    mode) can afford one.
+    """
+    key = f"{model_name}#vocab"
+    if key in _loaded_models:
+        return _loaded_models[key]
+
+    with _load_lock(key):
+        if key not in _loaded_models:
+            from llama_cpp import Llama
+            model_path = os.path.join(LLAMA_CPP_MODEL_DIR, model_name)
+            if not os.path.exists(model_path):
+                raise FileNotFoundError(f"Model not found at: {model_path}")
+            _loaded_models[key] = Llama(model_path=model_path, vocab_only=True, verbose=False)
+    return _loaded_models[key]
+
+
+def count_tokens(text: str, model_name: str = EMBED_MODEL) -> int:
+    """Number of tokens `model_name` splits the text into (no BOS/EOS)."""
+    if MODEL_BACKEND == "stub":
+        from . import stub_models
+        return stub_models.count_tokens(text)
+    return len(get_tokenizer(model_name).tokenize(text.encode("utf-8"), add_bos=False, special=False))
+
+
+def get_generator_slot(slot: int):
+    """Returns the generation context for one scheduler slot."""
+    return get_llm_cpp(DEFAULT_MODEL, embedding=False, slot=slot)
+
+
+def local_embed(texts: List[str]):
+    """Embeds a batch of texts with the in-process embedding model."""
+    model = get_llm_cpp(EMBED_MODEL, embedding=True)
+    with get_model_lock(EMBED_MODEL):
+        return model.embed(texts)
 
-    return _loaded_models[model_name]
+
+def _embed_batch(texts: List[str]):
+    with metrics.stage("embed_model"):
+        if MODEL_BACKEND == "remote":
+            from . import model_client
+            return model_client.call("embed", texts)
+        if MODEL_BACKEND == "stub":
+            from . import stub_models
+            return stub_models.embed(texts)
+        return local_embed(texts)
 
 
 def embed_text(text: str):
     """
     Generates an embedding vector using the embedding model.
+    Results are memoized in the embedding cache.
     """
-    model = get_llm_cpp(EMBED_MODEL, embedding=True)
-    result = model.embed(text)
-    return result
+    with metrics.stage("embed"):
+        key = cache_key(EMBED_MODEL, text)
+        cached = embedding_cache.get(key)
+        if cached is not None:
+            return cached
 
+        result = np.asarray(_embed_batch([text])[0], dtype=np.float32)
+        embedding_cache.put(key, result)
+        return result
 
-def generate_response(context: str, query: str, temperature: float = 0.7, max_tokens: int = 512):
+
+def embed_texts(texts: List[str], batch_size: int = EMBED_BATCH_SIZE, use_cache: bool = True):
     """
-    Generates a chat completion from the main LLM model.
+    Embeds many texts, sending them to the embedding model in batches.
+    Returns one embedding per input text, in order. Texts repeated within
+    the call are embedded once; with `use_cache`, texts already in the
+    embedding cache are not re-embedded and new embeddings are cached.
+    Ingestion passes use_cache=False, since stored chunks are already
+    deduplicated by content hash.
     """
-    model = get_llm_cpp(DEFAULT_MODEL, embedding=False)
+    keys = [cache_key(EMBED_MODEL, text) for text in texts]
+    found = embedding_cache.get_many(keys) if use_cache else {}
+
+    # Embed each distinct missing text once
+    missing = {}
+    for key, text in zip(keys, texts):
+        if key not in found and key not in missing:
+            missing[key] = text
+
+    if missing:
+        missing_keys = list(missing)
+        missing_texts = list(missing.values())
+        fresh = {}
+        for start in range(0, len(missing_texts), batch_size):
+            batch = _embed_batch(missing_texts[start:start + batch_size])
+            fresh.update(zip(missing_keys[start:start + batch_size], np.asarray(batch, dtype=np.float32)))
+        if use_cache:
+            embedding_cache.put_many(fresh)
+        found.update(fresh)
+
+    return [found[key] for key in keys]
 
-    prompt = f"""You are an AI assistant. Answer the question in detail using the context provided. 
+
+# Fixed instruction preamble shared by every prompt; its KV state is cached
+PROMPT_PREFIX = """You are an AI assistant. Answer the question in detail using the context provided. 
 Include explanations, examples, and relevant information from the context.
 
 Context:
-{context}
+"""
+
+
+def build_prompt(context: str, query: str) -> str:
+    return PROMPT_PREFIX + f"""{context}
 
 Question:
 {query}
 
 Answer in a clear and concise manner:"""
 
-    response = model(
-        prompt,
-        max_tokens=max_tokens,
-        temperature=temperature,
-        stop=["</s>", "User:"]
-    )
-
-    if "choices" in response and len(response["choices"]) > 0:
-        return response["choices"][0].get("text", "").strip()
-    elif "content" in response:
-        return response["content"].strip()
+
+def generate_response(context: str, query: str, temperature: float = 0.7, max_tokens: int = GEN_MAX_TOKENS):
+    """
+    Generates a chat completion from the main LLM model.
+    """
+    return "".join(generate_response_stream(context, query, temperature, max_tokens)).strip()
+
+
+def generate_response_stream(context: str, query: str, temperature: float = 0.7, max_tokens: int = GEN_MAX_TOKENS):
+    """
+    Same as generate_response, but yields text pieces as the model produces them.
+    """
+    if MODEL_BACKEND == "remote":
+        from . import model_client
+        pieces = model_client.stream("generate_stream", context, query, temperature, max_tokens)
+    elif MODEL_BACKEND == "stub":
+        from . import stub_models
+        pieces = stub_models.generate_stream(context, query, temperature, max_tokens)
     else:
-        return ""
+        pieces = local_generate_stream(context, query, temperature, max_tokens)
+    return _measured(pieces)
+
+
+def _measured(pieces):
+    """
+    Passes generated text pieces through while recording the time to the
+    first piece ("prompt_eval", which includes any wait for a generator
+    slot) and the time after it ("generation"). The token counts come from
+    the Usage the generator sends last, so the prompt is not tokenized
+    again here.
+    """
+    start = time.perf_counter()
+    first_at = None
+    try:
+        for item in pieces:
+            if isinstance(item, Usage):
+                metrics.PROMPT_TOKENS.inc(item.prompt_tokens)
+                metrics.GENERATED_TOKENS.inc(item.completion_tokens)
+                continue
+            if first_at is None:
+                first_at = time.perf_counter()
+                metrics.observe_stage("prompt_eval", first_at - start)
+            yield item
+    finally:
+        if first_at is not None:
+            metrics.observe_stage("generation", time.perf_counter() - first_at)
+
+
+def local_generate_stream(context: str, query: str, temperature: float = 0.7, max_tokens: int = GEN_MAX_TOKENS):
+    """
+    Runs generate_response_stream against the in-process model. Requests go
+    through the generation scheduler so concurrent users decode in parallel
+    slots instead of queueing on one context. The text pieces are followed
+    by the slot's Usage.
+    """
+    from .generation_scheduler import scheduler
+
+    prompt = build_prompt(context, query)
+
+    start = time.perf_counter()
+    first_token_at = None
+    n_pieces = 0
+
+    for item in scheduler.submit(prompt, temperature=temperature, max_tokens=max_tokens, stop=["</s>", "User:"], prefix=PROMPT_PREFIX):
+        if isinstance(item, Usage):
+            print(f"[LLM] Streamed {item.completion_tokens} tokens in {n_pieces} pieces in {time.perf_counter() - start:.2f}s")
+        else:
+            if first_token_at is None:
+                first_token_at = time.perf_counter()
+                print(f"[LLM] Time to first token: {first_token_at - start:.2f}s")
+            n_pieces += 1
+        yield item
+
+
+def warm_up_embedder():
+    """Loads the embedding model and its tokenizer and embeds one text."""
+    count_tokens("warm-up", EMBED_MODEL)
+    _embed_batch(["warm-up"])
+
+
+def warm_up_generator():
+    """Loads the generator's tokenizer and every slot, then decodes one token."""
+    count_tokens("warm-up", DEFAULT_MODEL)
+    if MODEL_BACKEND == "local":
+        for slot in range(GEN_SLOTS):
+            get_generator_slot(slot)
+    # Also primes the prefix cache with the prompt template
+    generate_response("", "warm-up", temperature=0.0, max_tokens=1)
+
+
+def generation_stats():
+    """Slot use, queue wait and tokens/sec figures of the generation slot pool."""
+    if MODEL_BACKEND == "remote":
+        from . import model_client
+        return model_client.call("generation_stats")
+    from .generation_scheduler import scheduler
+    return scheduler.stats()
 
 
 if __name__ == "__main__":
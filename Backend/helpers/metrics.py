@@ -0,0 +1,205 @@
+# metrics.py
+# Prometheus-format counters and histograms, plus per-request stage timings
+# for the optional Server-Timing header. Recording is a lock and a few
+# additions, so it stays on in every code path.
+import time
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+from config import SERVER_TIMING
+
+# Upper bounds in seconds, from cache lookups to whole generations
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+_registry = []
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != float("inf") else "+Inf"
+
+
+class Counter:
+    """A monotonically increasing total per label combination."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, float] = {}
+        _registry.append(self)
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labelnames, key)} {_number(value)}"
+
+
+class Histogram:
+    """Observation counts per bucket upper bound, with their sum and count."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (), buckets: Iterable[float] = STAGE_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        self._values: Dict[tuple, list] = {}  # labels -> [per-bucket counts..., +Inf count, sum]
+        _registry.append(self)
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        bucket = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            counts[bucket] += 1
+            counts[-1] += value
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {key: list(counts) for key, counts in self._values.items()}
+        for key, counts in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                le = 'le="' + _number(bound) + '"'
+                yield f"{self.name}_bucket{_labels(self.labelnames, key, le)} {cumulative}"
+            yield f"{self.name}_sum{_labels(self.labelnames, key)} {_number(counts[-1])}"
+            yield f"{self.name}_count{_labels(self.labelnames, key)} {cumulative}"
+
+
+def render() -> str:
+    """Every metric in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in _registry:
+        lines.append(f"# HELP {metric.name} {metric.help}")
+        lines.append(f"# TYPE {metric.name} {metric.kind}")
+        lines.extend(metric.samples())
+    return "\n".join(lines) + "\n"
+
+
+REQUEST_SECONDS = Histogram("docqa_request_seconds", "HTTP request latency until the response is complete.", ("route", "method"))
+REQUESTS = Counter("docqa_requests_total", "HTTP requests by route and status code.", ("route", "method", "status"))
+STAGE_SECONDS = Histogram("docqa_stage_seconds", "Time spent in each pipeline stage.", ("stage",))
+PROMPT_TOKENS = Counter("docqa_prompt_tokens_total", "Prompt tokens sent to the generator.")
+GENERATED_TOKENS = Counter("docqa_generated_tokens_total", "Tokens produced by the generator.")
+CHUNKS_SCANNED = Counter("docqa_chunks_scanned_total", "Index rows scored against a query embedding.")
+AUDIO_SECONDS = Counter("docqa_audio_seconds_total", "Seconds of audio transcribed, before silence trimming.", ("tier",))
+
+# Stage durations of the current HTTP request, for the Server-Timing header;
+# None outside a request
+_request_stages: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_stages", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    """Records a stage duration in the histogram and in the current request's breakdown."""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    stages = _request_stages.get()
+    if stages is not None:
+        stages[stage] = stages.get(stage, 0.0) + seconds
+
+
+@contextmanager
+def stage(name: str):
+    """Times the enclosed block as pipeline stage `name`."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - start)
+
+
+def timed_iter(name: str, items: Iterable) -> Iterator:
+    """
+    Yields from `items`, recording the total time spent producing them
+    (not consuming them) as stage `name` once the iteration ends.
+    """
+    items = iter(items)
+    spent = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(items)
+            except StopIteration:
+                return
+            finally:
+                spent += time.perf_counter() - start
+            yield item
+    finally:
+        observe_stage(name, spent)
+
+
+def _route(scope) -> str:
+    """The matched route template (so ids in paths do not become labels)."""
+    route = scope.get("route")
+    if route is not None and hasattr(route, "path"):
+        return route.path
+    endpoint = scope.get("endpoint")
+    return getattr(endpoint, "__name__", "other")
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware that times every HTTP request, counts it by route and
+    status, and collects the stages it records (including those run on
+    the model executors) for a Server-Timing header when enabled.
+    """
+
+    def __init__(self, app, server_timing: bool = SERVER_TIMING):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        stages: Dict[str, float] = {}
+        token = _request_stages.set(stages)
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    entries = [f"{name};dur={seconds * 1000:.1f}" for name, seconds in dict(stages).items()]
+                    entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                    headers = list(message.get("headers", [])) + [(b"server-timing", ", ".join(entries).encode("latin-1"))]
+                    message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stages.reset(token)
+            route = _route(scope)
+            REQUEST_SECONDS.observe(time.perf_counter() - start, route=route, method=scope["method"])
+            REQUESTS.inc(route=route, method=scope["method"], status=status)
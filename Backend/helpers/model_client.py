@@ -0,0 +1,69 @@
+# model_client.py
+import threading
+from multiprocessing.connection import Client
+from config import MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY
+
+# One connection per thread; the protocol is strictly request/response
+_local = threading.local()
+
+
+class ModelServerError(Exception):
+    """Raised when the model server reports a failure for a request."""
+
+
+def _connection():
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = Client(MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY)
+        _local.conn = conn
+    return conn
+
+
+def _reset():
+    conn = getattr(_local, "conn", None)
+    _local.conn = None
+    if conn is not None:
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+def call(op: str, *args):
+    """Send one request to the model server and return its result."""
+    for attempt in range(2):
+        try:
+            conn = _connection()
+            conn.send((op, args))
+            status, payload = conn.recv()
+            break
+        except (EOFError, OSError):
+            # Stale connection (e.g. the server restarted); retry once
+            _reset()
+            if attempt:
+                raise
+    if status == "error":
+        raise ModelServerError(payload)
+    return payload
+
+
+def stream(op: str, *args):
+    """Send a streaming request and yield each item the server sends back."""
+    conn = _connection()
+    finished = False
+    try:
+        conn.send((op, args))
+        while True:
+            status, payload = conn.recv()
+            if status == "token":
+                yield payload
+            elif status == "end":
+                finished = True
+                return
+            else:
+                finished = True
+                raise ModelServerError(payload)
+    finally:
+        # Abandoned mid-stream: the rest of the reply is still in flight
+        if not finished:
+            _reset()
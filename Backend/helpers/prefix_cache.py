@@ -0,0 +1,88 @@
+# prefix_cache.py
+import hashlib
+import threading
+from typing import List
+
+
+def _common_prefix_len(a, b) -> int:
+    n = 0
+    for x, y in zip(a, b):
+        if x != y:
+            break
+        n += 1
+    return n
+
+
+class PrefixStateCache:
+    """
+    Saved llama.cpp states holding the KV cache of a fixed prompt prefix
+    (the instruction preamble), keyed by model/slot and template.
+
+    Before a completion, prepare() makes sure the context already holds the
+    prefix, restoring the saved state if needed. llama.cpp then matches the
+    evaluated tokens against the new prompt and only evaluates the rest.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._states = {}
+        self.builds = 0
+        self.restores = 0
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.skipped_tokens = 0
+
+    def prepare(self, model, model_key: str, prefix: str, prompt_tokens: List[int]) -> int:
+        """
+        Get `model` ready to evaluate `prompt_tokens`, a prompt that starts
+        with `prefix`, tokenized as llama-cpp-python tokenizes completion
+        prompts. Must be called by the only thread using `model`. Returns
+        how many prompt tokens will be skipped because their KV state is
+        reused.
+        """
+        # Same tokenization llama-cpp-python uses for completion prompts
+        prefix_tokens = model.tokenize(prefix.encode("utf-8"), special=True)
+        # The last prefix token may merge with what follows, so leave it out
+        prefix_tokens = prefix_tokens[:-1]
+
+        key = (model_key, hashlib.sha256(prefix.encode("utf-8")).hexdigest())
+        usable = _common_prefix_len(prefix_tokens, prompt_tokens)
+        current = _common_prefix_len(model._input_ids, prompt_tokens[:-1])
+
+        if usable == len(prefix_tokens) and current < usable:
+            with self._lock:
+                state = self._states.get(key)
+            if state is None:
+                model.reset()
+                model.eval(prefix_tokens)
+                state = model.save_state()
+                with self._lock:
+                    self._states[key] = state
+                    self.builds += 1
+            else:
+                model.load_state(state)
+                with self._lock:
+                    self.restores += 1
+            current = usable
+
+        skipped = min(current, len(prompt_tokens) - 1)
+        with self._lock:
+            self.requests += 1
+            self.prompt_tokens += len(prompt_tokens)
+            self.skipped_tokens += skipped
+        return skipped
+
+    def stats(self):
+        with self._lock:
+            return {
+                "cached_prefixes": len(self._states),
+                "builds": self.builds,
+                "restores": self.restores,
+                "requests": self.requests,
+                "prompt_tokens": self.prompt_tokens,
+                "prompt_tokens_skipped": self.skipped_tokens,
+            }
+
+
+# Shared instance used by the generation scheduler slots
+cache = PrefixStateCache()
@@ -0,0 +1,59 @@
+# quantization.py
+from typing import Tuple
+import numpy as np
+
+# "int8": one signed byte per dimension plus a per-vector scale (4x smaller)
+# "binary": one sign bit per dimension (32x smaller)
+KINDS = ("int8", "binary")
+
+_POPCOUNT = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+_BLOCK = 65536  # rows scored at a time, bounds the temporary xor arrays
+
+
+def code_dtype(kind: str):
+    return np.int8 if kind == "int8" else np.uint8
+
+def code_width(dim: int, kind: str) -> int:
+    """Bytes per vector for the given dimension."""
+    return dim if kind == "int8" else (dim + 7) // 8
+
+def quantize(vectors, kind: str) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Quantizes float vectors (normalized first) into (codes, scales).
+    int8 maps each vector's largest component to +-127; binary keeps the
+    sign of every component and has a scale of 1.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    vectors = vectors.reshape(len(vectors), -1)
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    vectors = vectors / norms
+
+    if kind == "int8":
+        peak = np.abs(vectors).max(axis=1)
+        peak[peak == 0] = 1.0
+        scales = (127.0 / peak).astype(np.float32)
+        codes = np.rint(vectors * scales[:, None]).astype(np.int8)
+        return codes, scales
+    if kind == "binary":
+        return np.packbits(vectors > 0, axis=1), np.ones(len(vectors), dtype=np.float32)
+    raise ValueError(f"Unknown quantization '{kind}', expected one of: {', '.join(KINDS)}")
+
+def score(codes: np.ndarray, scales: np.ndarray, query: np.ndarray, kind: str, dim: int) -> np.ndarray:
+    """
+    Approximate cosine similarity of a unit query against quantized rows.
+    int8 quantizes the query too and takes integer dot products (int32
+    accumulation, no float copy of the codes); binary uses
+    1 - 2 * hamming / dim.
+    """
+    if kind == "int8":
+        query_codes, query_scale = quantize(query[None, :], kind)
+        dots = np.einsum("ij,j->i", codes, query_codes[0], dtype=np.int32)
+        return np.divide(dots, scales * query_scale[0], dtype=np.float32)
+
+    scores = np.empty(len(codes), dtype=np.float32)
+    query_bits = np.packbits(query > 0)
+    for start in range(0, len(codes), _BLOCK):
+        differing = _POPCOUNT[codes[start:start + _BLOCK] ^ query_bits].sum(axis=1, dtype=np.int32)
+        scores[start:start + _BLOCK] = 1.0 - 2.0 * differing / dim
+    return scores
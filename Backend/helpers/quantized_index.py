@@ -0,0 +1,129 @@
+# quantized_index.py
+from typing import List, Optional, Tuple
+import numpy as np
+from config import QUANT_RERANK_CANDIDATES
+from . import sqlite_helper, metrics
+from .quantization import code_dtype, code_width, quantize, score
+from .vector_index import VectorIndex
+
+
+class QuantizedIndex(VectorIndex):
+    """
+    Flat index that keeps int8 or 1-bit codes in memory instead of float32
+    rows. Searches score every code, then re-rank the best `candidates`
+    exactly against their full-precision embeddings, which are read from
+    the database (`fetch`) only for those rows.
+    """
+
+    def __init__(self, kind: str, candidates: int = QUANT_RERANK_CANDIDATES, fetch=None):
+        self.kind = kind
+        self.candidates = candidates
+        self.fetch = fetch or sqlite_helper.get_embeddings_by_ids
+        super().__init__()
+
+    def _reset(self):
+        super()._reset()
+        self._dim = 0
+        self._matrix = np.empty((0, 0), dtype=code_dtype(self.kind))
+        self._scales = np.empty(0, dtype=np.float32)
+
+    def _reserve(self, extra: int, dim: int):
+        if self._dim != dim:
+            if self._size:
+                raise ValueError(f"Embedding dimension mismatch: index has {self._dim}, got {dim}")
+            self._dim = dim
+            self._matrix = np.empty((0, code_width(dim, self.kind)), dtype=code_dtype(self.kind))
+        needed = self._size + extra
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        matrix = np.empty((new_capacity, self._matrix.shape[1]), dtype=self._matrix.dtype)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        codes = np.empty(new_capacity, dtype=np.int32)
+        scales = np.empty(new_capacity, dtype=np.float32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        codes[:self._size] = self._codes[:self._size]
+        scales[:self._size] = self._scales[:self._size]
+        self._matrix, self._ids, self._codes, self._scales = matrix, ids, codes, scales
+
+    # ---------- Mutation ----------
+    def add(self, source: str, ids: List[int], embeddings):
+        if len(ids) == 0:
+            return
+        vectors = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        codes, scales = quantize(vectors, self.kind)
+        self.add_codes(source, ids, codes, scales, vectors.shape[1])
+
+    def add_codes(self, source: str, ids: List[int], codes: np.ndarray, scales: np.ndarray, dim: int):
+        """Append rows that are already quantized with this index's kind."""
+        if len(ids) == 0:
+            return
+        with self._lock:
+            self._reserve(len(ids), dim)
+            start, end = self._size, self._size + len(ids)
+            self._matrix[start:end] = codes
+            self._scales[start:end] = scales
+            self._ids[start:end] = ids
+            self._codes[start:end] = self._code_for(source)
+            self._size = end
+
+    def _compact(self, keep: np.ndarray):
+        kept = int(keep.sum())
+        self._scales[:kept] = self._scales[:self._size][keep]
+        super()._compact(keep)
+
+    def load_from_db(self) -> int:
+        """Load the stored codes; rows quantized differently (or not yet) are quantized here."""
+        by_source = {}
+        for chunk_id, source, dim, qcode, qscale, embedding in sqlite_helper.get_all_quantized(self.kind):
+            if qcode is not None:
+                code = np.frombuffer(qcode, dtype=code_dtype(self.kind))
+            else:
+                codes, scales = quantize(embedding[None, :], self.kind)
+                code, qscale, dim = codes[0], scales[0], embedding.shape[0]
+            ids, codes_list, scales_list, _ = by_source.setdefault(source, ([], [], [], dim))
+            ids.append(chunk_id)
+            codes_list.append(code)
+            scales_list.append(qscale)
+
+        with self._lock:
+            self._reset()
+            for source, (ids, codes, scales, dim) in by_source.items():
+                self.add_codes(source, ids, np.stack(codes), np.asarray(scales, dtype=np.float32), dim)
+        return len(by_source)
+
+    # ---------- Search ----------
+    def _rank(self, q: np.ndarray, rows: Optional[np.ndarray], top_k: int) -> List[Tuple[int, str, float]]:
+        if rows is None:
+            # Slices, so the codes are scored in place rather than copied
+            rows = np.arange(self._size)
+            approx = score(self._matrix[:self._size], self._scales[:self._size], q, self.kind, self._dim)
+        else:
+            approx = score(self._matrix[rows], self._scales[rows], q, self.kind, self._dim)
+        metrics.CHUNKS_SCANNED.inc(rows.size)
+
+        k = min(max(top_k, self.candidates), approx.shape[0])
+        candidates = rows[np.argpartition(-approx, k - 1)[:k]]
+        candidate_ids = [int(i) for i in self._ids[candidates]]
+        exact = self.fetch(candidate_ids)
+
+        hits = []
+        for row, chunk_id in zip(candidates, candidate_ids):
+            embedding = exact.get(chunk_id)
+            if embedding is None:
+                continue  # deleted since the codes were scored
+            embedding = np.asarray(embedding, dtype=np.float32)
+            norm = np.linalg.norm(embedding)
+            similarity = float(embedding @ q / norm) if norm else 0.0
+            hits.append((chunk_id, self._code_to_source[int(self._codes[row])], similarity))
+        hits.sort(key=lambda hit: hit[2], reverse=True)
+        return hits[:top_k]
+
+    def stats(self):
+        with self._lock:
+            stats = super().stats()
+            stats["vector_bytes"] += int(self._scales[:self._size].nbytes)
+        stats.update({"type": f"flat-{self.kind}", "rerank_candidates": self.candidates})
+        return stats
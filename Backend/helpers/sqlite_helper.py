@@ -1,121 +1,329 @@
 # sqlite_helper.py
-import sqlite3
 import json
 import os
+import re
+import sqlite3
 from typing import List, Tuple
 from datetime import datetime
-from config import DB_PATH
+import numpy as np
+from config import EMBEDDING_QUANTIZATION
+from .db import transaction, query, query_one, execute
+from .quantization import quantize
+
+# Embeddings are stored as raw little-endian float32 BLOBs
+EMBEDDING_DTYPE = np.dtype("<f4")
+
+
+# ---------- Embedding Encoding ----------
+def pack_embedding(embedding) -> Tuple[bytes, int, float]:
+    """
+    Encodes an embedding as (float32 blob, dimension, L2 norm).
+    """
+    vec = np.asarray(embedding, dtype=EMBEDDING_DTYPE).ravel()
+    return vec.tobytes(), int(vec.shape[0]), float(np.linalg.norm(vec))
+
+def unpack_embedding(value) -> np.ndarray:
+    """
+    Decodes a stored embedding. BLOBs are wrapped zero-copy with
+    numpy.frombuffer; legacy JSON text rows are still understood.
+    """
+    if value is None:
+        return None
+    if isinstance(value, (bytes, memoryview)):
+        return np.frombuffer(value, dtype=EMBEDDING_DTYPE)
+    return np.asarray(json.loads(value), dtype=EMBEDDING_DTYPE)
+
+def _ensure_columns(c, table: str, columns: dict):
+    existing = {row[1] for row in c.execute(f"PRAGMA table_info({table})")}
+    for name, decl in columns.items():
+        if name not in existing:
+            c.execute(f"ALTER TABLE {table} ADD COLUMN {name} {decl}")
 
 
 def init_db():
     """
     Initializes the SQLite database with tables for documents and Q&A history.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+    with transaction() as c:
+        # Table for storing PDF chunks and embeddings
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT NOT NULL,               
+                chunk TEXT NOT NULL,                
+                embedding BLOB NOT NULL,
+                dim INTEGER,
+                norm REAL,
+                content_hash TEXT
+            )
+        """)
 
-    # Table for storing PDF chunks and embeddings
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS documents (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source TEXT NOT NULL,               
-            chunk TEXT NOT NULL,                
-            embedding TEXT NOT NULL              
-        )
-    """)
+        # Table for storing Q&A history
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS qa_history (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                source TEXT,                         
+                question TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                embedding BLOB NOT NULL,
+                timestamp TEXT NOT NULL,
+                dim INTEGER,
+                norm REAL
+            )
+        """)
+
+        # Table for tracking background ingestion jobs
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                source TEXT NOT NULL,
+                path TEXT NOT NULL,
+                stage TEXT NOT NULL,
+                chunks_done INTEGER NOT NULL DEFAULT 0,
+                chunks_total INTEGER,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                worker_pid INTEGER
+            )
+        """)
+
+        # Change counter so other worker processes can tell when documents changed
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS meta (
+                key TEXT PRIMARY KEY,
+                value INTEGER NOT NULL
+            )
+        """)
+        c.execute("INSERT OR IGNORE INTO meta (key, value) VALUES ('documents_generation', 0)")
+
+        # Persistent tier of the embedding cache, keyed by hash(model + text)
+        c.execute("""
+            CREATE TABLE IF NOT EXISTS embedding_cache (
+                key TEXT PRIMARY KEY,
+                embedding BLOB NOT NULL,
+                created_at TEXT NOT NULL
+            )
+        """)
+
+        # Databases created before BLOB storage lack the dim/norm columns
+        _ensure_columns(c, "documents", {
+            "dim": "INTEGER", "norm": "REAL", "content_hash": "TEXT",
+            # Quantized copy of the embedding for the resident index (see quantization.py)
+            "qkind": "TEXT", "qcode": "BLOB", "qscale": "REAL",
+            # First and last page a chunk came from, for paged formats (PDF)
+            "page_start": "INTEGER", "page_end": "INTEGER",
+            # Character offsets of the chunk in the extracted document text
+            "char_start": "INTEGER", "char_end": "INTEGER"
+        })
+        _ensure_columns(c, "qa_history", {"dim": "INTEGER", "norm": "REAL"})
+        _ensure_columns(c, "jobs", {"worker_pid": "INTEGER"})
+        c.execute("CREATE INDEX IF NOT EXISTS idx_documents_content_hash ON documents(content_hash)")
+        # Older versions also cached every ingested chunk, duplicating documents.embedding
+        c.execute("""
+            DELETE FROM embedding_cache
+            WHERE key IN (SELECT content_hash FROM documents WHERE content_hash IS NOT NULL)
+        """)
+
+        _create_fts(c)
+
+
+# ---------- Full-text Index ----------
+# External-content FTS5 tables mirror documents.chunk and qa_history
+# question/answer; the triggers keep them in sync on every write.
+FTS_TABLES = {
+    "documents_fts": ("documents", ("chunk",)),
+    "qa_history_fts": ("qa_history", ("question", "answer")),
+}
+fts_enabled = False
+
+def _create_fts(c):
+    global fts_enabled
+    existing = {row[0] for row in c.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    try:
+        for fts, (table, columns) in FTS_TABLES.items():
+            cols = ", ".join(columns)
+            new_cols = ", ".join(f"new.{col}" for col in columns)
+            old_cols = ", ".join(f"old.{col}" for col in columns)
+            c.execute(f"""
+                CREATE VIRTUAL TABLE IF NOT EXISTS {fts}
+                USING fts5({cols}, content='{table}', content_rowid='id')
+            """)
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+                END
+            """)
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                END
+            """)
+            c.execute(f"""
+                CREATE TRIGGER IF NOT EXISTS {table}_fts_update AFTER UPDATE OF {cols} ON {table} BEGIN
+                    INSERT INTO {fts} ({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols});
+                    INSERT INTO {fts} (rowid, {cols}) VALUES (new.id, {new_cols});
+                END
+            """)
+            if fts not in existing:
+                # Index the rows written before the FTS table existed
+                print(f"[DB] Building full-text index {fts}")
+                c.execute(f"INSERT INTO {fts} ({fts}) VALUES ('rebuild')")
+        fts_enabled = True
+    except sqlite3.OperationalError as e:
+        # SQLite built without FTS5; keyword search falls back to LIKE
+        print(f"[DB] Full-text search unavailable: {e}")
+        fts_enabled = False
+
+def fts_query(text: str, match_all: bool = False) -> str:
+    """
+    Turns free text into a safe FTS5 MATCH expression: every word becomes a
+    quoted prefix term, combined with AND (match_all) or OR.
+    """
+    terms = [f'"{word}"*' for word in re.findall(r"\w+", text.lower())]
+    return (" AND " if match_all else " OR ").join(terms)
 
-    # Table for storing Q&A history
-    c.execute("""
-        CREATE TABLE IF NOT EXISTS qa_history (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            source TEXT,                         
-            question TEXT NOT NULL,
-            answer TEXT NOT NULL,
-            embedding TEXT NOT NULL,
-            timestamp TEXT NOT NULL
-        )
-    """)
 
-    conn.commit()
-    conn.close()
+def _bump_generation(c):
+    c.execute("UPDATE meta SET value = value + 1 WHERE key = 'documents_generation'")
+
+def get_generation() -> int:
+    """Counter bumped on every change to the documents table."""
+    row = query_one("SELECT value FROM meta WHERE key = 'documents_generation'")
+    return row[0] if row else 0
+
+def get_document_stats() -> Tuple[int, int]:
+    """Return (chunk count, highest chunk id) of the documents table."""
+    row = query_one("SELECT COUNT(*), COALESCE(MAX(id), 0) FROM documents")
+    return row[0], row[1]
 
 
 # ---------- Document Functions ----------
-def add_document(source: str, chunk: str, embedding: List[float]):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
+def add_document(source: str, chunk: str, embedding: List[float]) -> int:
+    with transaction() as c:
+        c.execute("""
+            INSERT INTO documents (source, chunk, embedding, dim, norm)
+            VALUES (?, ?, ?, ?, ?)
+        """, (source, chunk, *pack_embedding(embedding)))
+        chunk_id = c.lastrowid
+        _bump_generation(c)
+    return chunk_id
+
+
+def add_documents(source: str, chunks: List[str], embeddings, content_hashes: List[str] = None,
+                  locations: List[Tuple[int, int, int, int]] = None) -> List[int]:
+    """
+    Inserts all chunks of a document with executemany in a single
+    transaction. `locations` optionally holds each chunk's (page_start,
+    page_end, char_start, char_end). Returns the new row ids in chunk order.
+    """
+    if not chunks:
+        return []
+    if content_hashes is None:
+        content_hashes = [None] * len(chunks)
+    if locations is None:
+        locations = [(None, None, None, None)] * len(chunks)
+    if EMBEDDING_QUANTIZATION != "none":
+        codes, scales = quantize(embeddings, EMBEDDING_QUANTIZATION)
+        quantized = [(EMBEDDING_QUANTIZATION, code.tobytes(), float(scale)) for code, scale in zip(codes, scales)]
+    else:
+        quantized = [(None, None, None)] * len(chunks)
+    # The transaction holds the write lock from the start, so the AUTOINCREMENT ids are contiguous
+    with transaction() as c:
+        c.executemany("""
+            INSERT INTO documents (source, chunk, embedding, dim, norm, content_hash, qkind, qcode, qscale,
+                                   page_start, page_end, char_start, char_end)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        """, [
+            (source, chunk, *pack_embedding(emb), content_hash, *q, *location)
+            for chunk, emb, content_hash, q, location in zip(chunks, embeddings, content_hashes, quantized, locations)
+        ])
+        last_id = c.execute("SELECT last_insert_rowid()").fetchone()[0]
+        _bump_generation(c)
+    return list(range(last_id - len(chunks) + 1, last_id + 1))
+
+def get_all_documents() -> List[Tuple[int, str, str, np.ndarray]]:
+    rows = query("SELECT id, source, chunk, embedding FROM documents")
+    return [(r[0], r[1], r[2], unpack_embedding(r[3])) for r in rows]
+
+def search_by_source(source: str) -> List[Tuple[int, str, str, np.ndarray]]:
+    rows = query("SELECT id, source, chunk, embedding FROM documents WHERE source = ?", (source,))
+    return [(r[0], r[1], r[2], unpack_embedding(r[3])) for r in rows]
+
+def _forget_cached_embeddings(c, source: str):
+    """Drop cached embeddings of a source's chunks (the cache key is their content hash)."""
     c.execute("""
-        INSERT INTO documents (source, chunk, embedding)
-        VALUES (?, ?, ?)
-    """, (source, chunk, json.dumps(embedding)))
-    conn.commit()
-    conn.close()
-
-
-def get_all_documents() -> List[Tuple[int, str, str, List[float]]]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, source, chunk, embedding FROM documents")
-    rows = c.fetchall()
-    conn.close()
-    return [(r[0], r[1], r[2], json.loads(r[3])) for r in rows]
-
-def search_by_source(source: str) -> List[Tuple[int, str, str, List[float]]]:
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, source, chunk, embedding FROM documents WHERE source = ?", (source,))
-    rows = c.fetchall()
-    conn.close()
-    return [(r[0], r[1], r[2], json.loads(r[3])) for r in rows]
+        DELETE FROM embedding_cache
+        WHERE key IN (SELECT content_hash FROM documents WHERE source = ? AND content_hash IS NOT NULL)
+    """, (source,))
 
 def delete_source(source: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM documents WHERE source = ?", (source,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        _forget_cached_embeddings(c, source)
+        c.execute("DELETE FROM documents WHERE source = ?", (source,))
+        _bump_generation(c)
+
+def delete_chunks_by_ids(ids: List[int]):
+    with transaction() as c:
+        for start in range(0, len(ids), 500):
+            batch = list(ids[start:start + 500])
+            c.execute(f"DELETE FROM documents WHERE id IN ({','.join('?' * len(batch))})", batch)
+        _bump_generation(c)
 
 # ---------- Q&A History Functions ----------
-def add_qa_entry(source: str, question: str, answer: str, embedding: List[float]):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
-        INSERT INTO qa_history (source, question, answer, embedding, timestamp)
-        VALUES (?, ?, ?, ?, ?)
-    """, (source, question, answer, json.dumps(embedding), datetime.now().isoformat()))
-    conn.commit()
-    conn.close()
+def add_qa_entry(source: str, question: str, answer: str, embedding: List[float]) -> int:
+    blob, dim, norm = pack_embedding(embedding)
+    cursor = execute("""
+        INSERT INTO qa_history (source, question, answer, embedding, timestamp, dim, norm)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (source, question, answer, blob, datetime.now().isoformat(), dim, norm))
+    return cursor.lastrowid
+
+def get_recent_qa(limit: int):
+    """Return the newest Q&A entries as (id, source, question, answer, embedding, timestamp)."""
+    rows = query("""
+        SELECT id, source, question, answer, embedding, timestamp
+        FROM qa_history
+        ORDER BY id DESC
+        LIMIT ?
+    """, (limit,))
+    return [(r[0], r[1], r[2], r[3], unpack_embedding(r[4]), r[5]) for r in rows]
 
 def get_qa_history(source: str = None) -> List[Tuple[int, str, str, str, str]]:
     """
     Retrieves Q&A history. If a source is given, filters by it.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
     if source:
-        c.execute("SELECT * FROM qa_history WHERE source = ? ORDER BY id DESC", (source,))
-    else:
-        c.execute("SELECT * FROM qa_history ORDER BY id DESC")
-    rows = c.fetchall()
-    conn.close()
-    return rows
+        return query("SELECT * FROM qa_history WHERE source = ? ORDER BY id DESC", (source,))
+    return query("SELECT * FROM qa_history ORDER BY id DESC")
+
+def get_qa_embeddings():
+    """Return (id, source, question, answer, embedding, timestamp) for every Q&A entry."""
+    rows = query("SELECT id, source, question, answer, embedding, timestamp FROM qa_history WHERE embedding IS NOT NULL")
+    return [(r[0], r[1], r[2], r[3], unpack_embedding(r[4]), r[5]) for r in rows]
 
 def search_history(keyword: str):
     """
-    Search Q&A history for entries containing the keyword in either
-    the question or the answer.
+    Search Q&A history for entries containing every word of the keyword in
+    the question or the answer, newest first. Uses the FTS index if available.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    query = f"%{keyword}%"
-    c.execute("""
-        SELECT id, source, question, answer, timestamp
-        FROM qa_history
-        WHERE question LIKE ? OR answer LIKE ?
-        ORDER BY id DESC
-    """, (query, query))
-    rows = c.fetchall()
-    conn.close()
+    match = fts_query(keyword, match_all=True)
+    if fts_enabled and match:
+        rows = query("""
+            SELECT h.id, h.source, h.question, h.answer, h.timestamp
+            FROM qa_history_fts
+            JOIN qa_history h ON h.id = qa_history_fts.rowid
+            WHERE qa_history_fts MATCH ?
+            ORDER BY h.id DESC
+        """, (match,))
+    else:
+        pattern = f"%{keyword}%"
+        rows = query("""
+            SELECT id, source, question, answer, timestamp
+            FROM qa_history
+            WHERE question LIKE ? OR answer LIKE ?
+            ORDER BY id DESC
+        """, (pattern, pattern))
     return [
         {"id": r[0], "source": r[1], "question": r[2], "answer": r[3], "timestamp": r[4]}
         for r in rows
@@ -131,9 +339,7 @@ def list_documents():
       ...
     ]
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("""
+    rows = query("""
         SELECT source,
                COUNT(*) AS chunks,
                MAX(id) AS last_id
@@ -141,26 +347,21 @@ def list_documents():
         GROUP BY source
         ORDER BY last_id DESC
     """)
-    rows = c.fetchall()
-    conn.close()
     return [{"source": r[0], "chunks": r[1]} for r in rows]
 
 def rename_document(source: str, new_name: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("UPDATE documents SET source = ? WHERE source = ?", (new_name, source))
-    c.execute("UPDATE qa_history SET source = ? WHERE source = ?", (new_name, source))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        c.execute("UPDATE documents SET source = ? WHERE source = ?", (new_name, source))
+        c.execute("UPDATE qa_history SET source = ? WHERE source = ?", (new_name, source))
+        _bump_generation(c)
     return True
 
 def delete_document(source: str):
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("DELETE FROM documents WHERE source = ?", (source,))
-    c.execute("DELETE FROM qa_history WHERE source = ?", (source,))
-    conn.commit()
-    conn.close()
+    with transaction() as c:
+        _forget_cached_embeddings(c, source)
+        c.execute("DELETE FROM documents WHERE source = ?", (source,))
+        c.execute("DELETE FROM qa_history WHERE source = ?", (source,))
+        _bump_generation(c)
     return True
 
 def list_history(source: str = None):
@@ -185,9 +386,231 @@ def list_history(source: str = None):
 
 def get_all_chunks():
     """Return all stored document chunks."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT source, chunk, embedding FROM documents")
-    rows = c.fetchall()
-    conn.close()
-    return [(r[0], r[1], json.loads(r[2])) for r in rows]
+    rows = query("SELECT source, chunk, embedding FROM documents")
+    return [(r[0], r[1], unpack_embedding(r[2])) for r in rows]
+
+def get_all_embeddings() -> List[Tuple[int, str, np.ndarray]]:
+    """Return (id, source, embedding) for every stored chunk."""
+    rows = query("SELECT id, source, embedding FROM documents ORDER BY id")
+    return [(r[0], r[1], unpack_embedding(r[2])) for r in rows]
+
+def get_all_quantized(kind: str):
+    """
+    Return (id, source, dim, qcode, qscale, embedding) for every stored chunk.
+    The float embedding is only read for rows without a `kind` code.
+    """
+    rows = query("""
+        SELECT id, source, dim, qcode, qscale, CASE WHEN qkind IS ? THEN NULL ELSE embedding END
+        FROM documents
+        ORDER BY id
+    """, (kind,))
+    return [
+        (r[0], r[1], r[2], r[3] if r[5] is None else None, r[4], unpack_embedding(r[5]))
+        for r in rows
+    ]
+
+def get_embeddings_by_ids(ids: List[int]):
+    """Return {id: embedding} for the given chunk ids."""
+    found = {}
+    for start in range(0, len(ids), 500):
+        batch = list(ids[start:start + 500])
+        placeholders = ",".join("?" * len(batch))
+        rows = query(f"SELECT id, embedding FROM documents WHERE id IN ({placeholders})", batch)
+        found.update({r[0]: unpack_embedding(r[1]) for r in rows})
+    return found
+
+def get_chunks_by_ids(ids: List[int]):
+    """Return {id: (source, chunk)} for the given chunk ids."""
+    if not ids:
+        return {}
+    placeholders = ",".join("?" * len(ids))
+    rows = query(f"SELECT id, source, chunk FROM documents WHERE id IN ({placeholders})", list(ids))
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+def search_chunks_bm25(text: str, limit: int, sources: List[str] = None) -> List[Tuple[int, str, float]]:
+    """
+    Full-text search over document chunks. Returns up to `limit`
+    (chunk_id, source, bm25) rows, best first (lower bm25 is better).
+    """
+    match = fts_query(text)
+    if not fts_enabled or not match or limit <= 0:
+        return []
+    sql = """
+        SELECT d.id, d.source, bm25(documents_fts) AS score
+        FROM documents_fts
+        JOIN documents d ON d.id = documents_fts.rowid
+        WHERE documents_fts MATCH ?
+    """
+    params = [match]
+    if sources is not None:
+        if not sources:
+            return []
+        sql += f" AND d.source IN ({','.join('?' * len(sources))})"
+        params.extend(sources)
+    sql += " ORDER BY score LIMIT ?"
+    params.append(limit)
+    return query(sql, params)
+
+def get_embeddings_by_hash(content_hashes: List[str]):
+    """Return {content_hash: embedding} for hashes already present in documents."""
+    found = {}
+    if not content_hashes:
+        return found
+    unique = list(set(content_hashes))
+    for start in range(0, len(unique), 500):
+        batch = unique[start:start + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = query(f"""
+            SELECT content_hash, embedding FROM documents
+            WHERE content_hash IN ({placeholders})
+            GROUP BY content_hash
+        """, batch)
+        found.update({r[0]: unpack_embedding(r[1]) for r in rows})
+    return found
+
+# ---------- Embedding Cache Functions ----------
+def get_cached_embeddings(keys: List[str]):
+    """Return {key: embedding} for keys found in the embedding_cache table."""
+    found = {}
+    if not keys:
+        return found
+    for start in range(0, len(keys), 500):
+        batch = keys[start:start + 500]
+        placeholders = ",".join("?" * len(batch))
+        rows = query(f"SELECT key, embedding FROM embedding_cache WHERE key IN ({placeholders})", batch)
+        found.update({r[0]: unpack_embedding(r[1]) for r in rows})
+    return found
+
+def put_cached_embeddings(items: dict, max_rows: int = None):
+    """
+    Store {key: embedding} pairs in the embedding_cache table. With
+    `max_rows`, the oldest rows beyond that many are evicted (a replaced
+    row counts as new).
+    """
+    now = datetime.now().isoformat()
+    with transaction() as c:
+        c.executemany("""
+            INSERT OR REPLACE INTO embedding_cache (key, embedding, created_at)
+            VALUES (?, ?, ?)
+        """, [(key, pack_embedding(emb)[0], now) for key, emb in items.items()])
+        if max_rows is not None:
+            c.execute("""
+                DELETE FROM embedding_cache WHERE rowid IN (
+                    SELECT rowid FROM embedding_cache ORDER BY rowid
+                    LIMIT max((SELECT COUNT(*) FROM embedding_cache) - ?, 0)
+                )
+            """, (max_rows,))
+
+# ---------- Job Functions ----------
+JOB_FIELDS = ("id", "source", "path", "stage", "chunks_done", "chunks_total", "error", "created_at", "updated_at", "worker_pid")
+
+def create_job(job_id: str, source: str, path: str, stage: str = "queued"):
+    now = datetime.now().isoformat()
+    execute("""
+        INSERT INTO jobs (id, source, path, stage, created_at, updated_at, worker_pid)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, (job_id, source, path, stage, now, now, os.getpid()))
+
+def claim_job(job_id: str, previous_pid) -> bool:
+    """
+    Atomically hand a job over to this process. Fails if another process
+    claimed it since previous_pid was read.
+    """
+    cursor = execute("UPDATE jobs SET worker_pid = ? WHERE id = ? AND worker_pid IS ?", (os.getpid(), job_id, previous_pid))
+    return cursor.rowcount == 1
+
+def update_job(job_id: str, **fields):
+    """Update the given job columns, e.g. update_job(id, stage="embedding", chunks_done=10)."""
+    fields = {k: v for k, v in fields.items() if k in JOB_FIELDS and k != "id"}
+    fields["updated_at"] = datetime.now().isoformat()
+    assignments = ", ".join(f"{k} = ?" for k in fields)
+    execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+def get_job(job_id: str):
+    row = query_one(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE id = ?", (job_id,))
+    return dict(zip(JOB_FIELDS, row)) if row else None
+
+def list_jobs(stages: List[str] = None):
+    """Return jobs newest first, optionally only those in the given stages."""
+    if stages:
+        placeholders = ",".join("?" * len(stages))
+        rows = query(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs WHERE stage IN ({placeholders}) ORDER BY created_at DESC", list(stages))
+    else:
+        rows = query(f"SELECT {', '.join(JOB_FIELDS)} FROM jobs ORDER BY created_at DESC")
+    return [dict(zip(JOB_FIELDS, r)) for r in rows]
+
+# ---------- Migration ----------
+def migrate_embeddings(batch_size: int = 500):
+    """
+    Converts legacy JSON TEXT embeddings in documents and qa_history to
+    float32 BLOBs in place, filling in dim and norm. Rows are processed in
+    id-ordered batches, each committed on its own, so memory stays bounded
+    and an interrupted run can simply be restarted.
+    """
+    init_db()
+    converted = {}
+
+    for table in ("documents", "qa_history"):
+        total = 0
+        last_id = 0
+        while True:
+            rows = query(f"""
+                SELECT id, embedding FROM {table}
+                WHERE id > ? AND typeof(embedding) = 'text'
+                ORDER BY id
+                LIMIT ?
+            """, (last_id, batch_size))
+            if not rows:
+                break
+
+            updates = []
+            for row_id, emb_str in rows:
+                blob, dim, norm = pack_embedding(json.loads(emb_str))
+                updates.append((blob, dim, norm, row_id))
+            with transaction() as c:
+                c.executemany(f"UPDATE {table} SET embedding = ?, dim = ?, norm = ? WHERE id = ?", updates)
+
+            total += len(rows)
+            last_id = rows[-1][0]
+            print(f"[MIGRATE] {table}: converted {total} rows")
+
+        converted[table] = total
+
+    return converted
+
+def migrate_quantized(kind: str, batch_size: int = 500) -> int:
+    """
+    Writes `kind` codes ("int8" or "binary") for every documents row that
+    lacks them, or clears all codes when kind is "none". Batches are
+    committed one by one, so an interrupted run can simply be restarted.
+    """
+    init_db()
+    if kind == "none":
+        cursor = execute("UPDATE documents SET qkind = NULL, qcode = NULL, qscale = NULL WHERE qkind IS NOT NULL")
+        print(f"[MIGRATE] Cleared quantized codes from {cursor.rowcount} rows")
+        return cursor.rowcount
+
+    total = 0
+    last_id = 0
+    while True:
+        rows = query("""
+            SELECT id, embedding FROM documents
+            WHERE id > ? AND qkind IS NOT ?
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, kind, batch_size))
+        if not rows:
+            break
+
+        codes, scales = quantize([unpack_embedding(r[1]) for r in rows], kind)
+        with transaction() as c:
+            c.executemany(
+                "UPDATE documents SET qkind = ?, qcode = ?, qscale = ? WHERE id = ?",
+                [(kind, code.tobytes(), float(scale), r[0]) for r, code, scale in zip(rows, codes, scales)]
+            )
+
+        total += len(rows)
+        last_id = rows[-1][0]
+        print(f"[MIGRATE] documents: quantized {total} rows to {kind}")
+
+    return total
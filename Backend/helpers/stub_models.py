@@ -0,0 +1,48 @@
+# stub_models.py
+# Deterministic stand-ins for the embedding model, the generator and the
+# tokenizer, used when MODEL_BACKEND is "stub". They need no GGUF files and
+# cost little, so benchmarks measure the pipeline around the models.
+import re
+import zlib
+from typing import List
+import numpy as np
+from config import STUB_EMBED_DIM, STUB_ANSWER_TOKENS
+
+_TOKEN = re.compile(r"\w+|[^\w\s]")
+_WORD = re.compile(r"\w+")
+
+
+def count_tokens(text: str) -> int:
+    """Words and punctuation marks, roughly what a subword tokenizer yields for English."""
+    return len(_TOKEN.findall(text))
+
+
+def _bucket(word: str) -> int:
+    return zlib.crc32(word.encode("utf-8"))
+
+
+def embed(texts: List[str]) -> List[List[float]]:
+    """
+    Hashed bag-of-words vectors: each lower-cased word adds +1 or -1 to one
+    of STUB_EMBED_DIM dimensions. Texts sharing words are similar, so
+    retrieval over stub embeddings still finds relevant chunks.
+    """
+    vectors = np.zeros((len(texts), STUB_EMBED_DIM), dtype=np.float32)
+    for row, text in enumerate(texts):
+        buckets = np.fromiter((_bucket(w) for w in _WORD.findall(text.lower())), dtype=np.uint32)
+        if buckets.size:
+            signs = np.where(buckets & 0x80000000, -1.0, 1.0).astype(np.float32)
+            np.add.at(vectors[row], buckets % STUB_EMBED_DIM, signs)
+    return vectors.tolist()
+
+
+def generate_stream(context: str, query: str, temperature: float = 0.7, max_tokens: int = 512):
+    """
+    Yields the first words of the context as the answer, one token per
+    piece, then an llm.Usage counting the context and question as the prompt.
+    """
+    from .llm import Usage
+    words = (context.split() or query.split())[:min(max_tokens, STUB_ANSWER_TOKENS)]
+    for word in words:
+        yield word + " "
+    yield Usage(count_tokens(context) + count_tokens(query), len(words))
@@ -1,11 +1,14 @@
 # Backend/vector_helper.py
 
 import math
-import sqlite3
-import json
-from typing import List, Tuple
-from config import DB_PATH
-from . import sqlite_helper, llm
+import time
+from itertools import islice
+from typing import Iterable, List, NamedTuple, Optional, Union
+from config import EMBED_BATCH_SIZE, INGEST_STORE_BATCH, EMBED_MODEL, WEB_WORKERS, RETRIEVAL_MODE, HYBRID_CANDIDATES, RRF_K
+from . import sqlite_helper, llm, metrics
+from .vector_index import index, load_index
+from .answer_cache import cache as answer_cache
+from .embedding_cache import cache as embedding_cache, cache_key
 
 # ---------- Cosine Similarity ----------
 def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
@@ -17,42 +20,84 @@ def cosine_similarity(vec1: List[float], vec2: List[float]) -> float:
         return 0.0
     return dot_product / (norm_a * norm_b)
 
+# ---------- Cross-worker Sync ----------
+def sync_shared_state():
+    """
+    With several web workers, another process may have changed the
+    documents table. Reload the index and drop cached answers if so.
+    """
+    if WEB_WORKERS <= 1:
+        return
+    if sqlite_helper.get_generation() != index.generation:
+        print("[INDEX] Documents changed in another worker, reloading index")
+        load_index()
+        answer_cache.clear()
+
 # ---------- Search ----------
-def search_documents(query, top_k: int = 5) -> List[Tuple[str, str, float]]:
+class SearchResult(NamedTuple):
+    """A retrieved chunk, with the id of its row in the documents table."""
+    doc_name: str
+    chunk: str
+    score: float
+    chunk_id: int
+
+def _with_chunk_text(hits) -> List[SearchResult]:
+    """Resolve (chunk_id, source, score) index hits into SearchResults."""
+    with metrics.stage("fetch_chunks"):
+        chunks = sqlite_helper.get_chunks_by_ids([chunk_id for chunk_id, _, _ in hits])
+    return [
+        SearchResult(source, chunks[chunk_id][1], score, chunk_id)
+        for chunk_id, source, score in hits
+        if chunk_id in chunks
+    ]
+
+def hybrid_search(text: str, query, top_k: int, sources: List[str] = None, nprobe: int = None):
+    """
+    BM25 picks up to HYBRID_CANDIDATES chunks from the full-text index, only
+    those are scored against the query embedding, and the two rankings are
+    merged with reciprocal rank fusion. Falls back to a full vector search
+    when the keywords match fewer than top_k chunks.
+    Returns (chunk_id, source, rrf_score) hits.
+    """
+    with metrics.stage("bm25"):
+        bm25_hits = sqlite_helper.search_chunks_bm25(text, HYBRID_CANDIDATES, sources)
+    if len(bm25_hits) < top_k:
+        return index.search(query, top_k=top_k, sources=sources, nprobe=nprobe)
+
+    vector_hits = index.score_ids(query, [chunk_id for chunk_id, _, _ in bm25_hits])
+    fused = {}
+    for ranking in (bm25_hits, vector_hits):
+        for rank, (chunk_id, source, _) in enumerate(ranking):
+            _, score = fused.get(chunk_id, (source, 0.0))
+            fused[chunk_id] = (source, score + 1.0 / (RRF_K + rank + 1))
+
+    best = sorted(fused.items(), key=lambda item: item[1][1], reverse=True)[:top_k]
+    return [(chunk_id, source, score) for chunk_id, (source, score) in best]
+
+def search_documents(query, top_k: int = 5, text: str = None, mode: str = RETRIEVAL_MODE, nprobe: int = None) -> List[SearchResult]:
     """
     Search the database for the most relevant chunks to a query.
-    Returns a list of tuples: (doc_name, chunk_text, score)
+    With mode="hybrid", `text` (the raw question) also drives a BM25 search.
+    `nprobe` tunes recall vs. latency of the IVF index.
+    Returns a list of SearchResults (doc_name, chunk, score, chunk_id).
     """
-    # 1. Embed query
-    query_embedding = query
-
-    # 2. Fetch all document chunks from DB
-    all_chunks = sqlite_helper.get_all_chunks()
-
-    # 3. Calculate similarity
-    scored_chunks = []
-    for doc_name, chunk_text, chunk_embedding in all_chunks:
-        score = cosine_similarity(query_embedding, chunk_embedding)
-        scored_chunks.append((doc_name, chunk_text, score))
-
-    # 4. Sort by score (descending) & return top_k
-    scored_chunks.sort(key=lambda x: x[2], reverse=True)
-    return scored_chunks[:top_k]
+    # Query is already an embedding; score it against the resident index
+    with metrics.stage("retrieve"):
+        sync_shared_state()
+        if mode == "hybrid" and text:
+            return _with_chunk_text(hybrid_search(text, query, top_k, nprobe=nprobe))
+        return _with_chunk_text(index.search(query, top_k=top_k, nprobe=nprobe))
 
 def search_history(query: List[float], top_k: int = 2):
     """Return top-k semantically similar Q&A entries."""
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-    c.execute("SELECT id, source, question, answer, embedding, timestamp FROM qa_history WHERE embedding IS NOT NULL")
-    rows = c.fetchall()
-    conn.close()
+    rows = sqlite_helper.get_qa_embeddings()
 
     query_embedding = llm.embed_text(query)
     results = []
     for r in rows:
         try:
-            emb = [float(x) for x in json.loads(r[4])] if r[4] else None
-            if emb:
+            emb = r[4]
+            if emb is not None:
                 score = cosine_similarity(query_embedding, emb)
                 results.append({
                     "id": r[0],
@@ -69,37 +114,127 @@ def search_history(query: List[float], top_k: int = 2):
     results.sort(key=lambda x: x["score"], reverse=True)
     return results[:top_k]
 
-def search_in_document(document_names: list[str], query, top_k: int = 2):
+def search_in_document(document_names: list[str], query, top_k: int = 2, text: str = None, mode: str = RETRIEVAL_MODE):
     """
-    Search specific documents by name using semantic similarity.
+    Search specific documents by name using semantic similarity
+    (or hybrid BM25 + vector retrieval, see search_documents).
     Returns top-k most relevant chunks across all documents.
     """
-    conn = sqlite3.connect(DB_PATH)
-    c = conn.cursor()
-
-    results = []
-    for document_name in document_names:
-        c.execute("SELECT chunk, embedding FROM documents WHERE source = ?", (document_name,))
-        rows = c.fetchall()
-
-        for chunk_text, emb_str in rows:
-            emb = json.loads(emb_str) if emb_str else None
-            if emb:
-                score = cosine_similarity(query, emb)
-                results.append((document_name, chunk_text, score))
-
-    conn.close()
-
-    # Sort across all documents
-    results.sort(key=lambda x: x[2], reverse=True)
-    return results[:top_k]
+    with metrics.stage("retrieve"):
+        sync_shared_state()
+        if mode == "hybrid" and text:
+            return _with_chunk_text(hybrid_search(text, query, top_k, sources=document_names))
+        return _with_chunk_text(index.search(query, top_k=top_k, sources=document_names))
 
 
 # ---------- Store ----------
-def store_document_chunks(doc_name: str, chunks: List[str]):
+def _embed_group(chunks: List[str], batch_size: int, progress=None, done: int = 0):
+    """Embed one group of chunks, reusing embeddings of content already stored."""
+    hashes = [cache_key(EMBED_MODEL, chunk) for chunk in chunks]
+    known = sqlite_helper.get_embeddings_by_hash(hashes)
+    reused = sum(1 for h in hashes if h in known)
+    embedding_cache.record_dedup(reused)
+
+    embeddings = []
+    for i in range(0, len(chunks), batch_size):
+        batch_hashes = hashes[i:i + batch_size]
+        todo = [chunk for chunk, h in zip(chunks[i:i + batch_size], batch_hashes) if h not in known]
+        fresh = iter(llm.embed_texts(todo, batch_size=batch_size, use_cache=False)) if todo else iter(())
+        embeddings.extend(known[h] if h in known else next(fresh) for h in batch_hashes)
+        if progress:
+            progress("embedding", done + len(embeddings), None)
+    return embeddings, hashes, reused
+
+class Chunk(NamedTuple):
+    """
+    A chunk to store, with the pages it spans when the format has pages and
+    its character offsets in the extracted document text when known.
+    """
+    text: str
+    page_start: Optional[int] = None
+    page_end: Optional[int] = None
+    char_start: Optional[int] = None
+    char_end: Optional[int] = None
+
+def store_document_chunks(doc_name: str, chunks: Iterable[Union[str, Chunk]], batch_size: int = EMBED_BATCH_SIZE,
+                          progress=None, group_size: int = INGEST_STORE_BATCH) -> int:
     """
     Store document chunks with embeddings into the DB.
+    `chunks` may be any iterable of strings or Chunks (e.g. a stream_split
+    generator); it is consumed in groups of `group_size`, each embedded in
+    batches and written in one transaction, so memory is bounded by the
+    group size rather than the document. If a group fails, the rows
+    already stored by this call are removed again. Chunks whose content
+    hash is already stored reuse that embedding. If given,
+    progress(stage, done, total) is called when a group starts being
+    chunked and after every batch. Returns the number of chunks stored.
     """
-    for chunk in chunks:
-        embedding = llm.embed_text(chunk)
-        sqlite_helper.add_document(doc_name, chunk, embedding)
\ No newline at end of file
+    start = time.perf_counter()
+    embed_time = 0.0
+    reused = 0
+    stored_ids = []
+    chunks = iter(chunks)
+
+    try:
+        while True:
+            group = []
+            for c in islice(chunks, group_size):
+                if progress and not group:
+                    # Text is being extracted until the first chunk is cut
+                    progress("chunking", len(stored_ids), None)
+                group.append(c if isinstance(c, Chunk) else Chunk(c))
+            if not group:
+                break
+            texts = [c.text for c in group]
+            embed_start = time.perf_counter()
+            embeddings, hashes, group_reused = _embed_group(texts, batch_size, progress, len(stored_ids))
+            group_embed_time = time.perf_counter() - embed_start
+            metrics.observe_stage("ingest_embed", group_embed_time)
+            embed_time += group_embed_time
+            reused += group_reused
+
+            locations = [c[1:] for c in group]
+            with metrics.stage("ingest_store"):
+                ids = sqlite_helper.add_documents(doc_name, texts, embeddings, content_hashes=hashes, locations=locations)
+                index.add(doc_name, ids, embeddings)
+            stored_ids.extend(ids)
+    except Exception:
+        if stored_ids:
+            print(f"[STORE] {doc_name}: failed, removing {len(stored_ids)} stored chunks")
+            sqlite_helper.delete_chunks_by_ids(stored_ids)
+            index.remove_ids(stored_ids)
+        raise
+
+    if not stored_ids:
+        return 0
+    if progress:
+        progress("storing", len(stored_ids), len(stored_ids))
+    answer_cache.invalidate_source(doc_name)
+    total_time = time.perf_counter() - start
+
+    print(
+        f"[STORE] {doc_name}: {len(stored_ids)} chunks in {total_time:.2f}s "
+        f"({len(stored_ids) / max(embed_time, 1e-9):.1f} chunks/s embedding, batch_size={batch_size}, "
+        f"{reused} reused by content hash)"
+    )
+    return len(stored_ids)
+
+def delete_chunks(source: str):
+    """Drop every stored chunk of a source (but keep its Q&A history)."""
+    sqlite_helper.delete_source(source)
+    index.remove_source(source)
+    answer_cache.invalidate_source(source)
+
+def rename_document(source: str, new_name: str):
+    """Rename a document in the DB and keep the resident index in sync."""
+    success = sqlite_helper.rename_document(source, new_name)
+    index.rename_source(source, new_name)
+    answer_cache.invalidate_source(source)
+    return success
+
+def delete_document(source: str):
+    """Delete a document from the DB and drop its rows from the resident index."""
+    success = sqlite_helper.delete_document(source)
+    index.remove_source(source)
+    answer_cache.invalidate_source(source)
+    return success
@@ -0,0 +1,247 @@
+# vector_index.py
+import threading
+from typing import List, Optional, Tuple
+import numpy as np
+from config import VECTOR_INDEX, IVF_INDEX_DIR, WEB_WORKERS, EMBEDDING_QUANTIZATION
+from . import sqlite_helper, metrics
+
+
+class VectorIndex:
+    """
+    Resident, pre-normalized float32 matrix of every chunk embedding.
+
+    Row i of the matrix belongs to chunk id `ids[i]` of source `codes[i]`.
+    Sources are stored as small integer codes so renames only touch the
+    code table and source filters are a single vectorized comparison.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.generation = None  # documents_generation this index was loaded at
+        self._reset()
+
+    def __len__(self):
+        return self._size
+
+    def _reset(self):
+        self._matrix = np.empty((0, 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=np.int64)
+        self._codes = np.empty(0, dtype=np.int32)
+        self._size = 0
+        self._source_to_code = {}
+        self._code_to_source = {}
+        self._next_code = 0
+
+    # ---------- Internal ----------
+    def _code_for(self, source: str) -> int:
+        code = self._source_to_code.get(source)
+        if code is None:
+            code = self._next_code
+            self._next_code += 1
+            self._source_to_code[source] = code
+            self._code_to_source[code] = source
+        return code
+
+    def _reserve(self, extra: int, dim: int):
+        needed = self._size + extra
+        if self._matrix.shape[1] != dim:
+            if self._size:
+                raise ValueError(f"Embedding dimension mismatch: index has {self._matrix.shape[1]}, got {dim}")
+            self._matrix = np.empty((0, dim), dtype=np.float32)
+        capacity = self._matrix.shape[0]
+        if needed <= capacity:
+            return
+        new_capacity = max(needed, capacity * 2, 1024)
+        matrix = np.empty((new_capacity, dim), dtype=np.float32)
+        ids = np.empty(new_capacity, dtype=np.int64)
+        codes = np.empty(new_capacity, dtype=np.int32)
+        matrix[:self._size] = self._matrix[:self._size]
+        ids[:self._size] = self._ids[:self._size]
+        codes[:self._size] = self._codes[:self._size]
+        self._matrix, self._ids, self._codes = matrix, ids, codes
+
+    @staticmethod
+    def _normalize(vectors: np.ndarray) -> np.ndarray:
+        norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+        norms[norms == 0] = 1.0
+        return vectors / norms
+
+    # ---------- Mutation ----------
+    def clear(self):
+        with self._lock:
+            self._reset()
+
+    def add(self, source: str, ids: List[int], embeddings):
+        """Append the given chunk rows of one source to the index."""
+        if len(ids) == 0:
+            return
+        vectors = self._normalize(np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1))
+        with self._lock:
+            self._reserve(len(ids), vectors.shape[1])
+            start, end = self._size, self._size + len(ids)
+            self._matrix[start:end] = vectors
+            self._ids[start:end] = ids
+            self._codes[start:end] = self._code_for(source)
+            self._size = end
+
+    def rename_source(self, source: str, new_name: str):
+        with self._lock:
+            code = self._source_to_code.pop(source, None)
+            if code is None:
+                return
+            old_code = self._source_to_code.get(new_name)
+            if old_code is not None:
+                # Merge into the existing code so filters keep working
+                self._codes[:self._size][self._codes[:self._size] == code] = old_code
+                del self._code_to_source[code]
+                return
+            self._source_to_code[new_name] = code
+            self._code_to_source[code] = new_name
+
+    def remove_source(self, source: str):
+        with self._lock:
+            code = self._source_to_code.pop(source, None)
+            if code is None:
+                return
+            del self._code_to_source[code]
+            self._compact(self._codes[:self._size] != code)
+
+    def remove_ids(self, chunk_ids: List[int]):
+        with self._lock:
+            self._compact(~np.isin(self._ids[:self._size], np.asarray(chunk_ids, dtype=np.int64)))
+
+    def _compact(self, keep: np.ndarray):
+        """Move the rows where `keep` is True to the front, in order."""
+        kept = int(keep.sum())
+        self._matrix[:kept] = self._matrix[:self._size][keep]
+        self._ids[:kept] = self._ids[:self._size][keep]
+        self._codes[:kept] = self._codes[:self._size][keep]
+        self._size = kept
+
+    def load(self, groups):
+        """Replace the contents with the given (source, ids, embeddings) groups."""
+        with self._lock:
+            self._reset()
+            for source, ids, embeddings in groups:
+                self.add(source, ids, embeddings)
+
+    def load_from_db(self) -> int:
+        """Replace the contents with every chunk stored in the database; returns the document count."""
+        by_source = {}
+        for chunk_id, source, embedding in sqlite_helper.get_all_embeddings():
+            ids, embeddings = by_source.setdefault(source, ([], []))
+            ids.append(chunk_id)
+            embeddings.append(embedding)
+        self.load((source, ids, embeddings) for source, (ids, embeddings) in by_source.items())
+        return len(by_source)
+
+    def open(self) -> bool:
+        """Reopen a persisted copy of the index. The exact index is never persisted."""
+        return False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "type": "flat",
+                "rows": self._size,
+                "documents": len(self._source_to_code),
+                "vector_bytes": int(self._matrix[:self._size].nbytes),
+            }
+
+    # ---------- Search ----------
+    def search(self, query, top_k: int = 5, sources: Optional[List[str]] = None, nprobe: Optional[int] = None) -> List[Tuple[int, str, float]]:
+        """
+        Score every (optionally source-filtered) row with one matrix-vector
+        product and return the top_k as (chunk_id, source, score).
+        `nprobe` only applies to approximate indexes and is ignored here.
+        """
+        q = np.asarray(query, dtype=np.float32).ravel()
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0 or top_k <= 0:
+            return []
+        q = q / q_norm
+
+        with self._lock:
+            if self._size == 0:
+                return []
+            if sources is not None:
+                rows = self._source_rows(sources)
+                if rows.size == 0:
+                    return []
+            else:
+                rows = None
+            return self._rank(q, rows, top_k)
+
+    def _source_rows(self, sources: List[str]) -> np.ndarray:
+        wanted = [self._source_to_code[s] for s in sources if s in self._source_to_code]
+        return np.nonzero(np.isin(self._codes[:self._size], wanted))[0]
+
+    def _rank(self, q: np.ndarray, rows: Optional[np.ndarray], top_k: int) -> List[Tuple[int, str, float]]:
+        """Score the given row positions (all rows if None) against unit query q; best top_k first."""
+        metrics.CHUNKS_SCANNED.inc(self._size if rows is None else rows.size)
+        if rows is not None:
+            scores = self._matrix[rows] @ q
+        else:
+            scores = self._matrix[:self._size] @ q
+
+        k = min(top_k, scores.shape[0])
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        picked = rows[top] if rows is not None else top
+
+        return [
+            (int(self._ids[r]), self._code_to_source[int(self._codes[r])], float(s))
+            for r, s in zip(picked, scores[top])
+        ]
+
+    def score_ids(self, query, chunk_ids: List[int]) -> List[Tuple[int, str, float]]:
+        """
+        Cosine similarity of the query against only the given chunk ids,
+        as (chunk_id, source, score) best first. Unknown ids are skipped.
+        """
+        q = np.asarray(query, dtype=np.float32).ravel()
+        q_norm = np.linalg.norm(q)
+        if q_norm == 0 or len(chunk_ids) == 0:
+            return []
+        q = q / q_norm
+
+        with self._lock:
+            rows = np.nonzero(np.isin(self._ids[:self._size], np.asarray(chunk_ids, dtype=np.int64)))[0]
+            if rows.size == 0:
+                return []
+            return self._rank(q, rows, rows.size)
+
+
+def create_index() -> VectorIndex:
+    """Builds the index backend selected by VECTOR_INDEX in config."""
+    if VECTOR_INDEX == "ivf":
+        if EMBEDDING_QUANTIZATION != "none":
+            raise ValueError(f"EMBEDDING_QUANTIZATION '{EMBEDDING_QUANTIZATION}' needs the flat index, not VECTOR_INDEX 'ivf'")
+        from .ivf_index import IVFIndex
+        # Several workers would write the same files, so only persist with one
+        return IVFIndex(path=IVF_INDEX_DIR if WEB_WORKERS <= 1 else None)
+    if EMBEDDING_QUANTIZATION != "none":
+        from .quantized_index import QuantizedIndex
+        return QuantizedIndex(EMBEDDING_QUANTIZATION)
+    return VectorIndex()
+
+
+# Shared instance used by the API process
+index = create_index()
+
+
+def load_index():
+    """
+    (Re)builds the resident index from every chunk stored in the database,
+    unless a persisted copy that matches the database can be reopened.
+    """
+    # Read the generation first so changes made while loading trigger another reload
+    generation = sqlite_helper.get_generation()
+    if index.open():
+        index.generation = generation
+        print(f"[INDEX] Reopened persisted index with {len(index)} chunks")
+        return
+
+    index.generation = generation
+    documents = index.load_from_db()
+    print(f"[INDEX] Loaded {len(index)} chunks from {documents} documents")
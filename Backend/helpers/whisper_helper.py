@@ -0,0 +1,112 @@
+# whisper_helper.py
+import time
+import threading
+import numpy as np
+from . import metrics
+from config import WHISPER_MODEL, WHISPER_TIERS, WHISPER_TIER, LIVE_PARTIAL_TIER, AUDIO_SAMPLE_RATE, MODEL_BACKEND, EXECUTOR_WORKERS
+
+_models = {}  # compute type -> WhisperModel
+_load_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats = {}  # tier -> {"calls", "audio_seconds", "speech_seconds", "wall_seconds"}
+
+
+def get_whisper(compute_type: str = None):
+    """
+    Loads the faster-whisper model once per compute type and caches it for reuse.
+    """
+    compute_type = compute_type or WHISPER_TIERS[WHISPER_TIER]["compute_type"]
+    if compute_type not in _models:
+        with _load_lock:
+            if compute_type not in _models:
+                from faster_whisper import WhisperModel
+                print(f"[DEBUG] Loading whisper model: {WHISPER_MODEL} ({compute_type})")
+                start = time.perf_counter()
+                _models[compute_type] = WhisperModel(
+                    WHISPER_MODEL,
+                    device="cpu",
+                    compute_type=compute_type,
+                    num_workers=EXECUTOR_WORKERS["whisper"]
+                )
+                print(f"[DEBUG] Loaded whisper {compute_type} in {time.perf_counter() - start:.2f}s")
+    return _models[compute_type]
+
+
+def check_tier(tier: str):
+    if tier not in WHISPER_TIERS:
+        raise ValueError(f"Unknown transcription tier '{tier}', expected one of: {', '.join(WHISPER_TIERS)}")
+
+
+def local_transcribe_audio(audio, tier: str = WHISPER_TIER) -> str:
+    """
+    Transcribe 16 kHz mono float32 samples with the in-process model. The
+    audio is already trimmed or segmented, so Whisper's own VAD is skipped.
+    """
+    check_tier(tier)
+    settings = WHISPER_TIERS[tier]
+    segments, _ = get_whisper(settings["compute_type"]).transcribe(
+        audio,
+        beam_size=settings["beam_size"],
+        vad_filter=False,
+        language="en",
+        condition_on_previous_text=False,
+        without_timestamps=True
+    )
+    return " ".join([seg.text for seg in segments])
+
+
+def transcribe_audio(audio, tier: str = WHISPER_TIER, audio_seconds: float = None) -> str:
+    """
+    Transcribe 16 kHz mono float32 samples, either in-process or through
+    the model server. `audio_seconds` is the length of the original
+    recording when `audio` has been trimmed; both lengths are recorded for
+    the real-time factor statistics.
+    """
+    check_tier(tier)
+    start = time.perf_counter()
+    if MODEL_BACKEND == "remote":
+        from . import model_client
+        text = model_client.call("transcribe_audio", audio, tier)
+    else:
+        text = local_transcribe_audio(audio, tier)
+    elapsed = time.perf_counter() - start
+
+    speech_seconds = len(audio) / AUDIO_SAMPLE_RATE
+    audio_seconds = speech_seconds if audio_seconds is None else audio_seconds
+    metrics.observe_stage("transcribe", elapsed)
+    metrics.AUDIO_SECONDS.inc(audio_seconds, tier=tier)
+    with _stats_lock:
+        stats = _stats.setdefault(tier, {"calls": 0, "audio_seconds": 0.0, "speech_seconds": 0.0, "wall_seconds": 0.0})
+        stats["calls"] += 1
+        stats["audio_seconds"] += audio_seconds
+        stats["speech_seconds"] += speech_seconds
+        stats["wall_seconds"] += elapsed
+    print(
+        f"[WHISPER] {audio_seconds:.1f}s audio ({speech_seconds:.1f}s after trimming) in {elapsed:.2f}s "
+        f"({audio_seconds / max(elapsed, 1e-9):.1f} audio s per wall s, tier {tier})"
+    )
+    return text
+
+
+def warm_up():
+    """
+    Loads the models of the default and live partial tiers and transcribes
+    a second of silence with each. Not counted in the statistics.
+    """
+    silence = np.zeros(AUDIO_SAMPLE_RATE, dtype=np.float32)
+    for tier in dict.fromkeys((WHISPER_TIER, LIVE_PARTIAL_TIER)):
+        if MODEL_BACKEND == "remote":
+            from . import model_client
+            model_client.call("transcribe_audio", silence, tier)
+        else:
+            local_transcribe_audio(silence, tier)
+
+
+def transcription_stats():
+    """Audio seconds transcribed per wall second, per tier, in this process."""
+    with _stats_lock:
+        return {
+            tier: {**stats, "audio_seconds_per_wall_second": stats["audio_seconds"] / stats["wall_seconds"] if stats["wall_seconds"] else 0.0}
+            for tier, stats in _stats.items()
+        }
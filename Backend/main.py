@@ -1,30 +1,57 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Form
-from typing import List
-from fastapi.responses import JSONResponse
+import time
+_import_start = time.perf_counter()
+
+from fastapi import FastAPI, UploadFile, File, HTTPException, Body, Query, Form, Response, WebSocket, WebSocketDisconnect
+from typing import List, Optional
+from fastapi.responses import JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
-from faster_whisper import WhisperModel
-import tempfile
+import hashlib
+import asyncio
+import json
 import os
 import uvicorn
 import re
 from fastapi.staticfiles import StaticFiles
-from helpers.extraction_helper import detect_mime, ALLOWED_EXTS
-from helpers.document_loader import load_document
-from helpers.sqlite_helper import init_db, list_documents, list_history, add_qa_entry, rename_document, delete_document
-from helpers.vector_helper import search_documents, search_history, search_in_document
-from helpers.llm import generate_response, embed_text
-
-# Load model once
-model = WhisperModel("small.en", device="cpu", compute_type="int8")
+from helpers.extraction_helper import detect_mime, ALLOWED_EXTS, shutdown as shutdown_extraction
+from helpers import job_queue, db, lifecycle, metrics
+from helpers.sqlite_helper import init_db, list_documents, list_history, add_qa_entry, search_history as keyword_search_history
+from helpers.vector_helper import search_documents, search_history, search_in_document, rename_document, delete_document, sync_shared_state
+from helpers.vector_index import index as vector_index, load_index
+from helpers.answer_cache import cache as answer_cache, warm_cache
+from helpers.embedding_cache import cache as embedding_cache
+from helpers.context_builder import pack_context
+from helpers.llm import generate_response, generate_response_stream, embed_text, generation_stats
+from helpers.executors import executors, OverloadedError, queue_stats, shutdown as shutdown_executors
+from helpers import whisper_helper
+from helpers.live_transcription import LiveSegmenter
+from helpers.audio import decode_audio, trim_silence, pcm16_to_float
+from config import (WEB_WORKERS, RETRIEVAL_MODE, RETRIEVAL_MODES, MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES,
+                    WHISPER_TIERS, WHISPER_TIER, LIVE_PARTIAL_TIER, AUDIO_SAMPLE_RATE, MAX_AUDIO_UPLOAD_BYTES,
+                    WARMUP_MODELS, UPLOADS_DIR as UPLOADS_PATH)
+
+lifecycle.record_step("imports", time.perf_counter() - _import_start)
 
 app = FastAPI(title="DocQA Step 1 — Upload & Process")
+app.add_middleware(metrics.MetricsMiddleware)
 
-UPLOADS_DIR = Path("data/uploads")
+UPLOADS_DIR = Path(UPLOADS_PATH)
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
 
-MAX_BYTES = 50 * 1024 * 1024  # 50MB
-
-init_db()
+MAX_BYTES = MAX_UPLOAD_BYTES
+
+# Startup runs in the app process only: processes started with "spawn"
+# (such as the PDF extraction pool) import this file again but never
+# start the app. Models warm up in the background, so liveness is served
+# as soon as the database and the index are ready.
+@app.on_event("startup")
+def start_up():
+    lifecycle.run_step("init_db", init_db)
+    lifecycle.run_step("load_index", load_index)
+    lifecycle.run_step("warm_cache", warm_cache)
+    lifecycle.run_step("resume_jobs", job_queue.resume_jobs)
+    lifecycle.finish_startup()
+    lifecycle.warm_up_in_background(WARMUP_MODELS)
 
 def sanitize_filename(name: str) -> str:
     base = os.path.basename(name or "upload")
@@ -41,10 +68,71 @@ def save_unique(path: Path) -> Path:
             return p
         i += 1
 
+async def spool_upload(file: UploadFile, dest: Path):
+    """
+    Streams an upload to `dest` in UPLOAD_CHUNK_BYTES pieces while hashing
+    it, so memory use does not depend on the file size. Enforces MAX_BYTES
+    and removes the partial file on any error. Returns (size, sha256 hex).
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        # Exclusive create, so two uploads of the same name never share a file
+        out = open(dest, "xb")
+    except FileExistsError:
+        raise HTTPException(status_code=409, detail="An upload with this name is in progress, please retry")
+    try:
+        with out:
+            while True:
+                chunk = await file.read(UPLOAD_CHUNK_BYTES)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_BYTES:
+                    raise HTTPException(status_code=413, detail=f"File too large (max {MAX_BYTES // (1024 * 1024)}MB)")
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail="Empty file")
+    except BaseException:
+        dest.unlink(missing_ok=True)
+        raise
+    return size, digest.hexdigest()
+
+@app.exception_handler(OverloadedError)
+def overloaded_handler(request, exc: OverloadedError):
+    return JSONResponse({"detail": f"Server busy: {exc}"}, status_code=503, headers={"Retry-After": "5"})
+
 @app.get("/health")
+@app.get("/health/live")
 def health():
+    """Liveness: the process is up and serving requests."""
     return {"ok": True}
 
+@app.get("/health/ready")
+def health_ready():
+    """Readiness: startup has finished and the warm-up models are loaded (503 until then)."""
+    ready, details = lifecycle.readiness()
+    return JSONResponse(details, status_code=200 if ready else 503)
+
+@app.post("/warmup")
+def warmup(models: Optional[List[str]] = Body(None, embed=True)):
+    """Loads the given models (default: WARMUP_MODELS) with a dummy inference and waits for them."""
+    try:
+        return lifecycle.warm_up(WARMUP_MODELS if models is None else models)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/health/queues")
+def health_queues():
+    """Running/queued/rejected counts of each model executor, plus the generation slot pool's stats."""
+    stats = queue_stats()
+    try:
+        stats["generation_scheduler"] = generation_stats()
+    except Exception as e:
+        stats["generation_scheduler"] = {"error": str(e)}
+    return stats
+
 @app.post("/upload")
 async def upload(file: UploadFile = File(...)):
     name = sanitize_filename(file.filename)
@@ -53,33 +141,122 @@ async def upload(file: UploadFile = File(...)):
     if ext not in ALLOWED_EXTS:
         raise HTTPException(status_code=400, detail=f"Unsupported file type: {ext}")
 
-    content = await file.read()
-    if not content:
-        raise HTTPException(status_code=400, detail="Empty file")
-    if len(content) > MAX_BYTES:
-        raise HTTPException(status_code=413, detail="File too large (max 50MB)")
-
     # Save file
     dest = save_unique(UPLOADS_DIR / name)
-    dest.write_bytes(content)
+    size, sha256 = await spool_upload(file, dest)
 
-    try:
-        # Process the document: extract text, chunk, embed, and store
-        print(f"Processing: {dest}")
-        load_document(dest)
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Processing failed: {e}")
+    # Extract, chunk, embed and store in the background
+    print(f"Queued for processing: {dest}")
+    job_id = job_queue.submit_job(dest, dest.name)
 
     return JSONResponse({
-        "message": "File uploaded and processed successfully",
+        "message": "File uploaded, processing started",
+        "job_id": job_id,
         "saved_as": dest.name,
-        "size_bytes": len(content),
+        "size_bytes": size,
+        "sha256": sha256,
         "mime": detect_mime(dest)
-    })
+    }, status_code=202)
+
+@app.get("/jobs")
+def get_jobs():
+    """List ingestion jobs, newest first."""
+    return job_queue.list_jobs()
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Report the stage and progress of one ingestion job."""
+    job = job_queue.get_job(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+@app.on_event("shutdown")
+def stop_jobs():
+    job_queue.shutdown()
+    shutdown_extraction()
+    shutdown_executors()
+    db.close_all()
+
+def cached_answer(question: str, q_embedding, allowed_sources: List[str] = None):
+    """
+    Returns a response for a near-duplicate of an earlier question, or None.
+    Cache hits are still recorded in the Q&A history.
+    """
+    sync_shared_state()
+    with metrics.stage("answer_cache"):
+        hit = answer_cache.lookup(q_embedding, allowed_sources)
+    if hit is None:
+        return None
+
+    print(f"[CACHE] Hit (score {hit['score']:.3f}) for: {question}")
+    add_qa_entry(hit["sources"], question, hit["answer"], q_embedding)
+    return {"question": question, "answer": hit["answer"], "sources": hit["sources"], "cached": True}
+
+def save_answer(sources: str, question: str, answer: str, q_embedding):
+    """Saves a freshly generated answer to the Q&A history and the answer cache."""
+    with metrics.stage("save_answer"):
+        qa_id = add_qa_entry(sources, question, answer, q_embedding)
+        answer_cache.add(qa_id, question, answer, sources, q_embedding)
+
+def cache_header(cached: bool) -> dict:
+    return {"X-Answer-Cache": "hit" if cached else "miss"}
+
+def _ndjson(event: dict) -> str:
+    return json.dumps(event) + "\n"
+
+def start_answer_stream(question: str, q_embedding, results, cached: dict = None):
+    """
+    Returns a generator of NDJSON events for the answer: a "meta" line with
+    the question and sources, a "token" line per generated piece and a final
+    "done" line. Generation is queued on the generator executor right away,
+    so an overloaded server fails before the response starts.
+    The full answer is saved to the Q&A history once the stream completes.
+    """
+    if cached:
+        return iter([
+            _ndjson({"type": "meta", "question": question, "sources": cached["sources"], "cached": True}),
+            _ndjson({"type": "done", "answer": cached["answer"]}),
+        ])
+
+    if not results:
+        return iter([
+            _ndjson({"type": "meta", "question": question, "sources": None, "cached": False}),
+            _ndjson({"type": "done", "answer": "No relevant document chunks found."}),
+        ])
+
+    context, results = pack_context(question, q_embedding, results)
+    sources = ", ".join(set(result.doc_name for result in results))
+    tokens = executors["generator"].stream(generate_response_stream, context, question)
+
+    def events():
+        yield _ndjson({"type": "meta", "question": question, "sources": sources, "cached": False})
+        pieces = []
+        try:
+            for text in tokens:
+                pieces.append(text)
+                yield _ndjson({"type": "token", "text": text})
+        except Exception as e:
+            yield _ndjson({"type": "error", "detail": f"Question processing failed: {e}"})
+            return
+
+        answer = "".join(pieces).strip()
+        save_answer(sources, question, answer, q_embedding)
+        yield _ndjson({"type": "done", "answer": answer})
+
+    return events()
+
+def ndjson_response(events, cached: bool = False) -> StreamingResponse:
+    return StreamingResponse(events, media_type="application/x-ndjson", headers=cache_header(cached))
+
+def check_mode(mode: str):
+    if mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown retrieval mode '{mode}', expected one of: {', '.join(RETRIEVAL_MODES)}")
 
 @app.post("/ask")
-def ask_question_endpoint(question: str = Body(...), top_k: int = 5):
+def ask_question_endpoint(response: Response, question: str = Body(...), top_k: int = 5, mode: str = RETRIEVAL_MODE, nprobe: Optional[int] = None):
 
+    check_mode(mode)
     if not question.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
@@ -87,32 +264,64 @@ def ask_question_endpoint(question: str = Body(...), top_k: int = 5):
         raise HTTPException(status_code=404, detail="Please upload a document 😊")
 
     try:
-        # Step 1 & 2: Retrieve relevant chunks
-        q_embedding = embed_text(question)
-        results = search_documents(q_embedding, top_k=top_k)
+        # Step 1: Embed and check the answer cache
+        q_embedding = executors["embedder"].run(embed_text, question)
+        cached = cached_answer(question, q_embedding)
+        response.headers.update(cache_header(cached is not None))
+        if cached:
+            return cached
+
+        # Step 2: Retrieve relevant chunks
+        results = search_documents(q_embedding, top_k=top_k, text=question, mode=mode, nprobe=nprobe)
 
         if not results:
-            return {"question": question, "answer": "No relevant document chunks found.", "sources": None}
+            return {"question": question, "answer": "No relevant document chunks found.", "sources": None, "cached": False}
 
-        # Step 3: Build context for LLM
-        context = "\n\n".join([chunk for _, chunk, _ in results])
+        # Step 3: Pack the chunks into the LLM's token budget
+        context, results = pack_context(question, q_embedding, results)
 
         # Step 4: Call LLM
-        answer = generate_response(context, question)
+        answer = executors["generator"].run(generate_response, context, question)
 
         # Step 5: Save to QA history
-        sources = ", ".join(set(doc_name for doc_name, _, _ in results))
-        add_qa_entry(sources, question, answer, q_embedding)
+        sources = ", ".join(set(result.doc_name for result in results))
+        save_answer(sources, question, answer, q_embedding)
 
         return {
             "question": question,
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "cached": False
         }
 
+    except (HTTPException, OverloadedError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Question processing failed: {e}")
 
+@app.post("/ask/stream")
+def ask_question_stream_endpoint(question: str = Body(...), top_k: int = 5, mode: str = RETRIEVAL_MODE, nprobe: Optional[int] = None):
+    """Streaming variant of /ask; responds with NDJSON events."""
+
+    check_mode(mode)
+    if not question.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    if list_documents() == []:
+        raise HTTPException(status_code=404, detail="Please upload a document 😊")
+
+    try:
+        q_embedding = executors["embedder"].run(embed_text, question)
+        cached = cached_answer(question, q_embedding)
+        results = None if cached else search_documents(q_embedding, top_k=top_k, text=question, mode=mode, nprobe=nprobe)
+        events = start_answer_stream(question, q_embedding, results, cached)
+    except (HTTPException, OverloadedError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Question processing failed: {e}")
+
+    return ndjson_response(events, cached=cached is not None)
+
 def clean_transcription(text: str) -> str:
     # Remove music/artifact markers
     text = re.sub(r"\[.*?\]", "", text)
@@ -125,51 +334,218 @@ def clean_transcription(text: str) -> str:
     
     return text
 
+def transcribe_bytes(data: bytes, tier: str = WHISPER_TIER) -> str:
+    """Decode an uploaded recording in memory, trim its silence and transcribe it."""
+    with metrics.stage("decode_audio"):
+        audio = decode_audio(data)
+    with metrics.stage("trim_silence"):
+        speech = trim_silence(audio)
+    if not len(speech):
+        return ""
+    transcription = whisper_helper.transcribe_audio(speech, tier, audio_seconds=len(audio) / AUDIO_SAMPLE_RATE)
+    return clean_transcription(transcription)
+
+def check_tier(tier: str):
+    if tier not in WHISPER_TIERS:
+        raise HTTPException(status_code=400, detail=f"Unknown transcription tier '{tier}', expected one of: {', '.join(WHISPER_TIERS)}")
+
+async def transcribe_upload(file: UploadFile, tier: str = WHISPER_TIER) -> str:
+    check_tier(tier)
+    data = await file.read(MAX_AUDIO_UPLOAD_BYTES + 1)
+    if len(data) > MAX_AUDIO_UPLOAD_BYTES:
+        raise HTTPException(status_code=413, detail=f"Audio too large (max {MAX_AUDIO_UPLOAD_BYTES // (1024 * 1024)}MB)")
+    if not data:
+        raise HTTPException(status_code=400, detail="Audio file is empty")
+    return await executors["whisper"].run_async(transcribe_bytes, data, tier)
+
 @app.post("/ask/recorded")
-async def ask_recorded_question_endpoint(file: UploadFile = File(...), top_k: int = Form(5)):
+async def ask_recorded_question_endpoint(response: Response, file: UploadFile = File(...), top_k: int = Form(5), tier: str = Form(WHISPER_TIER),
+                                         mode: str = Form(RETRIEVAL_MODE), nprobe: Optional[int] = Form(None)):
+    check_mode(mode)
     try:
-        # Save temp file
-        with tempfile.NamedTemporaryFile(delete=False, suffix=".mp3") as tmp:
-            tmp.write(await file.read())
-            tmp_path = tmp.name
-
-        # Transcribe audio
-        segments, _ = model.transcribe(
-            tmp_path,
-            beam_size=5,
-            vad_filter=True,
-            language="en",
-            condition_on_previous_text=False
-        )
-
-        transcription = " ".join([seg.text for seg in segments])
-        transcription = clean_transcription(transcription)
+        transcription = await transcribe_upload(file, tier)
 
         if not transcription.strip():
             raise HTTPException(status_code=400, detail="Audio contains no speech")
 
         # 🔄 Reuse existing pipeline
-        q_embedding = embed_text(transcription)
-        results = search_documents(q_embedding, top_k=top_k)
+        q_embedding = await executors["embedder"].run_async(embed_text, transcription)
+        cached = await run_in_threadpool(cached_answer, transcription, q_embedding)
+        response.headers.update(cache_header(cached is not None))
+        if cached:
+            return cached
+
+        results = await run_in_threadpool(search_documents, q_embedding, top_k=top_k, text=transcription, mode=mode, nprobe=nprobe)
 
         if not results:
-            return {"question": transcription, "answer": "No relevant document chunks found.", "sources": None}
+            return {"question": transcription, "answer": "No relevant document chunks found.", "sources": None, "cached": False}
 
-        context = "\n\n".join([chunk for _, chunk, _ in results])
-        answer = generate_response(context, transcription)
-        sources = ", ".join(set(doc_name for doc_name, _, _ in results))
+        context, results = await run_in_threadpool(pack_context, transcription, q_embedding, results)
+        answer = await executors["generator"].run_async(generate_response, context, transcription)
+        sources = ", ".join(set(result.doc_name for result in results))
 
-        add_qa_entry(sources, transcription, answer, q_embedding)
+        await run_in_threadpool(save_answer, sources, transcription, answer, q_embedding)
 
         return {
             "question": transcription,
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "cached": False
         }
 
+    except (HTTPException, OverloadedError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Audio question failed: {e}")
 
+@app.post("/ask/recorded/stream")
+async def ask_recorded_question_stream_endpoint(file: UploadFile = File(...), top_k: int = Form(5), tier: str = Form(WHISPER_TIER),
+                                                mode: str = Form(RETRIEVAL_MODE), nprobe: Optional[int] = Form(None)):
+    """Streaming variant of /ask/recorded; the first NDJSON event carries the transcription."""
+    check_mode(mode)
+    try:
+        transcription = await transcribe_upload(file, tier)
+    except (HTTPException, OverloadedError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audio question failed: {e}")
+
+    if not transcription.strip():
+        raise HTTPException(status_code=400, detail="Audio contains no speech")
+
+    try:
+        q_embedding = await executors["embedder"].run_async(embed_text, transcription)
+        cached = await run_in_threadpool(cached_answer, transcription, q_embedding)
+        results = None if cached else await run_in_threadpool(search_documents, q_embedding, top_k=top_k, text=transcription, mode=mode, nprobe=nprobe)
+        events = await run_in_threadpool(start_answer_stream, transcription, q_embedding, results, cached)
+    except (HTTPException, OverloadedError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Audio question failed: {e}")
+
+    return ndjson_response(events, cached=cached is not None)
+
+async def answer_live_utterance(ws: WebSocket, audio, top_k: int, mode: str):
+    """
+    Transcribe a finished utterance and answer it over the socket. Embedding
+    and retrieval start as soon as the final transcript is ready; the answer
+    events are the same as the NDJSON events of /ask/stream.
+    """
+    speech_ended = time.perf_counter()
+    text = clean_transcription(await executors["whisper"].run_async(whisper_helper.transcribe_audio, audio, WHISPER_TIER))
+    await ws.send_json({"type": "final", "text": text})
+    if not text:
+        return
+    if await run_in_threadpool(list_documents) == []:
+        await ws.send_json({"type": "error", "detail": "Please upload a document 😊"})
+        return
+
+    q_embedding = await executors["embedder"].run_async(embed_text, text)
+    cached = await run_in_threadpool(cached_answer, text, q_embedding)
+    results = None if cached else await run_in_threadpool(search_documents, q_embedding, top_k=top_k, text=text, mode=mode)
+    events = await run_in_threadpool(start_answer_stream, text, q_embedding, results, cached)
+    first = True
+    try:
+        while True:
+            line = await run_in_threadpool(next, events, None)
+            if line is None:
+                break
+            if first:
+                print(f"[LIVE] End of speech to first answer event: {time.perf_counter() - speech_ended:.2f}s")
+                first = False
+            await ws.send_text(line.strip())
+    finally:
+        events.close()
+
+@app.websocket("/ws/ask/live")
+async def live_question_endpoint(ws: WebSocket, top_k: int = 5, mode: str = RETRIEVAL_MODE):
+    """
+    Spoken questions answered live. The client streams 16 kHz mono 16-bit
+    PCM as binary messages and sends {"type": "stop"} when it is done.
+    While an utterance is spoken the server sends "partial" transcripts;
+    when the VAD detects its end it sends the "final" transcript and then
+    answers it. Utterances are answered one at a time, in order, while the
+    socket keeps receiving audio. Malformed messages get an "error" event
+    and the session carries on.
+    """
+    await ws.accept()
+    if mode not in RETRIEVAL_MODES:
+        await ws.close(code=1008, reason=f"Unknown retrieval mode '{mode}'")
+        return
+
+    segmenter = LiveSegmenter()
+    partial_task = None
+    utterances = asyncio.Queue()  # finished utterances waiting for an answer; None ends
+
+    async def send_partial(audio):
+        try:
+            text = await executors["whisper"].run_async(whisper_helper.transcribe_audio, audio, LIVE_PARTIAL_TIER)
+        except OverloadedError:
+            return  # partials are best effort; the final transcript still follows
+        text = clean_transcription(text)
+        if text:
+            await ws.send_json({"type": "partial", "text": text})
+
+    async def answer_utterances():
+        while True:
+            audio = await utterances.get()
+            if audio is None:
+                return
+            try:
+                await answer_live_utterance(ws, audio, top_k, mode)
+            except WebSocketDisconnect:
+                return
+            except OverloadedError as e:
+                await ws.send_json({"type": "error", "detail": str(e)})
+            except Exception as e:
+                await ws.send_json({"type": "error", "detail": f"Audio question failed: {e}"})
+
+    answer_task = asyncio.create_task(answer_utterances())
+    try:
+        stopping = False
+        while not stopping:
+            message = await ws.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            if message.get("bytes"):
+                if len(message["bytes"]) % 2:
+                    await ws.send_json({"type": "error", "detail": "Audio frames must be whole 16-bit samples"})
+                    continue
+                events = segmenter.feed(pcm16_to_float(message["bytes"]))
+            else:
+                try:
+                    control = json.loads(message.get("text") or "{}")
+                except ValueError:
+                    control = None
+                if not isinstance(control, dict):
+                    await ws.send_json({"type": "error", "detail": "Text messages must be JSON objects"})
+                    continue
+                if control.get("type") != "stop":
+                    continue
+                stopping = True
+                events = [event for event in [segmenter.flush()] if event]
+
+            for kind, audio in events:
+                if kind == "partial":
+                    # Skip this partial if the previous one is still being transcribed
+                    if partial_task is None or partial_task.done():
+                        partial_task = asyncio.create_task(send_partial(audio))
+                    continue
+                if partial_task is not None:
+                    partial_task.cancel()
+                utterances.put_nowait(audio)
+
+        # Answer what was already said before closing
+        utterances.put_nowait(None)
+        await answer_task
+        await ws.close()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        answer_task.cancel()
+        if partial_task is not None:
+            partial_task.cancel()
+
 @app.get("/documents")
 def get_documents():
     """List all stored documents."""
@@ -225,14 +601,17 @@ def get_history():
     return list_history()
 
 @app.get("/history/search")
-def search_history_endpoint(q: str = Query(..., min_length=1)):
-    """Search Q&A history by keyword."""
+def search_history_endpoint(q: str = Query(..., min_length=1), mode: str = "semantic"):
+    """Search Q&A history by meaning (default) or by keyword (mode=keyword, full-text index)."""
+    if mode == "keyword":
+        return keyword_search_history(q)
     return search_history(q)
 
 @app.post("/search-doc")
-def search_document(document_names: List[str] = Form(...), query: str = Form(...)):
+def search_document(response: Response, document_names: List[str] = Form(...), query: str = Form(...), mode: str = Form(RETRIEVAL_MODE)):
     """Search inside one or more specific documents."""
 
+    check_mode(mode)
     if not query.strip():
         raise HTTPException(status_code=400, detail="Question cannot be empty")
     
@@ -242,28 +621,84 @@ def search_document(document_names: List[str] = Form(...), query: str = Form(...
         raise HTTPException(status_code=404, detail=f"Document(s) not found: {', '.join(invalid_docs)}")
 
     try:
-        q_embedding = embed_text(query)
+        q_embedding = executors["embedder"].run(embed_text, query)
+        cached = cached_answer(query, q_embedding, allowed_sources=document_names)
+        response.headers.update(cache_header(cached is not None))
+        if cached:
+            return cached
 
-        results = search_in_document(document_names, q_embedding)
+        results = search_in_document(document_names, q_embedding, text=query, mode=mode)
         if not results:
-            return {"question": query, "answer": "No relevant document chunks found.", "sources": None}
+            return {"question": query, "answer": "No relevant document chunks found.", "sources": None, "cached": False}
 
-        context = "\n\n".join([chunk for _, chunk, _ in results])
-        answer = generate_response(context, query)
-        sources = ", ".join(set(doc_name for doc_name, _, _ in results))
-        add_qa_entry(sources, query, answer, q_embedding)
+        context, results = pack_context(query, q_embedding, results)
+        answer = executors["generator"].run(generate_response, context, query)
+        sources = ", ".join(set(result.doc_name for result in results))
+        save_answer(sources, query, answer, q_embedding)
 
         return {
             "question": query,
             "answer": answer,
-            "sources": sources
+            "sources": sources,
+            "cached": False
         }
 
+    except (HTTPException, OverloadedError):
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Question processing failed: {e}")
 
+@app.post("/search-doc/stream")
+def search_document_stream(document_names: List[str] = Form(...), query: str = Form(...), mode: str = Form(RETRIEVAL_MODE)):
+    """Streaming variant of /search-doc; responds with NDJSON events."""
+
+    check_mode(mode)
+    if not query.strip():
+        raise HTTPException(status_code=400, detail="Question cannot be empty")
+
+    source_list = [doc['source'] for doc in list_documents()]
+    invalid_docs = [doc for doc in document_names if doc not in source_list]
+    if invalid_docs:
+        raise HTTPException(status_code=404, detail=f"Document(s) not found: {', '.join(invalid_docs)}")
+
+    try:
+        q_embedding = executors["embedder"].run(embed_text, query)
+        cached = cached_answer(query, q_embedding, allowed_sources=document_names)
+        results = None if cached else search_in_document(document_names, q_embedding, text=query, mode=mode)
+        events = start_answer_stream(query, q_embedding, results, cached)
+    except (HTTPException, OverloadedError):
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Question processing failed: {e}")
+
+    return ndjson_response(events, cached=cached is not None)
+
+@app.get("/index/stats")
+def index_stats():
+    """Backend type, size and (for IVF) cluster layout of the vector index."""
+    return vector_index.stats()
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters and sizes of the answer and embedding caches."""
+    return {"answers": answer_cache.stats(), "embeddings": embedding_cache.stats()}
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Request and pipeline stage latency histograms and token/chunk counters, in Prometheus format."""
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/transcription/stats")
+def transcription_stats():
+    """Audio seconds transcribed per wall second by tier, for sizing hosts."""
+    return whisper_helper.transcription_stats()
+
 frontend_path = os.path.join(os.path.dirname(__file__), '..', 'Frontend')
 app.mount("/", StaticFiles(directory=frontend_path, html=True), name="Frontend")
 
 if __name__ == "__main__":
-    uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
+    if WEB_WORKERS > 1:
+        # Several processes; pair with MODEL_BACKEND=remote so they share one model server
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=WEB_WORKERS)
+    else:
+        uvicorn.run("main:app", host="0.0.0.0", port=8000, reload=True)
@@ -0,0 +1,18 @@
+# migrate_db.py
+# One-shot conversion of data/vector_store.db from JSON TEXT embeddings
+# to float32 BLOBs. Safe to re-run; already converted rows are skipped.
+import sys
+from helpers import db
+from helpers.sqlite_helper import migrate_embeddings
+
+if __name__ == "__main__":
+    batch_size = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    converted = migrate_embeddings(batch_size=batch_size)
+    print(f"[MIGRATE] Done: {converted}")
+
+    if any(converted.values()):
+        # Reclaim the space freed by the much smaller BLOBs
+        print("[MIGRATE] Vacuuming database...")
+        db.execute("VACUUM")
+        db.close_all()
@@ -0,0 +1,75 @@
+# model_server.py
+# Hosts the llama.cpp and Whisper models in a single process so that
+# several uvicorn workers can share one copy of the weights.
+#
+#   python model_server.py
+#   DOCQA_MODEL_BACKEND=remote DOCQA_WEB_WORKERS=4 python main.py
+import os
+import threading
+import traceback
+from multiprocessing.connection import Listener
+from config import MODEL_SERVER_ADDRESS, MODEL_SERVER_AUTHKEY
+from helpers import llm, whisper_helper, lifecycle
+from helpers.generation_scheduler import scheduler
+
+HANDLERS = {
+    "embed": llm.local_embed,
+    "transcribe_audio": whisper_helper.local_transcribe_audio,
+    "generation_stats": scheduler.stats,
+}
+
+STREAM_HANDLERS = {
+    "generate_stream": llm.local_generate_stream,
+}
+
+
+def handle_connection(conn):
+    """Serve requests from one client connection until it closes."""
+    try:
+        while True:
+            try:
+                op, args = conn.recv()
+            except EOFError:
+                break
+
+            try:
+                if op in STREAM_HANDLERS:
+                    for item in STREAM_HANDLERS[op](*args):
+                        conn.send(("token", item))
+                    conn.send(("end", None))
+                elif op in HANDLERS:
+                    conn.send(("ok", HANDLERS[op](*args)))
+                else:
+                    conn.send(("error", f"Unknown operation: {op}"))
+            except (BrokenPipeError, ConnectionResetError):
+                break
+            except Exception as e:
+                traceback.print_exc()
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+    finally:
+        conn.close()
+
+
+def serve():
+    # Load and warm every model up front, in parallel; clients should never pay for it
+    status = lifecycle.warm_up(lifecycle.WARMERS)
+    failed = [f"{name} ({s['error']})" for name, s in status.items() if s["state"] != "ready"]
+    if failed:
+        raise SystemExit(f"[MODEL SERVER] Could not load: {', '.join(failed)}")
+
+    if os.name != "nt" and os.path.exists(MODEL_SERVER_ADDRESS):
+        os.remove(MODEL_SERVER_ADDRESS)
+
+    with Listener(MODEL_SERVER_ADDRESS, authkey=MODEL_SERVER_AUTHKEY) as listener:
+        print(f"[MODEL SERVER] Listening on {MODEL_SERVER_ADDRESS}")
+        while True:
+            try:
+                conn = listener.accept()
+            except Exception as e:
+                print(f"[MODEL SERVER] Rejected connection: {e}")
+                continue
+            threading.Thread(target=handle_connection, args=(conn,), daemon=True).start()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,27 @@
+# quantize_db.py
+# Writes int8 or binary codes for the embeddings already stored in
+# data/vector_store.db, so a quantized index loads them directly.
+# Safe to re-run; rows that already have codes of that kind are skipped.
+#
+#   python quantize_db.py            # kind from EMBEDDING_QUANTIZATION
+#   python quantize_db.py binary 1000
+#   python quantize_db.py none       # drop all codes
+import sys
+from config import EMBEDDING_QUANTIZATION
+from helpers import db
+from helpers.quantization import KINDS
+from helpers.sqlite_helper import migrate_quantized
+
+if __name__ == "__main__":
+    kind = sys.argv[1] if len(sys.argv) > 1 else EMBEDDING_QUANTIZATION
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 500
+    if kind not in KINDS + ("none",):
+        sys.exit(f"Unknown quantization '{kind}', expected one of: {', '.join(KINDS + ('none',))}")
+
+    rows = migrate_quantized(kind, batch_size=batch_size)
+    print(f"[MIGRATE] Done: {rows} rows")
+
+    if kind == "none" and rows:
+        print("[MIGRATE] Vacuuming database...")
+        db.execute("VACUUM")
+        db.close_all()
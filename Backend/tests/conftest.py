@@ -0,0 +1,15 @@
+# conftest.py
+# Tests run offline against the stub models, with a scratch database and
+# upload directory, so no GGUF files are needed and data/ is never touched.
+import os
+import sys
+import tempfile
+
+# Set before config is imported
+WORK_DIR = tempfile.mkdtemp(prefix="docqa-tests-")
+os.environ["DOCQA_MODEL_BACKEND"] = "stub"
+os.environ["DOCQA_DB_PATH"] = os.path.join(WORK_DIR, "tests.db")
+os.environ["DOCQA_UPLOADS_DIR"] = os.path.join(WORK_DIR, "uploads")
+os.environ["DOCQA_WEB_WORKERS"] = "1"
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
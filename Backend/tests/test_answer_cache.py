@@ -0,0 +1,45 @@
+import pytest
+from helpers import answer_cache, sqlite_helper, llm, vector_helper
+from helpers.answer_cache import AnswerCache, warm_cache
+from helpers.vector_index import load_index
+
+QUESTION = "when was the warehouse roof repaired"
+
+
+@pytest.fixture(autouse=True)
+def documents():
+    sqlite_helper.init_db()
+    load_index()
+    for source in ("a.txt", "b.txt"):
+        vector_helper.store_document_chunks(source, [f"{source} says the roof was repaired in spring"])
+    yield
+    for source in ("a.txt", "b.txt", "renamed.txt"):
+        vector_helper.delete_document(source)
+
+
+def restart(monkeypatch) -> AnswerCache:
+    """A fresh process: an empty cache seeded from the history table."""
+    fresh = AnswerCache()
+    monkeypatch.setattr(answer_cache, "cache", fresh)
+    warm_cache()
+    return fresh
+
+
+def ask_again(cache: AnswerCache):
+    return cache.lookup(llm.embed_text(QUESTION))
+
+
+def test_warm_cache_reloads_history(monkeypatch):
+    sqlite_helper.add_qa_entry("a.txt, b.txt", QUESTION, "In spring.", llm.embed_text(QUESTION))
+    hit = ask_again(restart(monkeypatch))
+    assert hit is not None and hit["answer"] == "In spring."
+
+
+@pytest.mark.parametrize("change", ["delete", "rename"])
+def test_changed_document_is_not_answered_from_history(monkeypatch, change):
+    sqlite_helper.add_qa_entry("a.txt, b.txt", QUESTION, "In spring.", llm.embed_text(QUESTION))
+    if change == "delete":
+        vector_helper.delete_document("b.txt")
+    else:
+        vector_helper.rename_document("b.txt", "renamed.txt")
+    assert ask_again(restart(monkeypatch)) is None
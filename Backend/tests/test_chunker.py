@@ -0,0 +1,80 @@
+import random
+from helpers.chunker import token_spans
+from helpers.document_loader import stream_split
+
+
+def one_token(word: str) -> int:
+    return 1
+
+
+def random_text(words: int, seed: int) -> str:
+    rng = random.Random(seed)
+    vocabulary = ["alpha", "beta", "gamma", "delta.", "epsilon", "zeta?", "eta", "theta"]
+    parts = []
+    for _ in range(words):
+        parts.append(rng.choice(vocabulary))
+        parts.append(rng.choice([" ", " ", " ", "  ", "\n", "\n\n"]))
+    return "".join(parts)
+
+
+def test_spans_are_word_aligned_and_within_budget():
+    text = random_text(2000, 1)
+    spans = token_spans(text, 50, one_token)
+    assert spans
+    for span in spans:
+        assert span.start == 0 or text[span.start - 1].isspace()
+        assert not text[span.start].isspace() and not text[span.end - 1].isspace()
+        assert span.end == len(text) or text[span.end].isspace()
+        assert span.tokens == len(text[span.start:span.end].split()) <= 50
+
+    # Without overlap the spans cover every word exactly once
+    assert sum(span.tokens for span in spans) == len(text.split())
+
+
+def test_spans_end_at_paragraph_breaks():
+    paragraph = " ".join(["word"] * 30)
+    text = "\n\n".join([paragraph] * 4)
+    spans = token_spans(text, 50, one_token)
+    assert [text[span.start:span.end] for span in spans] == [paragraph] * 4
+
+
+def test_single_long_word_gets_its_own_span():
+    text = "short " + "x" * 40 + " short"
+    spans = token_spans(text, 5, len)
+    assert [text[span.start:span.end] for span in spans] == ["short", "x" * 40, "short"]
+
+
+def test_overlap():
+    text = " ".join(f"w{i}" for i in range(100))
+    spans = token_spans(text, 20, one_token, overlap=5)
+    for previous, span in zip(spans, spans[1:]):
+        shared = len(text[span.start:previous.end].split())
+        assert 0 < shared <= 5
+    assert spans[-1].end == len(text)
+
+
+def test_stream_split_offsets_and_pages():
+    pages = [(random_text(300, seed), seed) for seed in range(1, 6)]
+    joined = "\n".join(text for text, _ in pages)
+    page_starts = []
+    offset = 0
+    for text, page in pages:
+        page_starts.append((offset, page))
+        offset += len(text) + 1
+
+    def page_at(pos):
+        return [page for start, page in page_starts if start <= pos][-1]
+
+    # A small window, so the text is chunked in several passes
+    chunks = list(stream_split(pages, max_tokens=40, overlap=0, count_word=one_token, window=500))
+    assert chunks
+    for chunk in chunks:
+        assert joined[chunk.char_start:chunk.char_end] == chunk.text
+        assert len(chunk.text.split()) <= 40
+        assert chunk.page_start == page_at(chunk.char_start)
+        assert chunk.page_end == page_at(chunk.char_end - 1)
+    assert sum(len(chunk.text.split()) for chunk in chunks) == len(joined.split())
+
+    # The window only bounds memory; the chunks are those of the whole text
+    whole = token_spans(joined, 40, one_token)
+    assert [(chunk.char_start, chunk.char_end) for chunk in chunks] == [(span.start, span.end) for span in whole]
@@ -0,0 +1,47 @@
+import pytest
+from helpers import sqlite_helper, llm, vector_helper, context_builder
+from helpers.vector_index import load_index
+
+CHUNKS = [
+    "the quarterly report covers revenue and costs across all regions",
+    "staffing grew in the northern region while costs fell",
+    "the warehouse roof was repaired with zirconium panels",
+]
+
+
+@pytest.fixture(scope="module", autouse=True)
+def documents():
+    sqlite_helper.init_db()
+    load_index()
+    vector_helper.store_document_chunks("report.txt", CHUNKS)
+    vector_helper.store_document_chunks("copy.txt", CHUNKS[:1])
+    yield
+    vector_helper.delete_document("report.txt")
+    vector_helper.delete_document("copy.txt")
+
+
+def search(question: str, top_k: int = 4):
+    q_embedding = llm.embed_text(question)
+    return q_embedding, vector_helper.search_documents(q_embedding, top_k=top_k, mode="vector")
+
+
+def test_pack_context_drops_duplicates():
+    question = "revenue and costs across regions"
+    q_embedding, results = search(question)
+    context, packed = context_builder.pack_context(question, q_embedding, results)
+    assert len(results) == 4
+    assert [result.chunk for result in packed].count(CHUNKS[0]) == 1
+    assert context == context_builder.SEPARATOR.join(result.chunk for result in packed)
+
+
+def test_pack_context_truncates_an_oversized_top_chunk(monkeypatch):
+    monkeypatch.setattr(context_builder, "CONTEXT_TOKEN_BUDGET", 30)
+    question = "revenue across regions"
+    q_embedding, results = search(question, top_k=1)
+    oversized = results[0]._replace(chunk=" ".join([results[0].chunk] * 10))
+
+    context, packed = context_builder.pack_context(question, q_embedding, [oversized])
+    assert len(packed) == 1
+    assert context == packed[0].chunk
+    assert oversized.chunk.startswith(context)
+    assert 0 < llm.count_tokens(context, context_builder.DEFAULT_MODEL) <= 30
@@ -0,0 +1,63 @@
+import pytest
+from helpers import llm, sqlite_helper, vector_helper
+from helpers.db import execute, query_one
+from helpers.embedding_cache import EmbeddingCache, cache_key
+from helpers.vector_index import load_index
+
+
+def disk_rows() -> int:
+    return query_one("SELECT COUNT(*) FROM embedding_cache")[0]
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    sqlite_helper.init_db()
+    load_index()
+    execute("DELETE FROM embedding_cache")
+    fresh = EmbeddingCache(max_size=100, use_disk=True, disk_size=50)
+    monkeypatch.setattr(llm, "embedding_cache", fresh)
+    return fresh
+
+
+def test_misses_are_not_counted_as_hits(cache):
+    questions = [f"question number {i}" for i in range(10)]
+    for question in questions:
+        llm.embed_text(question)
+    llm.embed_texts(["another question", "and one more"])
+    stats = cache.stats()
+    assert (stats["memory_hits"], stats["disk_hits"], stats["misses"]) == (0, 0, 12)
+
+    llm.embed_text(questions[0])
+    llm.embed_texts(questions[1:3])
+    assert cache.stats()["memory_hits"] == 3
+
+
+def test_miss_returns_the_cached_value(cache):
+    first = llm.embed_text("what is the refund policy")
+    assert first.tolist() == llm.embed_text("what is the refund policy").tolist()
+    assert [e.tolist() for e in llm.embed_texts(["a", "b", "a"])] == [e.tolist() for e in llm.embed_texts(["a", "b", "a"])]
+
+
+def test_ingestion_skips_the_cache(cache):
+    vector_helper.store_document_chunks("cached.txt", [f"chunk text {i}" for i in range(10)])
+    try:
+        assert disk_rows() == 0
+        assert cache.stats()["size"] == 0
+    finally:
+        vector_helper.delete_document("cached.txt")
+
+
+def test_disk_tier_evicts_oldest_first(cache):
+    llm.embed_texts([f"text {i}" for i in range(60)])
+    assert disk_rows() == 50
+    kept = sqlite_helper.get_cached_embeddings([cache_key(llm.EMBED_MODEL, f"text {i}") for i in range(60)])
+    assert set(kept) == {cache_key(llm.EMBED_MODEL, f"text {i}") for i in range(10, 60)}
+
+
+def test_deleting_a_document_drops_its_cached_rows(cache):
+    text = "the warehouse roof was repaired in spring"
+    vector_helper.store_document_chunks("roof.txt", [text])
+    llm.embed_text(text)  # a question that happens to match the chunk exactly
+    assert disk_rows() == 1
+    vector_helper.delete_document("roof.txt")
+    assert disk_rows() == 0
@@ -0,0 +1,27 @@
+from helpers.extraction_helper import iter_txt
+
+
+def test_iter_txt_yields_lines(tmp_path):
+    path = tmp_path / "doc.txt"
+    path.write_text("first line\n\nthird line\nlast\n", encoding="utf-8")
+    # Lines that straddle blocks are reassembled
+    assert list(iter_txt(path, block_size=12)) == ["first line", "", "third line", "last"]
+
+
+def test_iter_txt_bounds_lines_without_newlines(tmp_path):
+    path = tmp_path / "one-line.txt"
+    text = " ".join(f"word{i}" for i in range(5000))
+    path.write_text(text, encoding="utf-8")
+    pieces = list(iter_txt(path, block_size=1000))
+    assert len(pieces) > 1
+    assert max(map(len, pieces)) <= 1000
+    # Cut at spaces, so the words and the text offsets are unchanged
+    joined = "\n".join(pieces)
+    assert len(joined) == len(text)
+    assert joined.split() == text.split()
+
+
+def test_iter_txt_cuts_a_huge_word(tmp_path):
+    path = tmp_path / "word.txt"
+    path.write_text("x" * 2500, encoding="utf-8")
+    assert list(iter_txt(path, block_size=1000)) == ["x" * 1000, "x" * 1000, "x" * 500]
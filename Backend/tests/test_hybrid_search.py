@@ -0,0 +1,52 @@
+import pytest
+from helpers import sqlite_helper, llm, vector_helper
+from helpers.vector_index import load_index
+
+FILLER = "the quarterly report covers revenue, costs and staffing across all regions"
+
+
+@pytest.fixture(scope="module", autouse=True)
+def documents():
+    sqlite_helper.init_db()
+    load_index()
+    vector_helper.store_document_chunks("report.txt", [f"{FILLER} section {i}" for i in range(20)]
+                                        + ["the warehouse roof was repaired with zirconium panels"])
+    vector_helper.store_document_chunks("notes.txt", [f"{FILLER} note {i}" for i in range(20)]
+                                        + ["zirconium prices rose again this spring"])
+    yield
+    vector_helper.delete_document("report.txt")
+    vector_helper.delete_document("notes.txt")
+
+
+def test_vector_search_ranks_the_closest_chunk_first():
+    question = "how were revenue and costs across regions"
+    results = vector_helper.search_documents(llm.embed_text(question), top_k=3, mode="vector")
+    assert len(results) == 3
+    assert all(FILLER in result.chunk for result in results)
+    assert results[0].score >= results[-1].score
+
+
+def test_hybrid_search_finds_the_keyword_chunk():
+    if not sqlite_helper.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    question = "zirconium"
+    results = vector_helper.search_documents(llm.embed_text(question), top_k=2, text=question, mode="hybrid")
+    assert {result.doc_name for result in results} == {"report.txt", "notes.txt"}
+    assert all("zirconium" in result.chunk for result in results)
+
+
+def test_search_in_document_filters_by_source():
+    question = "what did the zirconium panels repair"
+    for mode in ("vector", "hybrid"):
+        results = vector_helper.search_in_document(["notes.txt"], llm.embed_text(question), top_k=5,
+                                                   text=question, mode=mode)
+        assert len(results) == 5
+        assert {result.doc_name for result in results} == {"notes.txt"}
+
+
+def test_bm25_matches_keywords():
+    if not sqlite_helper.fts_enabled:
+        pytest.skip("SQLite built without FTS5")
+    hits = sqlite_helper.search_chunks_bm25("zirconium", 10)
+    assert {source for _, source, _ in hits} == {"report.txt", "notes.txt"}
+    assert sqlite_helper.search_chunks_bm25("zirconium", 10, ["notes.txt"])[0][1] == "notes.txt"
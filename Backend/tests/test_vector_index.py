@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+from helpers import sqlite_helper
+from helpers.vector_index import VectorIndex
+from helpers.ivf_index import IVFIndex
+from helpers.quantized_index import QuantizedIndex
+from helpers.quantization import quantize, score
+
+DIM = 16
+
+
+def vectors(n: int, seed: int) -> np.ndarray:
+    return np.random.default_rng(seed).standard_normal((n, DIM)).astype(np.float32)
+
+
+def make_index(kind: str, path=None):
+    if kind == "flat":
+        return VectorIndex()
+    if kind in ("int8", "binary"):
+        return QuantizedIndex(kind)
+    # Few enough rows to train, so searches go through the clusters
+    return IVFIndex(path=path, nlist=4, nprobe=4, min_train=50)
+
+
+@pytest.fixture(autouse=True)
+def database():
+    sqlite_helper.init_db()
+
+
+@pytest.fixture(params=["flat", "ivf", "int8", "binary"])
+def filled(request, tmp_path):
+    index = make_index(request.param, tmp_path / "index")
+    a, b = vectors(60, 1), vectors(60, 2)
+    if isinstance(index, QuantizedIndex):
+        # Exact re-ranking reads full embeddings by id, here from memory
+        rows = dict(zip(range(1, 121), np.concatenate([a, b])))
+        index.fetch = lambda ids: {i: rows[i] for i in ids}
+    index.add("a.txt", list(range(1, 61)), a)
+    index.add("b.txt", list(range(61, 121)), b)
+    return index, a, b
+
+
+def test_search_finds_each_row(filled):
+    index, a, b = filled
+    assert len(index) == 120
+    for chunk_id, vector in ((5, a[4]), (100, b[39])):
+        hit_id, _, score = index.search(vector, top_k=1)[0]
+        assert hit_id == chunk_id
+        assert score == pytest.approx(1.0, abs=1e-5)
+
+
+def test_source_filter(filled):
+    index, a, _ = filled
+    hits = index.search(a[0], top_k=10, sources=["b.txt"])
+    assert len(hits) == 10
+    assert {source for _, source, _ in hits} == {"b.txt"}
+
+
+def test_remove_source(filled):
+    index, a, b = filled
+    index.remove_source("a.txt")
+    assert len(index) == 60
+    assert all(source == "b.txt" for _, source, _ in index.search(a[0], top_k=20))
+    assert index.search(b[7], top_k=1)[0][0] == 68
+
+
+def test_remove_ids(filled):
+    index, a, _ = filled
+    index.remove_ids([1, 2, 3])
+    assert len(index) == 117
+    assert 1 not in {chunk_id for chunk_id, _, _ in index.search(a[0], top_k=120)}
+
+
+def test_rename_source(filled):
+    index, a, _ = filled
+    index.rename_source("a.txt", "renamed.txt")
+    assert index.search(a[0], top_k=1)[0][1] == "renamed.txt"
+    assert index.search(a[0], top_k=5, sources=["a.txt"]) == []
+
+    # Renaming onto an existing source merges the two
+    index.rename_source("renamed.txt", "b.txt")
+    assert len(index.search(a[0], top_k=120, sources=["b.txt"])) == 120
+
+
+def test_empty_in_memory_ivf_grows():
+    index = IVFIndex(path=None, min_train=50)
+    index.add("a.txt", [1, 2], vectors(2, 3))
+    index.add("a.txt", list(range(3, 2003)), vectors(2000, 4))
+    assert len(index) == 2002
+
+
+def test_ivf_reopens_persisted_rows(tmp_path):
+    # The persisted files only reopen while they match the documents table
+    for source in {row[1] for row in sqlite_helper.get_all_documents()}:
+        sqlite_helper.delete_source(source)
+    path = tmp_path / "ivf"
+    index = make_index("ivf", path)
+    a = vectors(80, 5)
+    ids = sqlite_helper.add_documents("a.txt", [f"chunk {i}" for i in range(80)], a)
+    index.add("a.txt", ids, a)
+
+    reopened = make_index("ivf", path)
+    assert reopened.open()
+    assert len(reopened) == 80
+    assert reopened.search(a[10], top_k=1)[0][:2] == (ids[10], "a.txt")
+
+    sqlite_helper.delete_chunks_by_ids(ids[-1:])
+    reopened.remove_ids(ids[-1:])
+    again = make_index("ivf", path)
+    assert again.open()
+    assert len(again) == 79
+
+    # A database change the index never saw forces a rebuild
+    sqlite_helper.delete_chunks_by_ids(ids[:1])
+    assert not make_index("ivf", path).open()
+    sqlite_helper.delete_source("a.txt")
+
+
+def test_load_from_db():
+    for source in {row[1] for row in sqlite_helper.get_all_documents()}:
+        sqlite_helper.delete_source(source)
+    a = vectors(10, 6)
+    ids = sqlite_helper.add_documents("a.txt", [f"chunk {i}" for i in range(10)], a)
+    index = make_index("flat")
+    index.load_from_db()
+    assert len(index) == 10
+    assert index.search(a[3], top_k=1)[0][:2] == (ids[3], "a.txt")
+    sqlite_helper.delete_source("a.txt")
+
+
+def test_flat_index_is_never_persisted():
+    assert not VectorIndex().open()
+
+
+def test_ivf_rejects_quantization(monkeypatch):
+    from helpers import vector_index
+    monkeypatch.setattr(vector_index, "VECTOR_INDEX", "ivf")
+    monkeypatch.setattr(vector_index, "EMBEDDING_QUANTIZATION", "int8")
+    with pytest.raises(ValueError):
+        vector_index.create_index()
+
+
+@pytest.mark.parametrize("kind", ["int8", "binary"])
+def test_quantized_scores_approximate_cosine(kind):
+    rows, query = vectors(200, 7), vectors(1, 8)[0]
+    exact = (rows / np.linalg.norm(rows, axis=1, keepdims=True)) @ (query / np.linalg.norm(query))
+    codes, scales = quantize(rows, kind)
+    approx = score(codes, scales, query / np.linalg.norm(query), kind, DIM)
+    assert approx.dtype == np.float32
+    if kind == "int8":
+        assert np.abs(approx - exact).max() < 0.05
+    # Sign bits of 16 dimensions only keep the ranking roughly
+    assert np.corrcoef(approx, exact)[0, 1] > (0.99 if kind == "int8" else 0.6)
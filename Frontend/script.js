@@ -78,7 +78,7 @@ document.addEventListener("DOMContentLoaded", () => {
     container.scrollTop = container.scrollHeight;
 
     try {
-      const response = await fetch("/ask/recorded", {
+      const response = await fetch("/ask/recorded/stream", {
         method: "POST",
         body: formData,
       });
@@ -89,7 +89,14 @@ document.addEventListener("DOMContentLoaded", () => {
         return;
       }
 
-      const result = await response.json();
+      const botMsg = document.createElement("div");
+      botMsg.classList.add("message", "bot");
+      botMsg.textContent = "Typing...";
+      container.appendChild(botMsg);
+
+      await renderAnswerStream(response, botMsg, (meta) => {
+        userMsg.textContent = meta.question;
+      });
       loadHistory();
     } catch (err) {
       console.error("Upload failed:", err);
@@ -115,13 +122,44 @@ document.addEventListener("DOMContentLoaded", () => {
       }
 
       const result = await response.json();
-      alert("✅ " + result.message + "\nSaved as: " + result.saved_as);
+      console.log(result.message + ", job:", result.job_id);
+
+      // Wait for the background ingestion job to finish
+      const job = await waitForJob(result.job_id);
+      if (job.stage === "failed") {
+        alert("❌ Processing failed for " + result.saved_as + ": " + job.error);
+        return;
+      }
+
+      alert("✅ File uploaded and processed successfully\nSaved as: " + result.saved_as);
       loadDocuments();
     } catch (err) {
       console.error("Upload failed:", err);
       alert("❌ Upload failed, check console for details.");
     }
   }
+
+  // Poll an ingestion job until it is done or failed
+  async function waitForJob(jobId, intervalMs = 1000) {
+    while (true) {
+      const res = await fetch(`/jobs/${jobId}?ts=${Date.now()}`, { cache: "no-store" });
+      if (!res.ok) {
+        throw new Error("Job lookup failed");
+      }
+
+      const job = await res.json();
+      if (job.stage === "done" || job.stage === "failed") {
+        return job;
+      }
+
+      if (job.chunks_total) {
+        console.log(`Job ${jobId}: ${job.stage} ${job.chunks_done}/${job.chunks_total}`);
+      } else {
+        console.log(`Job ${jobId}: ${job.stage}`);
+      }
+      await new Promise(resolve => setTimeout(resolve, intervalMs));
+    }
+  }
 });
 
 // Create the popup menu ONCE when page loads
@@ -326,20 +364,20 @@ document.getElementById("question-form").addEventListener("submit", async (e) =>
   try {
     let res;
     if (selectedDocuments.length > 0) {
-      // Send to /search-doc with FormData
+      // Send to /search-doc/stream with FormData
       const formData = new FormData();
       selectedDocuments.forEach(doc => formData.append("document_names", doc));
       formData.append("query", question);
 
-      console.log("Sending to /search-doc with FormData: ", formData);
+      console.log("Sending to /search-doc/stream with FormData: ", formData);
 
-      res = await fetch("/search-doc", {
+      res = await fetch("/search-doc/stream", {
         method: "POST",
         body: formData
       });
     } else {
-      // Send to /ask as before
-      res = await fetch("/ask", {
+      // Send to /ask/stream
+      res = await fetch("/ask/stream", {
         method: "POST",
         headers: { "Content-Type": "application/json" },
         body: JSON.stringify(question)
@@ -351,21 +389,8 @@ document.getElementById("question-form").addEventListener("submit", async (e) =>
       throw new Error(errData.detail || "Failed to process question");
     }
 
-    const data = await res.json();
-
-    // 4️⃣ Replace typing with actual answer
-    botMsg.textContent = "";
-    let i = 0;
-    const answer = data.answer;
-    const typingInterval = setInterval(() => {
-      if (i < answer.length) {
-        botMsg.textContent += answer[i];
-        i++;
-        container.scrollTop = container.scrollHeight;
-      } else {
-        clearInterval(typingInterval);
-      }
-    }, 20);
+    // 4️⃣ Replace typing with tokens as they arrive
+    await renderAnswerStream(res, botMsg);
 
     // 5️⃣ Refresh history
     await loadHistory();
@@ -380,6 +405,47 @@ document.getElementById("question-form").addEventListener("submit", async (e) =>
   }
 });
 
+// Read an NDJSON answer stream and render tokens into botMsg as they arrive
+async function renderAnswerStream(res, botMsg, onMeta) {
+  const container = document.getElementById("message-container");
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+  let started = false;
+
+  const handleEvent = (event) => {
+    if (event.type === "meta") {
+      if (onMeta) onMeta(event);
+    } else if (event.type === "token") {
+      if (!started) {
+        botMsg.textContent = "";
+        started = true;
+      }
+      botMsg.textContent += event.text;
+    } else if (event.type === "done") {
+      botMsg.textContent = event.answer;
+    } else if (event.type === "error") {
+      throw new Error(event.detail);
+    }
+    container.scrollTop = container.scrollHeight;
+  };
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+
+    buffer += decoder.decode(value, { stream: true });
+    const lines = buffer.split("\n");
+    buffer = lines.pop(); // keep any partial line for the next read
+
+    lines.filter(line => line.trim()).forEach(line => handleEvent(JSON.parse(line)));
+  }
+
+  if (buffer.trim()) {
+    handleEvent(JSON.parse(buffer));
+  }
+}
+
 // Load history
 async function loadHistory() {
   try {
@@ -497,6 +563,137 @@ searchForm.addEventListener("submit", (e) => {
 });
 
 
+// Live spoken questions: stream microphone PCM over a WebSocket, show
+// partial transcripts while speaking and the answer once the pause is heard
+const micButton = document.getElementById("mic-button");
+let liveSession = null;
+
+// Converts mic audio to 16-bit PCM and posts it in ~100 ms batches
+const PCM_WORKLET = `
+class PcmCapture extends AudioWorkletProcessor {
+  constructor() {
+    super();
+    this.buffer = new Int16Array(1600);
+    this.length = 0;
+  }
+  process(inputs) {
+    const channel = inputs[0][0];
+    if (!channel) return true;
+    for (let i = 0; i < channel.length; i++) {
+      const s = Math.max(-1, Math.min(1, channel[i]));
+      this.buffer[this.length++] = s < 0 ? s * 0x8000 : s * 0x7fff;
+      if (this.length === this.buffer.length) {
+        this.port.postMessage(this.buffer.buffer, [this.buffer.buffer]);
+        this.buffer = new Int16Array(1600);
+        this.length = 0;
+      }
+    }
+    return true;
+  }
+}
+registerProcessor("pcm-capture", PcmCapture);
+`;
+
+async function startLive() {
+  const stream = await navigator.mediaDevices.getUserMedia({
+    audio: { channelCount: 1, echoCancellation: true, noiseSuppression: true }
+  });
+  // The server expects 16 kHz; the browser resamples the mic to the context rate
+  const audioContext = new AudioContext({ sampleRate: 16000 });
+  const workletUrl = URL.createObjectURL(new Blob([PCM_WORKLET], { type: "application/javascript" }));
+  await audioContext.audioWorklet.addModule(workletUrl);
+  URL.revokeObjectURL(workletUrl);
+
+  const scheme = location.protocol === "https:" ? "wss" : "ws";
+  const ws = new WebSocket(`${scheme}://${location.host}/ws/ask/live`);
+  ws.binaryType = "arraybuffer";
+
+  const session = { stream, audioContext, ws, userMsg: null, botMsg: null, started: false };
+  const capture = new AudioWorkletNode(audioContext, "pcm-capture");
+  capture.port.onmessage = (e) => {
+    if (ws.readyState === WebSocket.OPEN) ws.send(e.data);
+  };
+  audioContext.createMediaStreamSource(stream).connect(capture);
+
+  ws.onmessage = (e) => handleLiveEvent(session, JSON.parse(e.data));
+  ws.onclose = () => stopCapture(session);
+  ws.onerror = (err) => console.error("Live connection failed:", err);
+
+  liveSession = session;
+  micButton.classList.add("recording");
+}
+
+function stopCapture(session) {
+  session.stream.getTracks().forEach(track => track.stop());
+  if (session.audioContext.state !== "closed") session.audioContext.close();
+  if (liveSession === session) {
+    liveSession = null;
+    micButton.classList.remove("recording");
+  }
+}
+
+// Stop the mic; the server still answers a question in progress, then closes
+function stopLive() {
+  const session = liveSession;
+  if (!session) return;
+  stopCapture(session);
+  if (session.ws.readyState === WebSocket.OPEN) {
+    session.ws.send(JSON.stringify({ type: "stop" }));
+  }
+}
+
+function handleLiveEvent(session, event) {
+  const container = document.getElementById("message-container");
+  const addMessage = (role, text) => {
+    const msg = document.createElement("div");
+    msg.classList.add("message", role);
+    msg.textContent = text;
+    container.appendChild(msg);
+    return msg;
+  };
+
+  if (event.type === "partial") {
+    if (!session.userMsg) session.userMsg = addMessage("user", "");
+    session.userMsg.textContent = event.text + " …";
+  } else if (event.type === "final") {
+    if (!event.text) {
+      if (session.userMsg) session.userMsg.remove();
+      session.userMsg = null;
+    } else {
+      if (!session.userMsg) session.userMsg = addMessage("user", "");
+      session.userMsg.textContent = event.text;
+      session.botMsg = addMessage("bot", "Typing...");
+      session.started = false;
+    }
+  } else if (event.type === "token" && session.botMsg) {
+    if (!session.started) {
+      session.botMsg.textContent = "";
+      session.started = true;
+    }
+    session.botMsg.textContent += event.text;
+  } else if (event.type === "done" && session.botMsg) {
+    session.botMsg.textContent = event.answer;
+    session.userMsg = session.botMsg = null;
+    loadHistory();
+  } else if (event.type === "error") {
+    (session.botMsg || addMessage("bot", "")).textContent = "Error: " + event.detail;
+    session.userMsg = session.botMsg = null;
+  }
+  container.scrollTop = container.scrollHeight;
+}
+
+micButton.addEventListener("click", () => {
+  if (liveSession) {
+    stopLive();
+    return;
+  }
+  startLive().catch((err) => {
+    console.error("Microphone failed:", err);
+    alert("❌ Could not start the microphone, check console for details.");
+  });
+});
+
+
 // Auto-resize question textarea
 const textarea = document.getElementById("question");
 